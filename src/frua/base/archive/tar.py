@@ -79,14 +79,94 @@ class Tar:
                 self._logger.error(e)
             return False
     
-    def untar(self, tar_file:str, dir:str, fmt:str=None) -> bool:
+    @staticmethod
+    def _strip(tar_ref:tarfile.TarFile, strip_components:int):
+        """
+        Yields the members of a tar file with their leading directories removed (as tar --strip-components)
+
+        Args:
+            tar_ref (tarfile.TarFile): the tar file
+            strip_components (int): number of leading directories to remove
+
+        Yields:
+            tarfile.TarInfo: the members, the members inside the removed directories are skipped
+        """
+        for member in tar_ref:
+            name = '/'.join(member.name.split('/')[strip_components:])
+            if not name:
+                continue
+            member.name = name
+            if member.islnk():
+                #hard links point to members of the archive
+                member.linkname = '/'.join(member.linkname.split('/')[strip_components:])
+            yield member
+
+    @staticmethod
+    def _check(member:tarfile.TarInfo, dir:str) -> tarfile.TarInfo:
+        """
+        Check that a member stays inside the destination directory, for the Pythons without the extraction filters
+
+        Same rules as the 'data' filter for the paths: no absolute name, no name or link target outside dir,
+        no device or fifo. The setuid, setgid and sticky bits are dropped.
+
+        Args:
+            member (tarfile.TarInfo): the member
+            dir (str): the destination directory
+
+        Returns:
+            tarfile.TarInfo: the member
+
+        Raises:
+            tarfile.TarError: if the member would be written outside dir
+        """
+        dest = os.path.realpath(dir)
+        def inside(path:str) -> bool:
+            path = os.path.realpath(os.path.join(dest, path))
+            return os.path.commonpath([dest, path]) == dest
+        if os.path.isabs(member.name) or not inside(member.name):
+            raise tarfile.TarError('Member %r is outside the destination' % member.name)
+        if member.issym() and (os.path.isabs(member.linkname) or not inside(os.path.join(os.path.dirname(member.name), member.linkname))):
+            raise tarfile.TarError('Symlink %r points outside the destination' % member.name)
+        if member.islnk() and (os.path.isabs(member.linkname) or not inside(member.linkname)):
+            raise tarfile.TarError('Hard link %r points outside the destination' % member.name)
+        if member.isdev():
+            raise tarfile.TarError('Member %r is a special file' % member.name)
+        if member.mode is not None:
+            member.mode &= 0o777
+        return member
+
+    def _extractall(self, tar_ref:tarfile.TarFile, dir:str, members) -> None:
+        """
+        Extract members of a tar file, refusing the members writing outside dir
+
+        Uses the 'data' extraction filter (Python 3.12, and the security releases of 3.8 to 3.11),
+        or checks the members itself (see _check) on older Pythons.
+
+        Args:
+            tar_ref (tarfile.TarFile): the tar file
+            dir (str): the destination directory
+            members (iterable): the members, None for all
+        """
+        if hasattr(tarfile, 'data_filter'):
+            tar_ref.extractall(dir, members=members, filter='data')
+            return
+        #checked one by one as they are extracted: a symlink extracted before may redirect a later path
+        for member in (tar_ref if members is None else members):
+            tar_ref.extract(self._check(member, dir), dir)
+
+    def untar(self, tar_file:object, dir:str, fmt:str=None, strip_components:int=0) -> bool:
         """
         untar a directory
 
         Args:
         dir (str): path to directory
-        tar_file (str): path to tar file
-        fmt (str): compression format (gz, bz2, xz, None)
+        tar_file (object): path to tar file, or a file object read as a stream (e.g. an HTTP response, see GetDownloader.open):
+            the members are extracted as they are read, without seeking
+        fmt (str): compression format (gz, bz2, xz, None). Detected if None.
+        strip_components (int): number of leading directories removed from the member names (as tar --strip-components)
+
+        The archive may come from an untrusted source: absolute paths, '..' components, links pointing outside dir
+        and special files fail the extraction (see _extractall).
 
         Returns:
             bool: True if untaring was successful
@@ -100,12 +180,17 @@ class Tar:
                 if hasattr(self, '_logger'):
                     self._logger.debug("Created dir: %s", dir)
             #open the tar file
-            if fmt:
+            if not isinstance(tar_file, (str, bytes, os.PathLike)):
+                tar_ref = tarfile.open(fileobj=tar_file, mode='r|%s'%(fmt or '*'))
+            elif fmt:
                 tar_ref = tarfile.open(tar_file, 'r:%s'%fmt)
             else:
                 tar_ref = tarfile.open(tar_file, 'r')
             #extract the directory
-            tar_ref.extractall(dir)
+            if strip_components:
+                self._extractall(tar_ref, dir, self._strip(tar_ref, strip_components))
+            else:
+                self._extractall(tar_ref, dir, None)
             #close the tar file
             tar_ref.close()
             #Done, log
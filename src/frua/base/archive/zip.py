@@ -95,13 +95,14 @@ class Zip(object):
                 self._logger.error(e)
             return False
 
-    def unzip(self, zip_file:str, dir:str) -> bool:
+    def unzip(self, zip_file:object, dir:str, strip_components:int=0) -> bool:
         """
         unzips a zip file
 
         Args:
-        zip_file (str): path to zip file
+        zip_file (object): path to zip file, or a seekable file object (e.g. a tempfile.SpooledTemporaryFile)
         dir (str): directory path to unzip to
+        strip_components (int): number of leading directories removed from the member names (as tar --strip-components)
 
         Returns:
             bool: True if unzipping was successful
@@ -117,7 +118,16 @@ class Zip(object):
                     self._logger.debug("Created dir: %s", dir)
             #unzip
             zip_ref = zipfile.ZipFile(zip_file, 'r')
-            zip_ref.extractall(dir)
+            if strip_components:
+                for info in zip_ref.infolist():
+                    name = '/'.join(info.filename.split('/')[strip_components:])
+                    if not name:
+                        continue
+                    #extract sanitizes the new name as the original one
+                    info.filename = name
+                    zip_ref.extract(info, dir)
+            else:
+                zip_ref.extractall(dir)
             zip_ref.close()
             #Done, log
             if hasattr(self, '_logger'):
@@ -0,0 +1,237 @@
+"""
+To execute terminal commands and scripts from asyncio code without blocking the event loop
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- signal: https://docs.python.org/3/library/signal.html
+- time: https://docs.python.org/3/library/time.html
+- asyncio: https://docs.python.org/3/library/asyncio.html
+- subprocess: https://docs.python.org/3/library/subprocess.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import signal
+import time
+import asyncio
+import subprocess
+
+from frua.base.cmd.cmd import Cmd, CmdResult
+from frua.base.cmd.stats import stats as cmdstats
+
+class AsyncCmd(Cmd):
+    """
+    Asynchronous Command Object
+
+    Same methods as Cmd (cmd, shell, bash, python, bash_script, python_script) returning coroutines:
+
+        result = await AsyncCmd().cmd('ls -a')
+
+    Each command runs in its own process group: cancelling the coroutine or reaching the timeout
+    kills the command and its children.
+
+    The runs are recorded in the CmdStats registry like those of Cmd, with their wall time only: the children
+    are reaped by the event loop, their CPU time and memory are not known (None in the CmdResult).
+    """
+    def __init__(self, cmdline:object=None, max_concurrency:int=None, semaphore:asyncio.Semaphore=None, on_stdout=None, on_stderr=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            cmdline(object, optional): the command line object. can be a string or a list of arguments (list of strings)
+            max_concurrency (int, optional): maximum number of commands of this object running at the same time
+            semaphore (asyncio.Semaphore, optional): semaphore shared with other objects to bound the number of running commands
+            on_stdout (callable, optional): called with each line (bytes) of stdout as it is read, can be a coroutine function
+            on_stderr (callable, optional): called with each line (bytes) of stderr as it is read, can be a coroutine function
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__(cmdline, *args, **kwargs)
+        if semaphore is None and max_concurrency:
+            semaphore = asyncio.Semaphore(max_concurrency)
+        self.semaphore = semaphore
+        self.on_stdout = on_stdout
+        self.on_stderr = on_stderr
+
+    @staticmethod
+    async def _read(reader:asyncio.StreamReader, callback) -> bytes:
+        """
+        Read a stream line by line until EOF
+
+        Args:
+            reader (asyncio.StreamReader): the stream
+            callback (callable): called with each line, None for no callback
+
+        Returns:
+            bytes: the whole stream content
+        """
+        if reader is None:
+            return None
+        chunks = []
+        #partial line waiting for its end (read() has no line length limit unlike readline())
+        pending = b''
+        while True:
+            chunk = await reader.read(65536)
+            if chunk:
+                chunks.append(chunk)
+            if callback is None:
+                if not chunk:
+                    break
+                continue
+            if chunk:
+                lines = (pending + chunk).split(b'\n')
+                pending = lines.pop()
+                lines = [line + b'\n' for line in lines]
+            else:
+                lines = [pending] if pending else []
+            for line in lines:
+                res = callback(line)
+                if asyncio.iscoroutine(res):
+                    await res
+            if not chunk:
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    async def _kill(proc:asyncio.subprocess.Process) -> None:
+        """
+        Kill the process group of a command and reap it
+
+        Args:
+            proc (asyncio.subprocess.Process): the process
+        """
+        if proc.returncode is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        await proc.wait()
+
+    async def _run(self, cmdline:list, shell:bool, stdout:int, stderr:int, timeout:float, on_stdout, on_stderr):
+        """
+        Start a command and wait for it, reading stdout and stderr as they come
+
+        Args:
+            cmdline (list): the command line
+            shell (bool): run command in a separate shell
+            stdout (int): stdout, see subprocess documentation
+            stderr (int): stderr, see subprocess documentation
+            timeout (float): timeout in seconds
+            on_stdout (callable): stdout line callback
+            on_stderr (callable): stderr line callback
+
+        Returns:
+            tuple: (returncode, stdout, stderr)
+        """
+        if isinstance(cmdline, str):
+            cmdline = [cmdline]
+        if shell:
+            #same as subprocess: the first argument is the shell command, the others its positional parameters
+            cmdline = ['/bin/sh', '-c'] + list(cmdline)
+        proc = await asyncio.create_subprocess_exec(*cmdline,
+            stdout=subprocess.PIPE if stdout is None else stdout,
+            stderr=subprocess.PIPE if stderr is None else stderr,
+            start_new_session=True)
+        try:
+            outputs = await asyncio.wait_for(asyncio.gather(
+                self._read(proc.stdout, on_stdout),
+                self._read(proc.stderr, on_stderr),
+                proc.wait()), timeout)
+        except asyncio.TimeoutError:
+            await self._kill(proc)
+            raise subprocess.TimeoutExpired(cmdline, timeout)
+        except BaseException:
+            #cancelled (or failing callback): do not leave the command running
+            await asyncio.shield(self._kill(proc))
+            raise
+        return proc.returncode, outputs[0], outputs[1]
+
+    async def raw(self, cmdline:list=None, shell:bool=False, check:bool=False, stdout:int=None, stderr:int=None, timeout:float=None, **kwargs):
+        """
+        Run a command
+
+        Args:
+            cmdline(list, optional): the command line object. can be a string or a list of arguments (list of strings)
+            shell (bool, optional): run command in a separate shell. Defaults to False. See subprocess documentation.
+            check (bool, optional): raise subprocess.CalledProcessError if the command fails. Defaults to False.
+            stdout (int, optional): stdout. Defaults to subprocess.PIPE. See subprocess documentation.
+            stderr (int, optional): stderr. Defaults to subprocess.PIPE. See subprocess documentation.
+            timeout (float, optional): kill the command and raise subprocess.TimeoutExpired after timeout seconds.
+            kwargs: keyword arguments (on_stdout and on_stderr override the callbacks of the object)
+
+        Returns:
+            result: CmdResult (subprocess.CompletedProcess with the wall time, utime, stime and maxrss None)
+        """
+        if cmdline == None:
+            cmdline = self.cmdlineargs
+        on_stdout = kwargs.get('on_stdout', self.on_stdout)
+        on_stderr = kwargs.get('on_stderr', self.on_stderr)
+        self._logger.info(f'Running command: {cmdline}')
+        if 'verbose' in kwargs:
+            print(f'Running command: {cmdline}')
+        if self.semaphore is None:
+            start = time.monotonic()
+            returncode, out, err = await self._run(cmdline, shell, stdout, stderr, timeout, on_stdout, on_stderr)
+        else:
+            async with self.semaphore:
+                #the wait for the semaphore is not part of the run
+                start = time.monotonic()
+                returncode, out, err = await self._run(cmdline, shell, stdout, stderr, timeout, on_stdout, on_stderr)
+        wall = time.monotonic() - start
+        result = CmdResult(cmdline, returncode, out, err, wall)
+        getattr(self, 'stats', cmdstats).record(cmdline, returncode, wall)
+        #handle stdout
+        if result.stdout:
+            self._logger.info('stdout: %s'%(result.stdout.decode(errors='replace')))
+            if 'verbose' in kwargs:
+                print(f"stdout:", result.stdout)
+        #handle stderr
+        if result.stderr:
+            self._logger.error('stderr: %s'%(result.stderr.decode(errors='replace')))
+            if 'verbose' in kwargs:
+                print(f"stderr:", result.stderr)
+        #handle return code
+        if result.returncode:
+            self._logger.info(f'return code: {result.returncode}')
+            if 'verbose' in kwargs:
+                print(f"return code: {result.returncode}")
+            if check:
+                result.check_returncode()
+        #handle resources
+        self._logger.info('resources: wall %.3fs'%wall)
+        return result
+
+    async def cmd(self, cmdline:object=None, check:bool=False, stdout:int=None, stderr:int=None, **kwargs):
+        """
+        Run a command not using the shell
+
+        Same as Cmd.cmd, the cached results (see Cmd(cache=CmdCache())) are returned without running the command.
+
+        Args:
+            cmdline(object, optional): the command line object. can be a string or a list of arguments (list of strings)
+            check (bool, optional): raise subprocess.CalledProcessError if the command fails. Defaults to False.
+            stdout (int, optional): stdout. Defaults to subprocess.PIPE. See subprocess documentation.
+            stderr (int, optional): stderr. Defaults to subprocess.PIPE. See subprocess documentation.
+            kwargs: keyword arguments (see raw)
+                inputs (list): paths of the files the result depends on, for the cache
+
+        Returns:
+            result: CmdResult, see raw
+        """
+        if cmdline != None:
+            #handle sudo
+            if 'sudo' in kwargs and isinstance(cmdline, (list, str)):
+                cmdline = ['sudo'] + cmdline if isinstance(cmdline, list) else 'sudo ' + cmdline
+            #clean input a bit first
+            self._clean_cmdline(cmdline)
+        key, result = self._cached(stdout, stderr, kwargs.get('inputs'))
+        if result is not None:
+            if check:
+                result.check_returncode()
+            return result
+        result = await self.raw(self.cmdlineargs, shell=False, check=check, stdout=stdout, stderr=stderr, **kwargs)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
@@ -0,0 +1,230 @@
+"""
+To run batches of independent commands in parallel
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- signal: https://docs.python.org/3/library/signal.html
+- shlex: https://docs.python.org/3/library/shlex.html
+- time: https://docs.python.org/3/library/time.html
+- resource: https://docs.python.org/3/library/resource.html (Unix only, optional)
+- subprocess: https://docs.python.org/3/library/subprocess.html
+- threading: https://docs.python.org/3/library/threading.html
+- concurrent.futures: https://docs.python.org/3/library/concurrent.futures.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import signal
+import shlex
+import time
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+#Unix only: no resource usage on the other platforms
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from frua.base.cmd.cmd import Cmd
+
+class CmdBatch(object):
+    """
+    Batch of independent commands run in parallel
+
+    The commands run in child processes, a pool of threads waits for them:
+    up to max_workers commands run at the same time. Each command runs in its own session:
+    on timeout, or when run_iter is left early, the command and its children are killed.
+    """
+    def __init__(self, cmdlines:list=None, max_workers:int=None, timeout:float=None, shell:bool=False, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            cmdlines (list, optional): the command lines to add (strings or lists of arguments)
+            max_workers (int, optional): maximum number of commands running at the same time. Defaults to the number of CPUs.
+            timeout (float, optional): default timeout of each command, in seconds
+            shell (bool, optional): run the commands using the shell by default
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.shell = shell
+        #jobs: (cmdline, timeout, shell)
+        self._jobs = []
+        #Cmd objects of the running commands, killed when run_iter is left early
+        self._running = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+        self.stats = {}
+        if cmdlines is not None:
+            for cmdline in cmdlines:
+                self.add(cmdline)
+
+    def add(self, cmdline:object, timeout:float=None, shell:bool=None) -> int:
+        """
+        Add a command to the batch
+
+        Args:
+            cmdline (object): the command line, a string or a list of arguments
+            timeout (float, optional): timeout of the command, in seconds. Defaults to the batch timeout.
+            shell (bool, optional): run the command using the shell. Defaults to the batch setting.
+
+        Returns:
+            int: the index of the command in the batch
+        """
+        self._jobs.append((cmdline, self.timeout if timeout is None else timeout, self.shell if shell is None else shell))
+        return len(self._jobs) - 1
+
+    def __len__(self) -> int:
+        """
+        Number of commands in the batch
+
+        Returns:
+            int: number of commands
+        """
+        return len(self._jobs)
+
+    def _run_job(self, cmdline:object, timeout:float, shell:bool) -> subprocess.CompletedProcess:
+        """
+        Run one command
+
+        A command killed on timeout gets the SIGKILL return code and timed_out set to True.
+        A command that could not be started gets the 127 return code and the error in stderr.
+
+        Args:
+            cmdline (object): the command line
+            timeout (float): timeout in seconds
+            shell (bool): run the command using the shell
+
+        Returns:
+            subprocess.CompletedProcess: the result
+        """
+        start = time.monotonic()
+        cmdobj = Cmd()
+        with self._lock:
+            if self._stopping:
+                result = subprocess.CompletedProcess(cmdline, -signal.SIGKILL, b'', b'')
+                result.timed_out = False
+                result.wall = 0.0
+                return result
+            self._running.add(cmdobj)
+        try:
+            if shell:
+                #the whole line goes to the shell (Cmd.shell would split it)
+                line = cmdline if isinstance(cmdline, str) else shlex.join(cmdline)
+                result = cmdobj.raw([line], shell=True, timeout=timeout, start_new_session=True)
+            else:
+                result = cmdobj.cmd(cmdline, timeout=timeout, start_new_session=True)
+            result.timed_out = False
+        except subprocess.TimeoutExpired as e:
+            self._logger.error('Command timed out after %s seconds: %s'%(timeout, cmdline))
+            result = subprocess.CompletedProcess(e.cmd, -signal.SIGKILL, e.stdout, e.stderr)
+            result.timed_out = True
+        except OSError as e:
+            self._logger.error('Command failed to start: %s: %s'%(cmdline, e))
+            result = subprocess.CompletedProcess(cmdline, 127, b'', str(e).encode())
+            result.timed_out = False
+        finally:
+            with self._lock:
+                self._running.discard(cmdobj)
+        result.wall = time.monotonic() - start
+        return result
+
+    def run_iter(self):
+        """
+        Run the commands of the batch, yielding the results as they complete
+
+        The stats are updated once all the commands are done. Leaving the loop early (break, exception)
+        cancels the commands not started yet and kills the running ones.
+
+        Yields:
+            tuple: (index of the command, subprocess.CompletedProcess)
+        """
+        jobs = self._jobs
+        self.stats = {}
+        self._stopping = False
+        start = time.monotonic()
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN) if resource is not None else None
+        failed = timed_out = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._run_job, *job): i for i, job in enumerate(jobs)}
+            done = False
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    if result.returncode:
+                        failed += 1
+                    if result.timed_out:
+                        timed_out += 1
+                    yield futures[future], result
+                done = True
+            finally:
+                if not done:
+                    self._stop(futures)
+        usage2 = resource.getrusage(resource.RUSAGE_CHILDREN) if resource is not None else None
+        self.stats = {
+            'count': len(jobs),
+            'failed': failed,
+            'timed_out': timed_out,
+            'max_workers': self.max_workers,
+            'wall': time.monotonic() - start,
+            'utime': usage2.ru_utime - usage.ru_utime if usage is not None else 0.0,
+            'stime': usage2.ru_stime - usage.ru_stime if usage is not None else 0.0,
+        }
+        self._logger.info('Ran %s commands in %.3fs (user %.3fs, sys %.3fs), %s failed'
+            %(len(jobs), self.stats['wall'], self.stats['utime'], self.stats['stime'], failed))
+
+    def _stop(self, futures:dict) -> None:
+        """
+        Cancel the commands not started yet and kill the running ones
+
+        Args:
+            futures (dict): the futures of the commands
+        """
+        for future in futures:
+            future.cancel()
+        with self._lock:
+            self._stopping = True
+        killed = set()
+        while True:
+            with self._lock:
+                running = list(self._running)
+            if not running:
+                break
+            #a command may be between _run_job and its Popen: kill again until it is gone
+            for cmdobj in running:
+                if cmdobj.kill():
+                    killed.add(cmdobj)
+            time.sleep(0.05)
+        self._logger.info('Batch stopped: %s commands killed'%len(killed))
+
+    def run(self, ordered:bool=True) -> list:
+        """
+        Run the commands of the batch
+
+        Args:
+            ordered (bool, optional): return the results in the order the commands were added, else in completion order
+
+        Returns:
+            list: the results (subprocess.CompletedProcess), with wall (seconds) and timed_out attributes
+        """
+        if ordered:
+            results = [None] * len(self._jobs)
+            for i, result in self.run_iter():
+                results[i] = result
+            return results
+        return [result for _, result in self.run_iter()]
@@ -0,0 +1,265 @@
+"""
+Cache of the results of idempotent commands
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- time: https://docs.python.org/3/library/time.html
+- hashlib: https://docs.python.org/3/library/hashlib.html
+- threading: https://docs.python.org/3/library/threading.html
+- tempfile: https://docs.python.org/3/library/tempfile.html
+- collections: https://docs.python.org/3/library/collections.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import time
+import hashlib
+import threading
+import tempfile
+from collections import OrderedDict
+
+from frua.base.cmd.cmd import CmdResult
+from frua.base.data.binary import codec as bincodec
+
+class CmdCache(object):
+    """
+    Cache of command results, for read-only commands (git rev-parse, uname -a, dpkg -l...)
+
+        cmdobj = Cmd(cache=CmdCache(ttl=60))
+        cmdobj.cmd('git rev-parse HEAD')  #runs the command
+        cmdobj.cmd('git rev-parse HEAD')  #cache hit, no fork
+
+    The results are cached by command line, current directory, values of the selected environment variables
+    and modification time and size of the input files. Entries expire after ttl seconds, the least recently
+    used entries are evicted beyond maxsize. With cache_dir, the results are also saved to disk and shared between runs.
+    """
+    def __init__(self, ttl:float=None, maxsize:int=128, env:list=None, cache_dir:str=None, cache_errors:bool=False, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            ttl (float, optional): lifetime of the entries, in seconds. Defaults to no expiry.
+            maxsize (int, optional): maximum number of entries in memory, None for no limit
+            env (list, optional): names of the environment variables the results depend on
+            cache_dir (str, optional): directory of the on-disk cache, None for memory only
+            cache_errors (bool, optional): also cache the results of failed commands (non zero return code)
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.env = list(env or [])
+        self.cache_dir = cache_dir
+        self.cache_errors = cache_errors
+        self.hits = 0
+        self.misses = 0
+        #key -> (expiry (time.time()), result)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def key(self, cmdline:object, cwd:str=None, inputs:list=None) -> tuple:
+        """
+        Returns the cache key of a command
+
+        Args:
+            cmdline (object): the command line, a string or a list of arguments
+            cwd (str, optional): the directory the command runs in. Defaults to the current directory.
+            inputs (list, optional): paths of the files the result depends on
+
+        Returns:
+            tuple: the key
+        """
+        args = (cmdline,) if isinstance(cmdline, str) else tuple(cmdline)
+        env = tuple((name, os.environ.get(name)) for name in self.env)
+        files = []
+        for path in inputs or []:
+            try:
+                st = os.stat(path)
+                files.append((str(path), st.st_mtime_ns, st.st_size))
+            except FileNotFoundError:
+                files.append((str(path), None, None))
+        return (args, cwd or os.getcwd(), env, tuple(files))
+
+    def _path(self, key:tuple) -> str:
+        """
+        Returns the path of the on-disk entry of a key
+
+        Args:
+            key (tuple): the key
+
+        Returns:
+            str: the path
+        """
+        return os.path.join(self.cache_dir, hashlib.sha256(repr(key).encode()).hexdigest() + '.bin')
+
+    def get(self, key:tuple) -> CmdResult:
+        """
+        Returns a cached result
+
+        Args:
+            key (tuple): the key (see key)
+
+        Returns:
+            CmdResult: a copy of the result, None if not cached or expired
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] is None or entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._copy(entry[1])
+                del self._entries[key]
+        result = None
+        if self.cache_dir is not None:
+            result = self._load(key, now)
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return self._copy(result)
+
+    @staticmethod
+    def _copy(result:CmdResult) -> CmdResult:
+        """
+        Returns a copy of a result, the callers may modify theirs (e.g. result.args.append)
+
+        Args:
+            result (CmdResult): the result
+
+        Returns:
+            CmdResult: the copy
+        """
+        args = list(result.args) if isinstance(result.args, list) else result.args
+        return CmdResult(args, result.returncode, result.stdout, result.stderr,
+            *(getattr(result, name, None) for name in ('wall', 'utime', 'stime', 'maxrss')))
+
+    def _load(self, key:tuple, now:float) -> CmdResult:
+        """
+        Load a result from the on-disk cache (and keep it in memory)
+
+        Args:
+            key (tuple): the key
+            now (float): current time.time()
+
+        Returns:
+            CmdResult: the result, None if not cached, expired or unreadable (the entry is then removed)
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                data = bincodec.load(f)
+            expires = data.pop('expires')
+            result = None if expires is not None and expires <= now else CmdResult(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, ValueError, KeyError, TypeError, AttributeError) as e:
+            #truncated or corrupted entry (or another format): a miss, the command runs again
+            self._logger.warning('Invalid cache entry %s: %s'%(path, e))
+            result = None
+        if result is None:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+        self._store(key, expires, result)
+        return result
+
+    def _store(self, key:tuple, expires:float, result:CmdResult) -> None:
+        """
+        Keep a result in memory, evicting the least recently used entries
+
+        Args:
+            key (tuple): the key
+            expires (float): expiry time (time.time()), None for no expiry
+            result (CmdResult): the result
+        """
+        with self._lock:
+            self._entries[key] = (expires, result)
+            self._entries.move_to_end(key)
+            if self.maxsize is not None:
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+
+    def set(self, key:tuple, result:CmdResult) -> bool:
+        """
+        Cache a result
+
+        Args:
+            key (tuple): the key (see key)
+            result (CmdResult): the result
+
+        Returns:
+            bool: True if cached (results of failed commands are only cached with cache_errors)
+        """
+        if result.returncode and not self.cache_errors:
+            return False
+        expires = None if self.ttl is None else time.time() + self.ttl
+        self._store(key, expires, self._copy(result))
+        if self.cache_dir is not None:
+            data = {'args': result.args, 'returncode': result.returncode, 'stdout': result.stdout, 'stderr': result.stderr,
+                'expires': expires}
+            for name in ('wall', 'utime', 'stime', 'maxrss'):
+                data[name] = getattr(result, name, None)
+            path = self._path(key)
+            #unique temporary file: other threads and processes may write the same entry
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    bincodec.dump(data, f)
+                os.replace(tmp, path)
+            except BaseException:
+                os.remove(tmp)
+                raise
+        return True
+
+    def invalidate(self, key:tuple) -> None:
+        """
+        Remove a result from the cache
+
+        Args:
+            key (tuple): the key (see key)
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+
+    def clear(self) -> None:
+        """
+        Remove all the results, on disk included
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.cache_dir is not None:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith('.bin'):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def __len__(self) -> int:
+        """
+        Number of results in memory
+
+        Returns:
+            int: number of results
+        """
+        return len(self._entries)
@@ -5,8 +5,13 @@ Uses:
 - os: https://docs.python.org/3/library/os.html
 - logging: https://docs.python.org/3/library/logging.html
 - sys: https://docs.python.org/3/library/sys.html
+- signal: https://docs.python.org/3/library/signal.html
 - subprocess: https://docs.python.org/3/library/subprocess.html
 - shlex: https://docs.python.org/3/library/shlex.html
+- time: https://docs.python.org/3/library/time.html
+- resource: https://docs.python.org/3/library/resource.html (Unix only, optional)
+- string: https://docs.python.org/3/library/string.html
+- functools: https://docs.python.org/3/library/functools.html
 """
 __author__ = 'David HEURTEVENT'
 __copyright__ = 'David HEURTEVENT'
@@ -15,8 +20,128 @@ __license__ = 'MIT'
 import os
 import logging
 import sys
+import signal
 import subprocess
 import shlex
+import time
+import string
+import functools
+
+#Unix only: no resource usage on the other platforms
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from frua.base.cmd.stream import CmdStream
+from frua.base.cmd.stats import stats as cmdstats
+
+#kinds of the parts of a CmdTemplate
+_LITERAL = 'literal'
+_FIELD = 'field'
+_FORMAT = 'format'
+
+class CmdResult(subprocess.CompletedProcess):
+    """
+    Result of a command with the resources it used
+
+    Same as subprocess.CompletedProcess with:
+    - wall: wall time, in seconds
+    - utime: user CPU time, in seconds
+    - stime: system CPU time, in seconds
+    - maxrss: max resident set size, in KB
+    """
+    def __init__(self, args:object, returncode:int, stdout:bytes=None, stderr:bytes=None, wall:float=None, utime:float=None, stime:float=None, maxrss:int=None) -> None:
+        """
+        Constructor
+
+        Args:
+            args (object): the command line
+            returncode (int): the return code
+            stdout (bytes, optional): the output
+            stderr (bytes, optional): the error output
+            wall (float, optional): wall time, in seconds
+            utime (float, optional): user CPU time, in seconds
+            stime (float, optional): system CPU time, in seconds
+            maxrss (int, optional): max resident set size, in KB
+        """
+        super().__init__(args, returncode, stdout, stderr)
+        self.wall = wall
+        self.utime = utime
+        self.stime = stime
+        self.maxrss = maxrss
+
+class _RusagePopen(subprocess.Popen):
+    """
+    Popen collecting the resource usage of the child with os.wait4 when reaping it
+
+    Without os.wait4 and resource (not on Unix), or if the child cannot be reaped by it, waits like subprocess.Popen
+    and rusage stays None.
+    """
+    rusage = None
+
+    def __init__(self, *args, start_new_session:bool=False, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            args: positional arguments of subprocess.Popen
+            start_new_session (bool, optional): run the child in its own session, kill() then kills its whole process group
+            kwargs: keyword arguments of subprocess.Popen
+        """
+        super().__init__(*args, start_new_session=start_new_session, **kwargs)
+        self.new_session = start_new_session and hasattr(os, 'killpg')
+
+    def kill(self) -> None:
+        """
+        Kill the child, and all the processes of its group if it runs in its own session (e.g. the children of a shell)
+        """
+        if self.new_session and self.returncode is None:
+            try:
+                os.killpg(self.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                #group already gone
+                pass
+            return
+        super().kill()
+
+    def wait(self, timeout:float=None) -> int:
+        """
+        Wait for the child to terminate, keeping its resource usage
+
+        Args:
+            timeout (float, optional): seconds to wait, raise subprocess.TimeoutExpired after it
+
+        Returns:
+            int: the return code
+        """
+        if self.returncode is None and resource is not None and hasattr(os, 'wait4'):
+            try:
+                #with a timeout, only reap a child already done: subprocess.Popen handles the waiting
+                pid, sts, rusage = os.wait4(self.pid, 0 if timeout is None else os.WNOHANG)
+            except ChildProcessError:
+                #child already reaped (SIGCHLD ignored): no status, no usage
+                pid = 0
+            if pid == self.pid:
+                self.rusage = rusage
+                #same as os.waitstatus_to_exitcode (Python 3.9+)
+                self.returncode = -os.WTERMSIG(sts) if os.WIFSIGNALED(sts) else os.WEXITSTATUS(sts)
+        if self.returncode is not None:
+            return self.returncode
+        return super().wait(timeout)
+
+@functools.lru_cache(maxsize=256)
+def _split(line:str) -> tuple:
+    """
+    shlex.split with a cache, command lines are often the same
+
+    Args:
+        line (str): the command line
+
+    Returns:
+        tuple: the arguments (copy to a list before changing them)
+    """
+    return tuple(shlex.split(line))
 
 class CmdLine(object):
     """
@@ -32,21 +157,28 @@ class CmdLine(object):
             line(str, optional): the command line
         """
         if line:
-            self._args = shlex.split(line)
+            self._args = list(_split(line))
 
     @property  
     def line(self) -> str:
         """
         Returns the command line
+
+        The rendering is cached until the arguments change.
         """
-        return str(shlex.join(self._args))
+        cached = self.__dict__.get('_line')
+        if cached is not None and cached[0] == self._args:
+            return cached[1]
+        line = str(shlex.join(self._args))
+        self._line = (list(self._args), line)
+        return line
     
     @line.setter
     def line(self, value:str) -> None:
         """
         Set the command line
         """
-        self._args = shlex.split(value)
+        self._args = list(_split(value))
     
     @property
     def args(self) -> list:
@@ -82,6 +214,115 @@ class CmdLine(object):
         qline = shlex.quote(line)
         return qline
 
+class CmdTemplate(object):
+    """
+    Pre-parsed command line with placeholders
+
+    The template is split with shlex once, the values are then substituted into the arguments
+    without tokenizing again: a value always stays in its argument, whatever its spaces or quotes.
+
+        template = CmdTemplate('git -C {repo} log -n {count} --format=%H {paths}')
+        template.args(repo='/my repo', count=5, paths=['a', 'b'])
+        #['git', '-C', '/my repo', 'log', '-n', '5', '--format=%H', 'a', 'b']
+
+    An argument made of a placeholder only is replaced by the value, or by its items if the value is a list or tuple.
+    Placeholders inside an argument are formatted with str.format. Literal braces are written {{ and }}.
+    """
+    def __init__(self, template:object) -> None:
+        """
+        Constructor
+
+        Args:
+            template (object): the command line template, a string or a list of arguments
+        """
+        self.template = template
+        tokens = list(_split(template)) if isinstance(template, str) else list(template)
+        #(kind, value): literal argument, whole argument placeholder (field name) or format string
+        self._parts = []
+        self.fields = set()
+        formatter = string.Formatter()
+        for token in tokens:
+            parsed = list(formatter.parse(token))
+            names = [name for _, name, _, _ in parsed if name is not None]
+            if not names:
+                self._parts.append((_LITERAL, ''.join(text for text, _, _, _ in parsed)))
+            elif len(parsed) == 1 and not parsed[0][0] and not parsed[0][2] and not parsed[0][3] and names[0].isidentifier():
+                self._parts.append((_FIELD, names[0]))
+            else:
+                self._parts.append((_FORMAT, token))
+            self.fields.update(name.split('.')[0].split('[')[0] for name in names)
+
+    def args(self, **values) -> list:
+        """
+        Returns the arguments of the command line with the placeholders substituted
+
+        Args:
+            values: the values of the placeholders
+
+        Returns:
+            list: the arguments
+
+        Raises:
+            KeyError: if a value is missing
+        """
+        args = []
+        for kind, value in self._parts:
+            if kind is _LITERAL:
+                args.append(value)
+            elif kind is _FIELD:
+                value = values[value]
+                if isinstance(value, (list, tuple)):
+                    args.extend(str(item) for item in value)
+                else:
+                    args.append(str(value))
+            else:
+                args.append(value.format_map(values))
+        return args
+
+    def cmdline(self, **values) -> CmdLine:
+        """
+        Returns the command line with the placeholders substituted
+
+        Args:
+            values: the values of the placeholders
+
+        Returns:
+            CmdLine: the command line
+        """
+        cmdline = CmdLine()
+        cmdline.args = self.args(**values)
+        return cmdline
+
+    @property
+    def line(self) -> str:
+        """
+        Returns the template as a string (cached)
+        """
+        line = self.__dict__.get('_line')
+        if line is None:
+            tokens = []
+            for kind, value in self._parts:
+                if kind is _LITERAL:
+                    tokens.append(value.replace('{', '{{').replace('}', '}}'))
+                elif kind is _FIELD:
+                    tokens.append('{%s}'%value)
+                else:
+                    tokens.append(value)
+            line = self._line = shlex.join(tokens)
+        return line
+
+    def __str__(self) -> str:
+        """
+        Returns the template string
+        """
+        return self.line
+
+    def __repr__(self) -> str:
+        """
+        Returns the template string
+        """
+        return 'CmdTemplate(%r)'%self.line
+
 class Cmd(object):
     """
     Command Object
@@ -127,7 +368,8 @@ class Cmd(object):
         else:
             raise TypeError('cmdline must be a string or a list of arguments')
 
-    def raw(self, cmdline:list=None, shell:bool=False, check:bool=False, stdout:int=None, stderr:int=None, **kwargs):
+    def raw(self, cmdline:list=None, shell:bool=False, check:bool=False, stdout:int=None, stderr:int=None, timeout:float=None,
+            start_new_session:bool=None, **kwargs):
         """
         Run a command
 
@@ -137,10 +379,13 @@ class Cmd(object):
             check (bool, optional): check for errors. Defaults to False. See subprocess documentation.
             stdout (int, optional): stdout. Defaults to subprocess.PIPE. See subprocess documentation.
             stderr (int, optional): stderr. Defaults to subprocess.PIPE. See subprocess documentation.
+            timeout (float, optional): kill the command and raise subprocess.TimeoutExpired after timeout seconds.
+            start_new_session (bool, optional): run the command in its own session: on timeout (or kill), its children are killed too.
+                Defaults to True with a timeout. The command then has no controlling terminal.
             kwargs: keyword arguments (passed to subprocess.run)
         
         Returns:
-            result: The result object from subprocess.run
+            result: CmdResult, the subprocess.CompletedProcess with the resources used (wall, utime, stime, maxrss)
         """
         if cmdline == None:
             cmdline = self.cmdlineargs
@@ -149,7 +394,41 @@ class Cmd(object):
         if 'verbose' in kwargs:
             print(f'Running command: {cmdline}')
         #executing command
-        result = subprocess.run(cmdline, capture_output=True, shell=shell, check=check, stdout=stdout, stderr=stderr)
+        start = time.monotonic()
+        children = resource.getrusage(resource.RUSAGE_CHILDREN) if resource is not None else None
+        if start_new_session is None:
+            start_new_session = timeout is not None
+        with _RusagePopen(cmdline, shell=shell, stdout=subprocess.PIPE if stdout is None else stdout,
+                stderr=subprocess.PIPE if stderr is None else stderr, start_new_session=start_new_session) as process:
+            #for kill() from another thread
+            self._process = process
+            try:
+                out, err = process.communicate(timeout=timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+                raise
+            except:
+                process.kill()
+                raise
+            finally:
+                self._process = None
+            returncode = process.poll()
+        wall = time.monotonic() - start
+        rusage = process.rusage
+        if children is None:
+            #no resource usage on this platform
+            utime, stime, maxrss = 0.0, 0.0, None
+        elif rusage is None:
+            #not reaped by wait4: children usage delta (includes other threads' children)
+            rusage = resource.getrusage(resource.RUSAGE_CHILDREN)
+            utime, stime, maxrss = rusage.ru_utime - children.ru_utime, rusage.ru_stime - children.ru_stime, None
+        else:
+            utime, stime, maxrss = rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss
+        result = CmdResult(process.args, returncode, out, err, wall, utime, stime, maxrss)
+        getattr(self, 'stats', cmdstats).record(cmdline, returncode, wall, utime, stime, maxrss)
+        if check:
+            result.check_returncode()
         #handle stdout
         if result.stdout:
             if hasattr(self, '_logger'):
@@ -165,11 +444,50 @@ class Cmd(object):
         #handle return code
         if result.returncode:
             if hasattr(self, '_logger'):
-                logging.info('return code: {result.returncode}')
+                logging.info(f'return code: {result.returncode}')
             if 'verbose' in kwargs:
                 print(f"return code: {result.returncode}")
+        #handle resources
+        if hasattr(self, '_logger'):
+            logging.info('resources: wall %.3fs, user %.3fs, sys %.3fs, max rss %s KB'%(wall, utime, stime, maxrss))
+        if 'verbose' in kwargs:
+            print('resources: wall %.3fs, user %.3fs, sys %.3fs, max rss %s KB'%(wall, utime, stime, maxrss))
         return result 
 
+    def _cached(self, stdout:int, stderr:int, inputs:list=None) -> tuple:
+        """
+        Look up the result of the command line in the cache (see Cmd(cache=CmdCache()))
+
+        Args:
+            stdout (int): stdout of the command, results are only cached when captured
+            stderr (int): stderr of the command, results are only cached when captured
+            inputs (list, optional): paths of the files the result depends on
+
+        Returns:
+            tuple: (key, cached result), key is None if the result is not cached, result None if not found
+        """
+        cache = getattr(self, 'cache', None)
+        if cache is None or stdout is not None or stderr is not None:
+            return None, None
+        key = cache.key(self.cmdlineargs, inputs=inputs)
+        result = cache.get(key)
+        if result is not None and hasattr(self, '_logger'):
+            logging.info(f'Cached command: {self.cmdlineargs}')
+        return key, result
+
+    def kill(self) -> bool:
+        """
+        Kill the command running in raw, e.g. from another thread (with its children if it runs in its own session)
+
+        Returns:
+            bool: True if a command was running
+        """
+        process = getattr(self, '_process', None)
+        if process is None:
+            return False
+        process.kill()
+        return True
+
     def cmd(self, cmdline:object=None, check:bool=False, stdout:int=None, stderr:int=None, **kwargs):
         """
         Run a command not using the shell
@@ -180,6 +498,7 @@ class Cmd(object):
             stdout (int, optional): stdout. Defaults to subprocess.PIPE. See subprocess documentation.
             stderr (int, optional): stderr. Defaults to subprocess.PIPE. See subprocess documentation.
             kwargs: keyword arguments (passed to subprocess.run)
+                inputs (list): paths of the files the result depends on, for the cache (see Cmd(cache=CmdCache()))
         
         Returns:
             result: The result object from subprocess.run
@@ -201,8 +520,17 @@ class Cmd(object):
                 raise TypeError('cmdline must be a string or a list of arguments')            
         #clean input a bit first        
             self._clean_cmdline(args)
+        #cached result: no need to run the command
+        key, result = self._cached(stdout, stderr, kwargs.get('inputs'))
+        if result is not None:
+            if check:
+                result.check_returncode()
+            return result
         #run as raw command once cleaned
-        return self.raw(self.cmdlineargs, shell=False, check=check, stdout=stdout, stderr=stderr, **kwargs)
+        result = self.raw(self.cmdlineargs, shell=False, check=check, stdout=stdout, stderr=stderr, **kwargs)
+        if key is not None:
+            self.cache.set(key, result)
+        return result
 
     def shell(self, cmdline:object=None, check:bool=False, stdout:int=None, stderr:int=None, **kwargs):
         """
@@ -238,6 +566,28 @@ class Cmd(object):
         #run as raw command once cleaned
         return self.raw(self.cmdlineargs, shell=True, check=check, stdout=stdout, stderr=stderr, **kwargs)
 
+    def stream(self, cmdline:object=None, shell:bool=False, **kwargs) -> CmdStream:
+        """
+        Stream the output of a command instead of capturing it, memory stays constant whatever the output size
+
+        Args:
+            cmdline(object, optional): the command line object. can be a string or a list of arguments (list of strings)
+            shell (bool, optional): run command in a separate shell. Defaults to False. See subprocess documentation.
+            kwargs: keyword arguments (passed to CmdStream: lines, chunk_size, tail_size, tee, tee_stderr, timeout)
+
+        Returns:
+            CmdStream: the stream, iterate over it to run the command
+        """
+        if cmdline != None:
+            #clean input a bit first
+            self._clean_cmdline(cmdline)
+        if shell:
+            #the shell runs a single string: a string is passed unchanged, a list of arguments is quoted back
+            if isinstance(cmdline, str):
+                return CmdStream(cmdline, shell=True, **kwargs)
+            return CmdStream(shlex.join(self.cmdlineargs), shell=True, **kwargs)
+        return CmdStream(self.cmdlineargs, shell=shell, **kwargs)
+
     def bash_script(self, script:str, scriptargs:list=None, shell:bool=False, check:bool=False, stdout:int=None, stderr:int=None, **kwargs):
         """
         Run a bash script
@@ -394,7 +744,7 @@ class Cmd(object):
             #handle return code
             if result.returncode:
                 if hasattr(self, '_logger'):
-                    logging.info('return code: {result.returncode}')
+                    logging.info(f'return code: {result.returncode}')
                 if 'verbose' in kwargs:
                     print(f"return code: {result.returncode}")
             return result        
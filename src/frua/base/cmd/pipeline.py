@@ -0,0 +1,268 @@
+"""
+To chain commands with OS pipes, without a shell and without buffering the intermediate data
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- time: https://docs.python.org/3/library/time.html
+- shlex: https://docs.python.org/3/library/shlex.html
+- tempfile: https://docs.python.org/3/library/tempfile.html
+- threading: https://docs.python.org/3/library/threading.html
+- selectors: https://docs.python.org/3/library/selectors.html
+- subprocess: https://docs.python.org/3/library/subprocess.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import time
+import shlex
+import tempfile
+import threading
+import selectors
+import subprocess
+
+from frua.base.cmd.cmd import CmdResult, _RusagePopen
+from frua.base.cmd.stats import stats as cmdstats
+
+class CmdPipeline(object):
+    """
+    Pipeline of commands: the stdout of each command is the stdin of the next one
+
+        result = CmdPipeline(['zcat dump.sql.gz', ['grep', 'INSERT'], 'wc -l']).run()
+        #same as the shell pipeline zcat dump.sql.gz | grep INSERT | wc -l
+
+    The data flows through kernel pipes between the commands, only the output of the last command is captured
+    (or written to a file). The result has the stderr, return code, timings and resources of each stage.
+    """
+    def __init__(self, cmdlines:list=None, pipefail:bool=False, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            cmdlines (list, optional): the command lines (strings or lists of arguments)
+            pipefail (bool, optional): the return code of the pipeline is the last non zero return code of the stages
+                (as bash set -o pipefail). Defaults to False: the return code of the last stage.
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.pipefail = pipefail
+        self.stages = []
+        for cmdline in cmdlines or []:
+            self.pipe(cmdline)
+
+    def pipe(self, cmdline:object):
+        """
+        Add a command at the end of the pipeline
+
+        Args:
+            cmdline (object): the command line, a string (split with shlex) or a list of arguments
+
+        Returns:
+            CmdPipeline: the pipeline, to chain calls
+        """
+        if isinstance(cmdline, str):
+            args = shlex.split(cmdline)
+        elif isinstance(cmdline, (list, tuple)):
+            args = [str(arg) for arg in cmdline]
+        else:
+            raise TypeError('cmdline must be a string or a list of arguments')
+        if not args:
+            raise ValueError('empty command line')
+        self.stages.append(args)
+        return self
+
+    def __or__(self, cmdline:object):
+        """
+        pipeline | cmdline: same as pipe
+        """
+        return self.pipe(cmdline)
+
+    def __len__(self) -> int:
+        """
+        Number of stages
+
+        Returns:
+            int: number of stages
+        """
+        return len(self.stages)
+
+    @staticmethod
+    def _kill(procs:list) -> None:
+        """
+        Kill the running stages
+
+        Args:
+            procs (list): the processes
+        """
+        for proc in procs:
+            if proc.returncode is None:
+                try:
+                    proc.kill()
+                except ProcessLookupError:
+                    pass
+
+    @staticmethod
+    def _feed(pipe, data:bytes) -> None:
+        """
+        Write the input of the first stage and close its stdin
+
+        Args:
+            pipe (file): stdin of the first stage
+            data (bytes): the input
+        """
+        try:
+            pipe.write(data)
+        except BrokenPipeError:
+            pass
+        finally:
+            try:
+                pipe.close()
+            except BrokenPipeError:
+                pass
+
+    def run(self, input:bytes=None, stdin:object=None, stdout:object=None, timeout:float=None, check:bool=False, **kwargs) -> CmdResult:
+        """
+        Run the pipeline
+
+        Args:
+            input (bytes, optional): data sent to the stdin of the first stage
+            stdin (object, optional): stdin of the first stage (file object or file descriptor). Defaults to no input.
+            stdout (object, optional): stdout of the last stage (file object or file descriptor). Defaults to captured in the result.
+            timeout (float, optional): kill the stages and raise subprocess.TimeoutExpired after timeout seconds
+            check (bool, optional): raise subprocess.CalledProcessError if the pipeline fails. Defaults to False.
+            kwargs: keyword arguments
+
+        Returns:
+            CmdResult: the result of the pipeline with:
+            - stdout: the output of the last stage (None if redirected)
+            - stderr: the error outputs of the stages, concatenated
+            - stages: the results of the stages (CmdResult with returncode, stderr, wall, utime, stime, maxrss)
+            - returncodes: the return codes of the stages
+        """
+        if not self.stages:
+            raise ValueError('empty pipeline')
+        if input is not None and stdin is not None:
+            raise ValueError('stdin and input arguments may not both be used')
+        self._logger.info('Running pipeline: %s'%' | '.join(shlex.join(args) for args in self.stages))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        start = time.monotonic()
+        procs = []
+        errs = []
+        ends = [None] * len(self.stages)
+        waiters = []
+        feeder = None
+        try:
+            prev = subprocess.PIPE if input is not None else (subprocess.DEVNULL if stdin is None else stdin)
+            for i, args in enumerate(self.stages):
+                last = i == len(self.stages) - 1
+                err = tempfile.TemporaryFile()
+                errs.append(err)
+                proc = _RusagePopen(args, stdin=prev, stderr=err,
+                    stdout=(subprocess.PIPE if stdout is None else stdout) if last else subprocess.PIPE)
+                procs.append(proc)
+                if i > 0:
+                    #only the next stage holds the read end: the previous stage gets SIGPIPE if it exits early
+                    procs[i - 1].stdout.close()
+                prev = proc.stdout
+            if input is not None:
+                feeder = threading.Thread(target=self._feed, args=(procs[0].stdin, input), daemon=True)
+                feeder.start()
+            #reap each stage as soon as it exits, with its resource usage
+            def waiter(i, proc):
+                proc.wait()
+                ends[i] = time.monotonic()
+            waiters = [threading.Thread(target=waiter, args=(i, proc), daemon=True) for i, proc in enumerate(procs)]
+            for thread in waiters:
+                thread.start()
+            out = None
+            if stdout is None:
+                out = self._read(procs[-1].stdout, deadline)
+                if out is None:
+                    self._kill(procs)
+                    raise subprocess.TimeoutExpired(self.stages, timeout)
+                procs[-1].stdout.close()
+            for thread in waiters:
+                thread.join(None if deadline is None else max(deadline - time.monotonic(), 0))
+                if thread.is_alive():
+                    self._kill(procs)
+                    raise subprocess.TimeoutExpired(self.stages, timeout)
+        except BaseException:
+            self._kill(procs)
+            for i, proc in enumerate(procs):
+                if i < len(waiters) and waiters[i].ident is not None:
+                    #reaped by its waiter: a second wait here would race with its wait4
+                    waiters[i].join()
+                else:
+                    proc.wait()
+                #stdin of the first stage is closed by the feeder
+                if proc.stdout is not None:
+                    proc.stdout.close()
+            for err in errs:
+                err.close()
+            raise
+        finally:
+            if feeder is not None:
+                feeder.join()
+        #results of the stages
+        stages = []
+        for i, (args, proc, err) in enumerate(zip(self.stages, procs, errs)):
+            err.seek(0)
+            stderr = err.read()
+            err.close()
+            rusage = proc.rusage
+            utime, stime, maxrss = (rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss) if rusage is not None else (None, None, None)
+            stage = CmdResult(args, proc.returncode, None, stderr, ends[i] - start, utime, stime, maxrss)
+            stages.append(stage)
+            getattr(self, 'stats', cmdstats).record(args, stage.returncode, stage.wall, utime or 0.0, stime or 0.0, maxrss or 0)
+        returncodes = [stage.returncode for stage in stages]
+        returncode = returncodes[-1]
+        if self.pipefail:
+            failed = [code for code in returncodes if code]
+            returncode = failed[-1] if failed else 0
+        result = CmdResult(self.stages, returncode, out, b''.join(stage.stderr for stage in stages),
+            max(ends) - start,
+            sum(stage.utime or 0.0 for stage in stages),
+            sum(stage.stime or 0.0 for stage in stages),
+            max(stage.maxrss or 0 for stage in stages))
+        result.stages = stages
+        result.returncodes = returncodes
+        self._logger.info('Pipeline return codes: %s, wall %.3fs'%(returncodes, result.wall))
+        if check:
+            result.check_returncode()
+        return result
+
+    @staticmethod
+    def _read(pipe, deadline:float) -> bytes:
+        """
+        Read a pipe until EOF
+
+        Args:
+            pipe (file): the pipe
+            deadline (float): time.monotonic() deadline, None for no deadline
+
+        Returns:
+            bytes: the data, None on timeout
+        """
+        chunks = []
+        with selectors.DefaultSelector() as selector:
+            selector.register(pipe, selectors.EVENT_READ)
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                if not selector.select(remaining):
+                    continue
+                data = os.read(pipe.fileno(), 65536)
+                if not data:
+                    return b''.join(chunks)
+                chunks.append(data)
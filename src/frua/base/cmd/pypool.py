@@ -0,0 +1,369 @@
+"""
+To run Python snippets and scripts in a pool of warm Python workers instead of a new interpreter each time
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- sys: https://docs.python.org/3/library/sys.html
+- signal: https://docs.python.org/3/library/signal.html
+- time: https://docs.python.org/3/library/time.html
+- pickle: https://docs.python.org/3/library/pickle.html
+- struct: https://docs.python.org/3/library/struct.html
+- queue: https://docs.python.org/3/library/queue.html
+- selectors: https://docs.python.org/3/library/selectors.html
+- subprocess: https://docs.python.org/3/library/subprocess.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import sys
+import signal
+import time
+import pickle
+import struct
+import queue
+import selectors
+import subprocess
+
+#code run by the workers (python -c), the arguments are the modules to preload
+#the worker talks to the pool over copies of its stdin/stdout, fds 1 and 2 are redirected
+#to temporary files while a task runs to capture its output, child processes included
+_WORKER = r'''
+import os, sys, pickle, struct, runpy, traceback, resource, tempfile, importlib
+
+def main():
+    rfd, wfd = os.dup(0), os.dup(1)
+    null = os.open(os.devnull, os.O_RDWR)
+    os.dup2(null, 0)
+    os.dup2(null, 1)
+    rf, wf = os.fdopen(rfd, 'rb'), os.fdopen(wfd, 'wb')
+
+    def send(obj):
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+        wf.write(struct.pack('!I', len(data)) + data)
+        wf.flush()
+
+    def dump(f):
+        f.seek(0)
+        return f.read()
+
+    try:
+        for name in sys.argv[1:]:
+            importlib.import_module(name)
+    except BaseException:
+        send(('error', traceback.format_exc()))
+        return
+    send(('ready', os.getpid()))
+    err_fd = os.dup(2)
+    out, err = tempfile.TemporaryFile(), tempfile.TemporaryFile()
+    cwd, argv, path = os.getcwd(), list(sys.argv), list(sys.path)
+    while True:
+        head = rf.read(4)
+        if len(head) < 4:
+            return
+        kind, target, args = pickle.loads(rf.read(struct.unpack('!I', head)[0]))
+        for f in (out, err):
+            f.seek(0)
+            f.truncate()
+        os.dup2(out.fileno(), 1)
+        os.dup2(err.fileno(), 2)
+        returncode = 0
+        try:
+            if kind == 'code':
+                sys.argv = ['-c'] + args
+                exec(compile(target, '<string>', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})
+            else:
+                sys.argv = [target] + args
+                sys.path.insert(0, os.path.dirname(os.path.abspath(target)))
+                runpy.run_path(target, run_name='__main__')
+        except SystemExit as e:
+            if e.code is None:
+                returncode = 0
+            elif isinstance(e.code, int):
+                returncode = e.code
+            else:
+                print(e.code, file=sys.stderr)
+                returncode = 1
+        except BaseException:
+            traceback.print_exc()
+            returncode = 1
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(null, 1)
+        os.dup2(err_fd, 2)
+        os.chdir(cwd)
+        sys.argv = list(argv)
+        sys.path[:] = path
+        send((returncode, dump(out), dump(err), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss))
+
+main()
+'''
+
+class _PyWorker(object):
+    """
+    A Python worker process of a pool
+    """
+    def __init__(self, preload:list) -> None:
+        """
+        Constructor, starts the worker
+
+        Args:
+            preload (list): modules imported by the worker when it starts
+        """
+        self.proc = subprocess.Popen([sys.executable, '-c', _WORKER] + list(preload),
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, bufsize=0, start_new_session=True)
+        self.tasks = 0
+        self.maxrss = 0
+        self.ready = False
+
+    def _recv(self, deadline:float) -> object:
+        """
+        Read a message from the worker
+
+        Args:
+            deadline (float): time.monotonic() deadline, None for no deadline
+
+        Returns:
+            object: the message, None if the worker died
+        """
+        buf = bytearray()
+        size = None
+        with selectors.DefaultSelector() as selector:
+            selector.register(self.proc.stdout, selectors.EVENT_READ)
+            while size is None or len(buf) < size + 4:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise subprocess.TimeoutExpired(None, None)
+                if not selector.select(remaining):
+                    continue
+                data = os.read(self.proc.stdout.fileno(), 65536 if size is None else max(size + 4 - len(buf), 1))
+                if not data:
+                    return None
+                buf += data
+                if size is None and len(buf) >= 4:
+                    size = struct.unpack('!I', buf[:4])[0]
+        return pickle.loads(buf[4:])
+
+    def run(self, kind:str, target:str, args:list, deadline:float) -> tuple:
+        """
+        Run a task
+
+        Args:
+            kind (str): 'code' or 'script'
+            target (str): the code or the path of the script
+            args (list): the arguments (sys.argv[1:])
+            deadline (float): time.monotonic() deadline, None for no deadline
+
+        Returns:
+            tuple: (returncode, stdout, stderr), None if the worker died
+        """
+        if not self.ready:
+            msg = self._recv(deadline)
+            if msg is None:
+                return None
+            if msg[0] == 'error':
+                raise ImportError('Python worker failed to preload modules:\n%s'%msg[1])
+            self.ready = True
+        data = pickle.dumps((kind, target, list(args)), pickle.HIGHEST_PROTOCOL)
+        try:
+            self.proc.stdin.write(struct.pack('!I', len(data)) + data)
+        except BrokenPipeError:
+            return None
+        msg = self._recv(deadline)
+        if msg is None:
+            return None
+        self.tasks += 1
+        self.maxrss = msg[3]
+        return msg[:3]
+
+    def close(self, kill:bool=False) -> int:
+        """
+        Stop the worker
+
+        Args:
+            kill (bool, optional): kill it instead of letting it exit
+
+        Returns:
+            int: the return code of the worker
+        """
+        self.proc.stdin.close()
+        returncode = None
+        if not kill:
+            try:
+                returncode = self.proc.wait(1)
+            except subprocess.TimeoutExpired:
+                pass
+        if returncode is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            returncode = self.proc.wait()
+        self.proc.stdout.close()
+        return returncode
+
+class PyPool(object):
+    """
+    Pool of warm Python workers
+
+    Same python and python_script methods as Cmd, returning a subprocess.CompletedProcess
+    with the captured stdout and stderr:
+
+        pool = PyPool(size=4, preload=['json'])
+        result = pool.python('import json; print(json.dumps([1]))')
+
+    Each task runs with fresh globals in a worker, modules imported by a task stay imported for
+    the next tasks of the worker. The current directory, sys.argv and sys.path are restored after each task.
+    Workers are replaced after max_tasks tasks or when their max RSS reaches max_rss.
+    """
+    def __init__(self, size:int=None, preload:list=None, max_tasks:int=100, max_rss:int=None, timeout:float=None, *args, **kwargs) -> None:
+        """
+        Constructor, starts the workers
+
+        Args:
+            size (int, optional): number of workers. Defaults to the number of CPUs.
+            preload (list, optional): modules imported by the workers when they start
+            max_tasks (int, optional): number of tasks after which a worker is replaced, None for no limit
+            max_rss (int, optional): max resident set size (in KB) after which a worker is replaced, None for no limit
+            timeout (float, optional): default timeout of the tasks, in seconds
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.size = size or os.cpu_count() or 1
+        self.preload = list(preload or [])
+        self.max_tasks = max_tasks
+        self.max_rss = max_rss
+        self.timeout = timeout
+        #number of workers started, replacements included
+        self.started = 0
+        self._workers = queue.Queue()
+        self._closed = False
+        for _ in range(self.size):
+            self._workers.put(self._start())
+
+    def _start(self) -> _PyWorker:
+        """
+        Start a worker
+
+        Returns:
+            _PyWorker: the worker
+        """
+        self.started += 1
+        return _PyWorker(self.preload)
+
+    def _run(self, kind:str, target:str, args:list, resultargs:list, timeout:float, check:bool) -> subprocess.CompletedProcess:
+        """
+        Run a task on a free worker (waiting for one if needed)
+
+        Args:
+            kind (str): 'code' or 'script'
+            target (str): the code or the path of the script
+            args (list): the arguments
+            resultargs (list): the equivalent command line, for the result
+            timeout (float): timeout in seconds
+            check (bool): raise subprocess.CalledProcessError if the task fails
+
+        Returns:
+            result: subprocess.CompletedProcess
+        """
+        if self._closed:
+            raise RuntimeError('the pool is closed')
+        if timeout is None:
+            timeout = self.timeout
+        deadline = None if timeout is None else time.monotonic() + timeout
+        self._logger.info(f'Running in Python worker: {resultargs}')
+        worker = self._workers.get()
+        try:
+            output = worker.run(kind, target, args or [], deadline)
+        except subprocess.TimeoutExpired:
+            self._logger.error(f'Python worker timed out after {timeout} seconds: {resultargs}')
+            worker.close(kill=True)
+            self._workers.put(self._start())
+            raise subprocess.TimeoutExpired(resultargs, timeout)
+        except BaseException:
+            worker.close(kill=True)
+            self._workers.put(self._start())
+            raise
+        if output is None:
+            #the worker died (os._exit, crash...): its status is the status of the task
+            returncode = worker.close(kill=True)
+            self._logger.error(f'Python worker died with return code {returncode}: {resultargs}')
+            output = (returncode, b'', b'')
+            worker = self._start()
+        elif (self.max_tasks and worker.tasks >= self.max_tasks) or (self.max_rss and worker.maxrss >= self.max_rss):
+            self._logger.info('Recycling Python worker after %s tasks (max rss %s KB)'%(worker.tasks, worker.maxrss))
+            worker.close()
+            worker = self._start()
+        self._workers.put(worker)
+        result = subprocess.CompletedProcess(resultargs, *output)
+        if result.returncode:
+            self._logger.info(f'return code: {result.returncode}')
+            if check:
+                result.check_returncode()
+        return result
+
+    def python(self, command:str, args:list=None, timeout:float=None, check:bool=False, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Run a python command
+
+        Args:
+            command (str): the python command to execute
+            args (list, optional): the arguments (sys.argv[1:])
+            timeout (float, optional): kill the worker and raise subprocess.TimeoutExpired after timeout seconds. Defaults to the pool timeout.
+            check (bool, optional): raise subprocess.CalledProcessError if the command fails. Defaults to False.
+            kwargs: keyword arguments
+
+        Returns:
+            result: subprocess.CompletedProcess
+        """
+        args = list(args or [])
+        return self._run('code', command, args, [sys.executable, '-c', command] + args, timeout, check)
+
+    def python_script(self, script:str, scriptargs:list=None, timeout:float=None, check:bool=False, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Run a python script
+
+        Args:
+            script (str): the path to the python script
+            scriptargs (list, optional): the arguments to the python script
+            timeout (float, optional): kill the worker and raise subprocess.TimeoutExpired after timeout seconds. Defaults to the pool timeout.
+            check (bool, optional): raise subprocess.CalledProcessError if the script fails. Defaults to False.
+            kwargs: keyword arguments
+
+        Returns:
+            result: subprocess.CompletedProcess
+        """
+        scriptargs = list(scriptargs or [])
+        return self._run('script', script, scriptargs, [sys.executable, script] + scriptargs, timeout, check)
+
+    def close(self) -> None:
+        """
+        Stop the workers (waits for the running tasks)
+        """
+        if self._closed:
+            return
+        self._closed = True
+        for _ in range(self.size):
+            self._workers.get().close()
+
+    def __enter__(self):
+        """
+        Context manager: the workers are stopped on exit
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Context manager exit
+        """
+        self.close()
@@ -0,0 +1,237 @@
+"""
+To run many commands in one long-lived shell instead of spawning a shell per command
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- signal: https://docs.python.org/3/library/signal.html
+- time: https://docs.python.org/3/library/time.html
+- secrets: https://docs.python.org/3/library/secrets.html
+- selectors: https://docs.python.org/3/library/selectors.html
+- shlex: https://docs.python.org/3/library/shlex.html
+- subprocess: https://docs.python.org/3/library/subprocess.html
+- threading: https://docs.python.org/3/library/threading.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import signal
+import time
+import secrets
+import selectors
+import shlex
+import subprocess
+import threading
+
+class CmdSession(object):
+    """
+    Persistent shell session
+
+    The commands are written to the stdin of one shell process and run with eval, so the shell state
+    (current directory, variables, functions) is kept between commands. The end of the output of each
+    command is found with a random sentinel line carrying its exit status.
+
+        with CmdSession() as session:
+            session.run('cd /tmp')
+            result = session.run('ls')
+
+    A command timing out kills the shell, which is restarted (with a fresh state) on the next command,
+    as is a shell that died (e.g. after an exit command).
+    """
+    def __init__(self, shell:list=None, timeout:float=None, env:dict=None, cwd:str=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            shell (list, optional): the shell command line. Defaults to ['bash', '--noprofile', '--norc'].
+            timeout (float, optional): default timeout of the commands, in seconds
+            env (dict, optional): environment of the shell
+            cwd (str, optional): initial working directory of the shell
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.shell = shell or ['bash', '--noprofile', '--norc']
+        self.timeout = timeout
+        self.env = env
+        self.cwd = cwd
+        #number of times the shell was (re)started
+        self.starts = 0
+        self._proc = None
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self) -> int:
+        """
+        Returns the pid of the shell
+
+        Returns:
+            int: the pid, None if the shell is not running
+        """
+        if self.alive:
+            return self._proc.pid
+        return None
+
+    @property
+    def alive(self) -> bool:
+        """
+        Check if the shell is running
+
+        Returns:
+            bool: True if the shell is running
+        """
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        """
+        Start the shell (the running one is stopped first)
+        """
+        self.close()
+        self._proc = subprocess.Popen(self.shell, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            bufsize=0, env=self.env, cwd=self.cwd, start_new_session=True)
+        self.starts += 1
+        self._logger.info('Started shell session %s (pid %s)'%(self.shell, self._proc.pid))
+
+    def close(self) -> None:
+        """
+        Stop the shell, killing the commands still running
+        """
+        proc = self._proc
+        if proc is None:
+            return
+        self._proc = None
+        if proc.poll() is None:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        proc.wait()
+        for pipe in (proc.stdin, proc.stdout, proc.stderr):
+            pipe.close()
+
+    def __enter__(self):
+        """
+        Context manager: the shell is stopped on exit
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Context manager exit
+        """
+        self.close()
+
+    def __del__(self) -> None:
+        """
+        Stop the shell when the session is garbage collected
+        """
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    def _read(self, proc:subprocess.Popen, marker:bytes, timeout:float) -> tuple:
+        """
+        Read the output of a command up to the sentinels
+
+        Args:
+            proc (subprocess.Popen): the shell
+            marker (bytes): the sentinel
+            timeout (float): timeout in seconds
+
+        Returns:
+            tuple: (returncode, stdout, stderr), returncode is None if the shell died
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        #the sentinels are written at the start of a line, with the exit status on stdout
+        end = {'stdout': b'\n' + marker + b' ', 'stderr': b'\n' + marker + b'\n'}
+        bufs = {'stdout': bytearray(), 'stderr': bytearray()}
+        found = {}
+        returncode = None
+        with selectors.DefaultSelector() as selector:
+            selector.register(proc.stdout, selectors.EVENT_READ, 'stdout')
+            selector.register(proc.stderr, selectors.EVENT_READ, 'stderr')
+            while selector.get_map():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise subprocess.TimeoutExpired(None, timeout)
+                for key, _ in selector.select(remaining):
+                    name = key.data
+                    buf = bufs[name]
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        #the shell died
+                        selector.unregister(key.fileobj)
+                        continue
+                    #only search the new data (and the end of the previous one)
+                    start = max(len(buf) - len(end[name]), 0)
+                    buf += data
+                    pos = buf.find(end[name], start)
+                    if pos < 0:
+                        continue
+                    if name == 'stdout':
+                        eol = buf.find(b'\n', pos + len(end[name]))
+                        if eol < 0:
+                            continue
+                        returncode = int(buf[pos + len(end[name]):eol])
+                    found[name] = pos
+                    selector.unregister(key.fileobj)
+        if len(found) < 2:
+            return None, bytes(bufs['stdout']), bytes(bufs['stderr'])
+        return returncode, bytes(bufs['stdout'][:found['stdout']]), bytes(bufs['stderr'][:found['stderr']])
+
+    def run(self, command:str, timeout:float=None, check:bool=False, **kwargs) -> subprocess.CompletedProcess:
+        """
+        Run a command in the session
+
+        The command does not read the stdin of the session (it reads /dev/null).
+
+        Args:
+            command (str): the shell command
+            timeout (float, optional): kill the shell and raise subprocess.TimeoutExpired after timeout seconds. Defaults to the session timeout.
+            check (bool, optional): raise subprocess.CalledProcessError if the command fails. Defaults to False.
+            kwargs: keyword arguments
+
+        Returns:
+            result: subprocess.CompletedProcess
+        """
+        if timeout is None:
+            timeout = self.timeout
+        marker = ('__frua_%s__'%secrets.token_hex(8)).encode()
+        #a leading new line makes the sentinels start a line even after output without final new line
+        script = ('{ eval %s\n} </dev/null\nprintf "\\n%%s %%d\\n" %s $?\nprintf "\\n%%s\\n" %s >&2\n'
+            %(shlex.quote(command), marker.decode(), marker.decode())).encode()
+        with self._lock:
+            if not self.alive:
+                self.start()
+            proc = self._proc
+            self._logger.info(f'Running command in session: {command}')
+            try:
+                proc.stdin.write(script)
+                returncode, stdout, stderr = self._read(proc, marker, timeout)
+            except subprocess.TimeoutExpired:
+                self._logger.error(f'Command timed out after {timeout} seconds, restarting the session: {command}')
+                self.close()
+                raise subprocess.TimeoutExpired(command, timeout)
+            except BrokenPipeError:
+                returncode, stdout, stderr = None, b'', b''
+            if returncode is None:
+                #the shell died during the command: the status of the shell is the status of the command
+                returncode = proc.wait()
+                self._logger.error(f'Shell session died with return code {returncode}: {command}')
+                self.close()
+        result = subprocess.CompletedProcess(command, returncode, stdout, stderr)
+        if result.returncode:
+            self._logger.info(f'return code: {result.returncode}')
+            if check:
+                result.check_returncode()
+        return result
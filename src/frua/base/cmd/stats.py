@@ -0,0 +1,185 @@
+"""
+In-process registry of the resources used by the commands
+
+Uses:
+- json: https://docs.python.org/3/library/json.html
+- shlex: https://docs.python.org/3/library/shlex.html
+- threading: https://docs.python.org/3/library/threading.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import json
+import shlex
+import threading
+
+#aggregated fields, summed over the runs of a command
+_SUMS = ('wall', 'utime', 'stime')
+#key of the commands recorded once the registry is full
+OTHER = '<other>'
+
+class CmdStats(object):
+    """
+    Resources used by the commands, aggregated by command line
+
+    For each command: number of runs, failed runs, total and max wall time, total user and system CPU time,
+    max of the max resident set size (in KB).
+
+    The registry holds at most max_entries commands: once full, the runs of the new commands are aggregated
+    under the OTHER key, so the totals stay right and a long-running process does not grow it without bound.
+    """
+    def __init__(self, key=None, max_entries:int=1000, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            key (callable, optional): returns the aggregation key of a command line (list of arguments or string).
+                Defaults to the whole command line, use e.g. lambda args: args[0] to aggregate by executable.
+            max_entries (int, optional): maximum number of commands, the OTHER entry excluded. None for no limit.
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        self.key = key
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def _key(self, cmdline:object) -> str:
+        """
+        Returns the aggregation key of a command line
+
+        Args:
+            cmdline (object): the command line, a string or a list of arguments
+
+        Returns:
+            str: the key
+        """
+        if self.key is not None:
+            return self.key(cmdline)
+        if isinstance(cmdline, (list, tuple)):
+            return shlex.join(str(arg) for arg in cmdline)
+        return str(cmdline)
+
+    def record(self, cmdline:object, returncode:int=0, wall:float=0.0, utime:float=0.0, stime:float=0.0, maxrss:int=0) -> None:
+        """
+        Record a run of a command
+
+        Args:
+            cmdline (object): the command line, a string or a list of arguments
+            returncode (int, optional): the return code
+            wall (float, optional): the wall time, in seconds
+            utime (float, optional): the user CPU time, in seconds
+            stime (float, optional): the system CPU time, in seconds
+            maxrss (int, optional): the max resident set size, in KB
+        """
+        key = self._key(cmdline)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.max_entries is not None and len(self._entries) - (OTHER in self._entries) >= self.max_entries:
+                key = OTHER
+                entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = {'cmdline': key, 'count': 0, 'failed': 0, 'wall': 0.0, 'wall_max': 0.0,
+                    'utime': 0.0, 'stime': 0.0, 'maxrss': 0}
+            entry['count'] += 1
+            if returncode:
+                entry['failed'] += 1
+            entry['wall'] += wall
+            entry['wall_max'] = max(entry['wall_max'], wall)
+            entry['utime'] += utime
+            entry['stime'] += stime
+            entry['maxrss'] = max(entry['maxrss'], maxrss or 0)
+
+    def get(self, cmdline:object) -> dict:
+        """
+        Returns the aggregated resources of a command
+
+        Args:
+            cmdline (object): the command line (or key)
+
+        Returns:
+            dict: the resources, None if the command never ran
+        """
+        with self._lock:
+            entry = self._entries.get(cmdline if isinstance(cmdline, str) else self._key(cmdline))
+            return None if entry is None else dict(entry)
+
+    def top(self, n:int=10, by:str='wall') -> list:
+        """
+        Returns the commands using the most of a resource
+
+        Args:
+            n (int, optional): number of commands
+            by (str, optional): the field to sort by: count, failed, wall, wall_max, utime, stime, cpu (utime + stime) or maxrss
+
+        Returns:
+            list: the aggregated resources (dicts) of the commands, highest first
+        """
+        if by == 'cpu':
+            sort_key = lambda entry: entry['utime'] + entry['stime']
+        else:
+            sort_key = lambda entry: entry[by]
+        with self._lock:
+            entries = [dict(entry) for entry in self._entries.values()]
+        return sorted(entries, key=sort_key, reverse=True)[:n]
+
+    def totals(self) -> dict:
+        """
+        Returns the resources used by all the commands
+
+        Returns:
+            dict: count, failed, wall, utime, stime and maxrss over all the commands
+        """
+        totals = {'count': 0, 'failed': 0, 'wall': 0.0, 'utime': 0.0, 'stime': 0.0, 'maxrss': 0}
+        with self._lock:
+            for entry in self._entries.values():
+                for field in ('count', 'failed') + _SUMS:
+                    totals[field] += entry[field]
+                totals['maxrss'] = max(totals['maxrss'], entry['maxrss'])
+        return totals
+
+    def to_dict(self) -> dict:
+        """
+        Returns the aggregated resources of all the commands
+
+        Returns:
+            dict: the resources by command line
+        """
+        with self._lock:
+            return {key: dict(entry) for key, entry in self._entries.items()}
+
+    def to_json(self, indent:int=None) -> str:
+        """
+        Returns the aggregated resources of all the commands as JSON
+
+        Args:
+            indent (int, optional): JSON indentation
+
+        Returns:
+            str: JSON object with the totals and the commands, sorted by total wall time
+        """
+        return json.dumps({'totals': self.totals(), 'commands': self.top(len(self))}, indent=indent)
+
+    def reset(self) -> None:
+        """
+        Forget all the recorded runs
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """
+        Number of distinct commands
+
+        Returns:
+            int: number of commands
+        """
+        return len(self._entries)
+
+#default registry, used by Cmd
+stats = CmdStats()
@@ -0,0 +1,218 @@
+"""
+To stream the output of long-running commands in constant memory
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- signal: https://docs.python.org/3/library/signal.html
+- time: https://docs.python.org/3/library/time.html
+- selectors: https://docs.python.org/3/library/selectors.html
+- subprocess: https://docs.python.org/3/library/subprocess.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import signal
+import time
+import selectors
+import subprocess
+
+class CmdStream(object):
+    """
+    Output stream of a command
+
+    Iterating yields (name, data) tuples as the output arrives, name being 'stdout' or 'stderr'.
+    The pipes are only read when the next item is requested: a slow consumer blocks the command
+    once the pipe buffer is full instead of buffering its output in memory.
+
+        with CmdStream(['find', '/']) as stream:
+            for name, line in stream:
+                ...
+        print(stream.returncode, stream.tail('stderr'))
+
+    Only the last tail_size bytes of each stream are kept in memory (see tail).
+    """
+    def __init__(self, cmdline:object, shell:bool=False, lines:bool=True, chunk_size:int=65536, tail_size:int=65536, tee:object=None, tee_stderr:object=None, timeout:float=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            cmdline (object): the command line, a string or a list of arguments. See subprocess documentation.
+            shell (bool, optional): run command in a separate shell. Defaults to False. See subprocess documentation.
+            lines (bool, optional): yield lines (lines longer than chunk_size are split). Defaults to True, else raw chunks.
+            chunk_size (int, optional): size of the reads from the pipes
+            tail_size (int, optional): number of bytes of each stream kept in memory
+            tee (object, optional): path or binary file object to copy stdout to
+            tee_stderr (object, optional): path or binary file object to copy stderr to
+            timeout (float, optional): kill the command and raise subprocess.TimeoutExpired after timeout seconds
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.cmdline = cmdline
+        self.shell = shell
+        self.lines = lines
+        self.chunk_size = chunk_size
+        self.tail_size = tail_size
+        self.timeout = timeout
+        self.returncode = None
+        self.sizes = {'stdout': 0, 'stderr': 0}
+        self._tails = {'stdout': bytearray(), 'stderr': bytearray()}
+        self._tees = {'stdout': tee, 'stderr': tee_stderr}
+        #files opened by the stream, closed with it
+        self._opened = []
+        self._proc = None
+
+    def _open_tees(self) -> None:
+        """
+        Open the tee files given as paths
+        """
+        for name, tee in self._tees.items():
+            if isinstance(tee, (str, os.PathLike)):
+                tee = open(tee, 'wb')
+                self._opened.append(tee)
+                self._tees[name] = tee
+
+    def _record(self, name:str, data:bytes) -> None:
+        """
+        Copy output data to the tail buffer and the tee file of its stream
+
+        Args:
+            name (str): 'stdout' or 'stderr'
+            data (bytes): the data
+        """
+        self.sizes[name] += len(data)
+        tail = self._tails[name]
+        tail += data
+        if len(tail) > self.tail_size:
+            del tail[:len(tail) - self.tail_size]
+        tee = self._tees[name]
+        if tee is not None:
+            tee.write(data)
+
+    def __iter__(self):
+        """
+        Start the command and iterate over its output
+
+        Yields:
+            tuple: (name, data), name being 'stdout' or 'stderr'
+        """
+        if self._proc is not None:
+            raise RuntimeError('the command of a stream can only run once')
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        self._open_tees()
+        self._logger.info(f'Streaming command: {self.cmdline}')
+        self._proc = proc = subprocess.Popen(self.cmdline, shell=self.shell, stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=0, start_new_session=True)
+        try:
+            pending = {'stdout': b'', 'stderr': b''}
+            with selectors.DefaultSelector() as selector:
+                selector.register(proc.stdout, selectors.EVENT_READ, 'stdout')
+                selector.register(proc.stderr, selectors.EVENT_READ, 'stderr')
+                while selector.get_map():
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise subprocess.TimeoutExpired(self.cmdline, self.timeout)
+                    for key, _ in selector.select(remaining):
+                        name = key.data
+                        data = os.read(key.fd, self.chunk_size)
+                        if not data:
+                            selector.unregister(key.fileobj)
+                            if pending[name]:
+                                yield name, pending[name]
+                                pending[name] = b''
+                            continue
+                        self._record(name, data)
+                        if not self.lines:
+                            yield name, data
+                            continue
+                        parts = (pending[name] + data).split(b'\n')
+                        rest = parts.pop()
+                        for part in parts:
+                            yield name, part + b'\n'
+                        #bound the memory used by a line without end
+                        if len(rest) >= self.chunk_size:
+                            yield name, rest
+                            rest = b''
+                        pending[name] = rest
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                self.returncode = proc.wait(remaining)
+            except subprocess.TimeoutExpired:
+                raise subprocess.TimeoutExpired(self.cmdline, self.timeout)
+        finally:
+            self.close()
+        self._logger.info('Command %s exited with %s (stdout: %s bytes, stderr: %s bytes)'
+            %(self.cmdline, self.returncode, self.sizes['stdout'], self.sizes['stderr']))
+
+    def close(self) -> None:
+        """
+        Kill the command if still running (with its children) and close the pipes and tee files
+        """
+        proc = self._proc
+        if proc is not None:
+            if proc.poll() is None:
+                try:
+                    os.killpg(proc.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            self.returncode = proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+        for tee in self._opened:
+            tee.close()
+        self._opened = []
+
+    def __enter__(self):
+        """
+        Context manager: the command is killed on exit if still running
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """
+        Context manager exit
+        """
+        self.close()
+
+    def tail(self, name:str='stdout') -> bytes:
+        """
+        Returns the last bytes (up to tail_size) of a stream
+
+        Args:
+            name (str, optional): 'stdout' or 'stderr'
+
+        Returns:
+            bytes: the end of the stream
+        """
+        return bytes(self._tails[name])
+
+    @property
+    def result(self) -> subprocess.CompletedProcess:
+        """
+        Returns the result of the command, with the tails of stdout and stderr
+
+        Returns:
+            subprocess.CompletedProcess: the result
+        """
+        return subprocess.CompletedProcess(self.cmdline, self.returncode, self.tail('stdout'), self.tail('stderr'))
+
+    def run(self) -> subprocess.CompletedProcess:
+        """
+        Run the command to the end, keeping only the tails and tee copies of the output
+
+        Returns:
+            subprocess.CompletedProcess: the result
+        """
+        for _ in self:
+            pass
+        return self.result
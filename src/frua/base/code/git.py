@@ -7,7 +7,7 @@ Uses:
 - os: https://docs.python.org/3/library/os.html
 - logging: https://docs.python.org/3/library/logging.html
 - subprocess: https://docs.python.org/3/library/subprocess.html
-- shutil: https://docs.python.org/3/library/shutil.html
+- tempfile: https://docs.python.org/3/library/tempfile.html
 """
 __author__ = 'David HEURTEVENT'
 __copyright__ = 'David HEURTEVENT'
@@ -16,12 +16,15 @@ __license__ = 'MIT'
 import os
 import logging
 import subprocess
-import shutil
+import tempfile
 
 from frua.base.http.getdownloader import GetDownloader
 from frua.base.archive.zip import Zip
+from frua.base.archive.tar import Tar
 
 GITHUB_URL="https://github.com"
+#zip archives up to this size are buffered in memory, larger ones spill to a temporary file
+SPOOL_MAX_SIZE = 8 * 1024 * 1024
 
 class Git(object):
     """
@@ -211,6 +214,20 @@ class GitHub(Git):
         """
         return "%s/%s/%s/archive/refs/tags/v%s.zip"%(GITHUB_URL, self._user, self._repo, self._release)
 
+    @property
+    def repo_branch_tarball_url(self) -> str:
+        """
+        Returns the url to the tar.gz file of a repo on github for username, repo name and branch name
+        """
+        return "%s/%s/%s/archive/%s.tar.gz"%(GITHUB_URL, self._user, self._repo, self._branch)
+
+    @property
+    def release_tarball_url(self) -> str:
+        """
+        Returns the url to the tar.gz file for a specific release of a repo on github for a given username, repo name, and release name
+        """
+        return "%s/%s/%s/archive/refs/tags/v%s.tar.gz"%(GITHUB_URL, self._user, self._repo, self._release)
+
     def clone_https_gh(self, outputdir:str=None, overwrite:bool=True) -> bool:
         """
         Clone a github repository using https
@@ -231,7 +248,58 @@ class GitHub(Git):
         #clone
         return self.clone_https(url, outputdir=outputdir, branch=self._branch, overwrite=overwrite)
     
-    def clone_from_zip(self, outputdir:str=None, overwrite:bool=True) -> bool:
+    def _clone_archive(self, url:str, outputdir:str, overwrite:bool=True, cache_dir:str=None, tarball:bool=False) -> bool:
+        """
+        Download an archive of a repository and extract its content (without the top-level directory) to the output directory
+
+        A zip is downloaded to a spooled buffer (in memory up to SPOOL_MAX_SIZE) and its members are extracted
+        directly to the output directory. A tarball is extracted as it arrives from the network.
+        With cache_dir, the archive goes through the download cache and is extracted from the cached file.
+
+        Args:
+            url (str): the url of the archive
+            outputdir (str): the directory to extract the content to
+            overwrite (bool): whether to extract to an existing non empty directory
+            cache_dir (str): directory of the download cache (optional)
+            tarball (bool): the archive is a tar.gz file, else a zip file
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if outputdir is None:
+            self._logger.error("Output directory must be set")
+            return False
+        if not overwrite and os.path.isdir(outputdir) and os.listdir(outputdir):
+            self._logger.error("Directory %s already exists" % outputdir)
+            return False
+        self._logger.info("Downloading %s to %s" % (url, outputdir))
+        try:
+            if cache_dir is not None:
+                #the cached archive is linked to a temporary directory, only read
+                with tempfile.TemporaryDirectory() as tempdir:
+                    g = GetDownloader(url=url, file_name='archive', file_dir=tempdir, cache_dir=cache_dir, cache_link=True)
+                    g.download(overwrite=True)
+                    archive = os.path.join(tempdir, 'archive')
+                    if tarball:
+                        done = Tar().untar(archive, outputdir, fmt='gz', strip_components=1)
+                    else:
+                        done = Zip().unzip(archive, outputdir, strip_components=1)
+            elif tarball:
+                with GetDownloader(url=url).open() as stream:
+                    done = Tar().untar(stream, outputdir, fmt='gz', strip_components=1)
+            else:
+                with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+                    GetDownloader(url=url).download_to(buffer, spool_size=SPOOL_MAX_SIZE)
+                    buffer.seek(0)
+                    done = Zip().unzip(buffer, outputdir, strip_components=1)
+        except Exception as e:
+            self._logger.error("Failed to download from %s" % url)
+            self._logger.error(e)
+            return False
+        if not done:
+            self._logger.error("Failed to extract %s to %s" % (url, outputdir))
+        return done
+
+    def clone_from_zip(self, outputdir:str=None, overwrite:bool=True, cache_dir:str=None) -> bool:
         """
         Clone a github repository by using https and the branch zip file and unziping it to the output directory
 
@@ -240,6 +308,7 @@ class GitHub(Git):
         Args:
             outputdir (str): the directory to save the file to (optional)
             overwrite (bool): whether to overwrite an existing file
+            cache_dir (str): directory of the download cache (optional), the archive is only downloaded again if it changed
         Returns:
             bool: True if successful, False otherwise
         """
@@ -249,54 +318,41 @@ class GitHub(Git):
         if self.branch is None:
             self._logger.error("Branch must be set")
             return False
-        #compute the url
-        url = self.repo_branch_zip_url
-        userandrepo = '%s/%s'%(self.user, self.repo)
-        repobranch = '%s-%s'%(self.repo, self.branch)
-        file_name = '%s.zip'%(repobranch)
-        #download the zip archive to the temporary folder
-        self._logger.info("Downloading from %s" % userandrepo)
-        tempdir = '/tmp'
-        try:
-            g = GetDownloader(url=url, file_name=file_name, file_dir=tempdir)
-            g.download(overwrite=overwrite)
-        except Exception as e:
-            self._logger.error("Failed to download from %s" % url)
-            self._logger.error(e)
-            return False
-        #unzip the archive to the output directory
-        self._logger.info("Unziping from %s to %s" % (file_name, outputdir))
-        try:
-            z = Zip()
-            z.unzip(os.path.join(tempdir, file_name), tempdir)
-        except Exception as e:
-            self._logger.error("Failed to unzip %s to %s" % (file_name, tempdir))
-            self._logger.error(e)
+        self._logger.info("Downloading from %s/%s" % (self.user, self.repo))
+        return self._clone_archive(self.repo_branch_zip_url, outputdir, overwrite=overwrite, cache_dir=cache_dir)
+
+    def clone_release_from_zip(self, outputdir:str=None, overwrite:bool=True, cache_dir:str=None) -> bool:
+        """
+        Clone a github repository by using https and the release zip file and unziping it to the output directory
+
+        Does not require git to be installed on your system
+
+        Args:
+            outputdir (str): the directory to save the file to (optional)
+            overwrite (bool): whether to overwrite an existing file
+            cache_dir (str): directory of the download cache (optional), the archive is only downloaded again if it changed
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self.user is None or self.repo is None:
+            self._logger.error("User and repo must be set")
             return False
-        #move the content to the output destination
-        src = os.path.join(tempdir, repobranch)
-        dst = os.path.join(outputdir)
-        self._logger.info("Moving %s to %s" % (src, dst))
-        try:
-            shutil.move(src, dst)
-        except Exception as e:
-            self._logger.error("Failed to move %s to %s" % src, dst)
-            self._logger.error(e)
+        if self.release is None:
+            self._logger.error("Release must be set")
             return False
-        #delete the zip from the temporary folder
-        if os.path.exists(os.path.join(tempdir, file_name)):
-            os.remove(os.path.join(tempdir, file_name))
-        return True        
+        self._logger.info("Downloading release %s from %s/%s" % (self.release, self.user, self.repo))
+        return self._clone_archive(self.release_zip_url, outputdir, overwrite=overwrite, cache_dir=cache_dir)
 
-    def clone_release_from_zip(self, outputdir:str=None, overwrite:bool=True) -> bool:
+    def clone_from_tarball(self, outputdir:str=None, overwrite:bool=True, cache_dir:str=None) -> bool:
         """
-        Clone a github repository by using https and the release zip file and unziping it to the output directory
+        Clone a github repository by using https and the branch tar.gz file, extracted as it is downloaded
 
         Does not require git to be installed on your system
 
         Args:
             outputdir (str): the directory to save the file to (optional)
             overwrite (bool): whether to overwrite an existing file
+            cache_dir (str): directory of the download cache (optional), the archive is only downloaded again if it changed
         Returns:
             bool: True if successful, False otherwise
         """
@@ -306,44 +362,27 @@ class GitHub(Git):
         if self.branch is None:
             self._logger.error("Branch must be set")
             return False
-        #compute the url
-        url = self.release_zip_url
-        userandrepo = '%s/%s'%(self.user, self.repo)
-        reporelease = '%s-%s'%(self.repo, self.release)
-        file_name = 'v%s.zip'%(self.release)
-        #download the zip archive to the temporary folder
-        self._logger.info("Downloading release %s from %s" % (self.release, userandrepo))
-        tempdir = '/tmp'
-        try:
-            g = GetDownloader(url=url, file_name=file_name, file_dir=tempdir)
-            g.download(overwrite=overwrite)
-        except Exception as e:
-            self._logger.error("Failed to download from %s" % url)
-            self._logger.error(e)
-            return False
-        #unzip the archive to the output directory
-        self._logger.info("Unziping from %s to %s" % (file_name, outputdir))
-        try:
-            z = Zip()
-            z.unzip(os.path.join(tempdir, file_name), tempdir)
-        except Exception as e:
-            self._logger.error("Failed to unzip %s to %s" % (file_name, tempdir))
-            self._logger.error(e)
-            return False
-        #move the content to the output destination
-        src = os.path.join(tempdir, reporelease)
-        dst = os.path.join(outputdir)
-        self._logger.info("Moving %s to %s" % (src, dst))
-        try:
-            shutil.move(src, dst)
-        except Exception as e:
-            self._logger.error("Failed to move %s to %s" % src, dst)
-            self._logger.error(e)
-            return False
-        #delete the zip from the temporary folder
-        if os.path.exists(os.path.join(tempdir, file_name)):
-            os.remove(os.path.join(tempdir, file_name))
-        return True        
+        self._logger.info("Downloading from %s/%s" % (self.user, self.repo))
+        return self._clone_archive(self.repo_branch_tarball_url, outputdir, overwrite=overwrite, cache_dir=cache_dir, tarball=True)
 
+    def clone_release_from_tarball(self, outputdir:str=None, overwrite:bool=True, cache_dir:str=None) -> bool:
+        """
+        Clone a github repository by using https and the release tar.gz file, extracted as it is downloaded
 
+        Does not require git to be installed on your system
 
+        Args:
+            outputdir (str): the directory to save the file to (optional)
+            overwrite (bool): whether to overwrite an existing file
+            cache_dir (str): directory of the download cache (optional), the archive is only downloaded again if it changed
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self.user is None or self.repo is None:
+            self._logger.error("User and repo must be set")
+            return False
+        if self.release is None:
+            self._logger.error("Release must be set")
+            return False
+        self._logger.info("Downloading release %s from %s/%s" % (self.release, self.user, self.repo))
+        return self._clone_archive(self.release_tarball_url, outputdir, overwrite=overwrite, cache_dir=cache_dir, tarball=True)
@@ -0,0 +1,405 @@
+"""
+Compact binary serialization
+
+Tagged binary format in the spirit of msgpack, built on the standard library.
+Supports None, bool, int, float, str, bytes, list, tuple, set, dict
+and, through extension types, datetime, date, time, timedelta and UUID.
+Other types can be plugged in with register().
+
+Uses:
+- struct: https://docs.python.org/3/library/struct.html
+- datetime: https://docs.python.org/3/library/datetime.html
+- uuid: https://docs.python.org/3/library/uuid.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import struct
+import datetime
+import uuid
+
+#type tags
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT8 = 0x03
+_INT16 = 0x04
+_INT32 = 0x05
+_INT64 = 0x06
+_BIGINT = 0x07
+_FLOAT = 0x08
+_STR8 = 0x09
+_STR32 = 0x0a
+_BYTES8 = 0x0b
+_BYTES32 = 0x0c
+_LIST = 0x0d
+_TUPLE = 0x0e
+_DICT = 0x0f
+_SET = 0x10
+_EXT = 0x11
+
+_b = struct.Struct('<b')
+_h = struct.Struct('<h')
+_i = struct.Struct('<i')
+_q = struct.Struct('<q')
+_d = struct.Struct('<d')
+_I = struct.Struct('<I')
+#extension header: code, payload length
+_EXTHEAD = struct.Struct('<BI')
+#datetime: year, month, day, hour, minute, second, microsecond, has utc offset, utc offset (s)
+_DATETIME = struct.Struct('<HBBBBBIBi')
+_DATE = struct.Struct('<HBB')
+_TIME = struct.Struct('<BBBIBi')
+_TIMEDELTA = struct.Struct('<iii')
+
+def _encode_offset(value:object) -> tuple:
+    """
+    Returns the UTC offset of a datetime or a time
+
+    Args:
+        value (object): datetime or time
+
+    Returns:
+        tuple: (has offset, offset in seconds)
+    """
+    offset = value.utcoffset()
+    if offset is None:
+        return 0, 0
+    return 1, int(offset.total_seconds())
+
+def _decode_tz(has_offset:int, offset:int) -> datetime.tzinfo:
+    """
+    Returns a fixed offset timezone
+
+    Args:
+        has_offset (int): 1 if the value was timezone aware
+        offset (int): UTC offset in seconds
+
+    Returns:
+        datetime.tzinfo: the timezone, None if the value was naive
+    """
+    if not has_offset:
+        return None
+    return datetime.timezone(datetime.timedelta(seconds=offset))
+
+def _encode_datetime(value:datetime.datetime) -> bytes:
+    """Payload of a datetime"""
+    return _DATETIME.pack(value.year, value.month, value.day, value.hour, value.minute,
+                          value.second, value.microsecond, *_encode_offset(value))
+
+def _decode_datetime(data:bytes) -> datetime.datetime:
+    """Datetime from its payload"""
+    year, month, day, hour, minute, second, microsecond, has_offset, offset = _DATETIME.unpack(data)
+    return datetime.datetime(year, month, day, hour, minute, second, microsecond, _decode_tz(has_offset, offset))
+
+def _encode_date(value:datetime.date) -> bytes:
+    """Payload of a date"""
+    return _DATE.pack(value.year, value.month, value.day)
+
+def _decode_date(data:bytes) -> datetime.date:
+    """Date from its payload"""
+    return datetime.date(*_DATE.unpack(data))
+
+def _encode_time(value:datetime.time) -> bytes:
+    """Payload of a time"""
+    return _TIME.pack(value.hour, value.minute, value.second, value.microsecond, *_encode_offset(value))
+
+def _decode_time(data:bytes) -> datetime.time:
+    """Time from its payload"""
+    hour, minute, second, microsecond, has_offset, offset = _TIME.unpack(data)
+    return datetime.time(hour, minute, second, microsecond, _decode_tz(has_offset, offset))
+
+def _encode_timedelta(value:datetime.timedelta) -> bytes:
+    """Payload of a timedelta"""
+    return _TIMEDELTA.pack(value.days, value.seconds, value.microseconds)
+
+def _decode_timedelta(data:bytes) -> datetime.timedelta:
+    """Timedelta from its payload"""
+    return datetime.timedelta(*_TIMEDELTA.unpack(data))
+
+def _encode_uuid(value:uuid.UUID) -> bytes:
+    """Payload of a UUID"""
+    return value.bytes
+
+def _decode_uuid(data:bytes) -> uuid.UUID:
+    """UUID from its payload"""
+    return uuid.UUID(bytes=bytes(data))
+
+#built-in extension types: type -> (code, encoder, decoder)
+_EXTENSIONS = {
+    datetime.datetime: (1, _encode_datetime, _decode_datetime),
+    datetime.date: (2, _encode_date, _decode_date),
+    datetime.time: (3, _encode_time, _decode_time),
+    datetime.timedelta: (4, _encode_timedelta, _decode_timedelta),
+    uuid.UUID: (5, _encode_uuid, _decode_uuid),
+}
+
+class BinCodec(object):
+    """
+    Compact binary serialization (encode/decode)
+
+    Values are written as a one byte type tag followed by their payload (little endian).
+    Tuples and sets are kept, so decoding returns values equal to the encoded ones.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #extension types: type -> (code, encoder, decoder) and code -> decoder
+        self._ext_types = dict(_EXTENSIONS)
+        self._ext_codes = {code: decode for code, _, decode in _EXTENSIONS.values()}
+
+    def register(self, cls:type, code:int, encode, decode) -> None:
+        """
+        Register an extension type
+
+        Args:
+            cls (type): the type to serialize (exact type, subclasses are not matched)
+            code (int): the extension code (0-255), 1-31 are reserved for the built-in types
+            encode (callable): function returning the payload bytes of a value
+            decode (callable): function returning the value from the payload bytes
+        """
+        if not 0 <= code <= 255:
+            raise ValueError('Extension code must be between 0 and 255')
+        if code in self._ext_codes and self._ext_types.get(cls, (None,))[0] != code:
+            raise ValueError('Extension code %s is already registered'%code)
+        self._ext_types[cls] = (code, encode, decode)
+        self._ext_codes[code] = decode
+
+    def dumps(self, obj:object) -> bytes:
+        """
+        Serialize a value to bytes
+
+        Args:
+            obj (object): the value
+
+        Returns:
+            bytes: the serialized value
+
+        Raises:
+            TypeError: if a type cannot be serialized
+        """
+        out = bytearray()
+        self._encode(obj, out)
+        return bytes(out)
+
+    def _encode(self, obj:object, out:bytearray) -> None:
+        """
+        Append a serialized value
+
+        Args:
+            obj (object): the value
+            out (bytearray): the output buffer
+        """
+        t = type(obj)
+        if t is str:
+            data = obj.encode('utf-8')
+            n = len(data)
+            if n < 256:
+                out.append(_STR8)
+                out.append(n)
+            else:
+                out.append(_STR32)
+                out += _I.pack(n)
+            out += data
+        elif obj is None:
+            out.append(_NONE)
+        elif t is bool:
+            out.append(_TRUE if obj else _FALSE)
+        elif t is int:
+            if -128 <= obj < 128:
+                out.append(_INT8)
+                out += _b.pack(obj)
+            elif -32768 <= obj < 32768:
+                out.append(_INT16)
+                out += _h.pack(obj)
+            elif -2147483648 <= obj < 2147483648:
+                out.append(_INT32)
+                out += _i.pack(obj)
+            elif -9223372036854775808 <= obj < 9223372036854775808:
+                out.append(_INT64)
+                out += _q.pack(obj)
+            else:
+                data = obj.to_bytes((obj.bit_length() + 8) // 8, 'little', signed=True)
+                out.append(_BIGINT)
+                out += _I.pack(len(data))
+                out += data
+        elif t is float:
+            out.append(_FLOAT)
+            out += _d.pack(obj)
+        elif t is dict:
+            out.append(_DICT)
+            out += _I.pack(len(obj))
+            encode = self._encode
+            for k, v in obj.items():
+                encode(k, out)
+                encode(v, out)
+        elif t is list or t is tuple or t is set or t is frozenset:
+            out.append(_LIST if t is list else _TUPLE if t is tuple else _SET)
+            out += _I.pack(len(obj))
+            encode = self._encode
+            for v in obj:
+                encode(v, out)
+        elif t is bytes or t is bytearray or t is memoryview:
+            n = len(obj)
+            if n < 256:
+                out.append(_BYTES8)
+                out.append(n)
+            else:
+                out.append(_BYTES32)
+                out += _I.pack(n)
+            out += obj
+        else:
+            ext = self._ext_types.get(t)
+            if ext is None:
+                raise TypeError('Object of type %s is not serializable'%t.__name__)
+            code, encode, _ = ext
+            data = encode(obj)
+            out.append(_EXT)
+            out += _EXTHEAD.pack(code, len(data))
+            out += data
+
+    def loads(self, data:bytes) -> object:
+        """
+        Deserialize a value from bytes
+
+        Args:
+            data (bytes): the serialized value
+
+        Returns:
+            object: the value
+
+        Raises:
+            ValueError: if the data is not valid
+        """
+        try:
+            obj, pos = self._decode(bytes(data), 0)
+        except (IndexError, struct.error):
+            raise ValueError('Truncated binary data')
+        if pos > len(data):
+            raise ValueError('Truncated binary data')
+        if pos < len(data):
+            raise ValueError('Extra data after the serialized value')
+        return obj
+
+    def _decode(self, data:bytes, pos:int) -> tuple:
+        """
+        Decode the value starting at a position
+
+        Args:
+            data (bytes): the serialized data
+            pos (int): the position of the type tag
+
+        Returns:
+            tuple: (value, position after the value)
+        """
+        tag = data[pos]
+        pos += 1
+        if tag == _STR8:
+            n = data[pos]
+            pos += 1
+            return str(data[pos:pos + n], 'utf-8'), pos + n
+        if tag == _STR32:
+            n = _I.unpack_from(data, pos)[0]
+            pos += 4
+            return str(data[pos:pos + n], 'utf-8'), pos + n
+        if tag == _NONE:
+            return None, pos
+        if tag == _FALSE:
+            return False, pos
+        if tag == _TRUE:
+            return True, pos
+        if tag == _INT8:
+            return _b.unpack_from(data, pos)[0], pos + 1
+        if tag == _INT16:
+            return _h.unpack_from(data, pos)[0], pos + 2
+        if tag == _INT32:
+            return _i.unpack_from(data, pos)[0], pos + 4
+        if tag == _INT64:
+            return _q.unpack_from(data, pos)[0], pos + 8
+        if tag == _FLOAT:
+            return _d.unpack_from(data, pos)[0], pos + 8
+        if tag == _DICT:
+            n = _I.unpack_from(data, pos)[0]
+            pos += 4
+            decode = self._decode
+            d = {}
+            for _ in range(n):
+                #fast path for short str keys
+                if data[pos] == _STR8:
+                    end = pos + 2 + data[pos + 1]
+                    k = str(data[pos + 2:end], 'utf-8')
+                    pos = end
+                else:
+                    k, pos = decode(data, pos)
+                d[k], pos = decode(data, pos)
+            return d, pos
+        if tag == _LIST or tag == _TUPLE or tag == _SET:
+            n = _I.unpack_from(data, pos)[0]
+            pos += 4
+            decode = self._decode
+            items = []
+            append = items.append
+            for _ in range(n):
+                v, pos = decode(data, pos)
+                append(v)
+            if tag == _TUPLE:
+                return tuple(items), pos
+            if tag == _SET:
+                return set(items), pos
+            return items, pos
+        if tag == _BYTES8:
+            n = data[pos]
+            pos += 1
+            return bytes(data[pos:pos + n]), pos + n
+        if tag == _BYTES32:
+            n = _I.unpack_from(data, pos)[0]
+            pos += 4
+            return bytes(data[pos:pos + n]), pos + n
+        if tag == _BIGINT:
+            n = _I.unpack_from(data, pos)[0]
+            pos += 4
+            return int.from_bytes(data[pos:pos + n], 'little', signed=True), pos + n
+        if tag == _EXT:
+            code, n = _EXTHEAD.unpack_from(data, pos)
+            pos += _EXTHEAD.size
+            decode = self._ext_codes.get(code)
+            if decode is None:
+                raise ValueError('Unknown extension code %s'%code)
+            return decode(data[pos:pos + n]), pos + n
+        raise ValueError('Unknown type tag %s'%tag)
+
+    def dump(self, obj:object, file) -> None:
+        """
+        Serialize a value to a binary file object
+
+        Args:
+            obj (object): the value
+            file (file): file object opened in binary mode
+        """
+        file.write(self.dumps(obj))
+
+    def load(self, file) -> object:
+        """
+        Deserialize a value from a binary file object
+
+        Args:
+            file (file): file object opened in binary mode
+
+        Returns:
+            object: the value
+        """
+        return self.loads(file.read())
+
+#default codec, with the built-in extension types only
+codec = BinCodec()
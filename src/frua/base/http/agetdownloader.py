@@ -0,0 +1,326 @@
+"""
+To download files from asyncio code without blocking the event loop, on asyncio streams
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- ssl: https://docs.python.org/3/library/ssl.html
+- time: https://docs.python.org/3/library/time.html
+- hashlib: https://docs.python.org/3/library/hashlib.html
+- asyncio: https://docs.python.org/3/library/asyncio.html
+- urllib.parse: https://docs.python.org/3/library/urllib.parse.html
+- requests: https://requests.readthedocs.io/en/latest/ (exceptions)
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import ssl
+import time
+import hashlib
+import asyncio
+from urllib.parse import urlsplit, urljoin
+
+#external dependencies
+import requests
+
+from frua.base.http.getdownloader import _BaseDownloader, DEFAULT_TIMEOUT
+
+#redirect status codes followed, and maximum number of redirects
+REDIRECTS = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 10
+#options of GetDownloader without asynchronous counterpart
+UNSUPPORTED = ('session', 'cache_dir', 'cache_link', 'segments', 'min_segment_size', 'resume')
+
+class AsyncGetDownloader(_BaseDownloader):
+    """
+    Asynchronous get downloader
+
+    Same url, file_name and file_dir attributes and inference as GetDownloader (shared base), download is a coroutine:
+
+        ok = await AsyncGetDownloader(url='https://example.com/file.zip', file_dir='/tmp').download()
+
+    The requests are sent on asyncio streams (HTTP/1.1, one connection per download, redirects followed),
+    many downloads can run on one event loop. The file is written as file.part and renamed once complete.
+    The HTTP errors raise the same requests exceptions as GetDownloader (HTTPError, ChunkedEncodingError),
+    the connection errors raise OSError and the timeouts asyncio.TimeoutError.
+
+    It is not a GetDownloader: only download is implemented, the session, cache_dir, segments and resume options
+    of GetDownloader are not supported (TypeError).
+    """
+    def __init__(self, url:str=None, file_name:str=None, file_dir:str=None, timeout:object=DEFAULT_TIMEOUT, max_concurrency:int=None,
+            semaphore:asyncio.Semaphore=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            url (str): the url to download
+            file_name (str): the filename to save
+            file_dir (str): the directory to save the file to
+            timeout (object): seconds or (connect, read) tuple, the read timeout applies to each read (optional). Defaults to (10, 60).
+            max_concurrency (int, optional): maximum number of downloads of this object running at the same time
+            semaphore (asyncio.Semaphore, optional): semaphore shared with other objects to bound the number of running downloads
+            progress (callable): called with (downloaded bytes, total bytes or None) at each progress report, can be a coroutine function
+            logger (logging.Logger): the logger to use (optional)
+            args: positional arguments
+            kwargs: keyword arguments
+
+        Raises:
+            TypeError: on an option of GetDownloader not supported (session, cache_dir, segments, resume...)
+        """
+        unsupported = [name for name in UNSUPPORTED if name in kwargs]
+        if unsupported:
+            raise TypeError("AsyncGetDownloader does not support %s" % ', '.join(unsupported))
+        super().__init__(url, file_name, file_dir, timeout, *args, **kwargs)
+        if semaphore is None and max_concurrency:
+            semaphore = asyncio.Semaphore(max_concurrency)
+        self.semaphore = semaphore
+
+    def _timeouts(self) -> tuple:
+        """
+        Returns the connect and read timeouts
+
+        Returns:
+            tuple: (connect timeout, read timeout), None for no timeout
+        """
+        if isinstance(self.timeout, (tuple, list)):
+            return self.timeout[0], self.timeout[1]
+        return self.timeout, self.timeout
+
+    @staticmethod
+    async def _close(writer:asyncio.StreamWriter, timeout:float=None) -> None:
+        """
+        Close a connection and wait until it is closed
+
+        Args:
+            writer (asyncio.StreamWriter): the stream of the connection
+            timeout (float): seconds to wait for the closing (TLS shutdown), None for no timeout
+        """
+        writer.close()
+        try:
+            await asyncio.wait_for(writer.wait_closed(), timeout)
+        except (OSError, asyncio.TimeoutError, ssl.SSLError):
+            #the connection is closed anyway
+            pass
+
+    @staticmethod
+    def _host(parts:tuple) -> str:
+        """
+        Returns the Host header of a url: IPv6 literals in brackets, with the port if given
+
+        Args:
+            parts (urllib.parse.SplitResult): the parts of the url
+
+        Returns:
+            str: the Host header
+        """
+        host = parts.hostname
+        if ':' in host:
+            host = '[%s]' % host
+        return host if parts.port is None else '%s:%s' % (host, parts.port)
+
+    async def _request(self, url:str) -> tuple:
+        """
+        Send a GET request and read the response headers, following the redirects
+
+        Args:
+            url (str): the url
+
+        Returns:
+            tuple: (reader, writer, headers (dict with lower case names))
+        """
+        connect_timeout, read_timeout = self._timeouts()
+        for _ in range(MAX_REDIRECTS + 1):
+            parts = urlsplit(url)
+            if parts.scheme not in ('http', 'https'):
+                raise requests.exceptions.InvalidSchema("No connection adapters were found for %r" % url)
+            port = parts.port or (443 if parts.scheme == 'https' else 80)
+            context = ssl.create_default_context() if parts.scheme == 'https' else None
+            reader, writer = await asyncio.wait_for(
+                asyncio.open_connection(parts.hostname, port, ssl=context, limit=self.max_chunk_size), connect_timeout)
+            try:
+                target = (parts.path or '/') + ('?' + parts.query if parts.query else '')
+                writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: frua-base\r\nAccept: */*\r\n'
+                    'Accept-Encoding: identity\r\nConnection: close\r\n\r\n' % (target, self._host(parts))).encode('latin-1'))
+                await writer.drain()
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), read_timeout)
+            except BaseException:
+                await self._close(writer, read_timeout)
+                raise
+            lines = head.decode('latin-1').split('\r\n')
+            status_line = lines[0].split(' ', 2)
+            status = int(status_line[1])
+            reason = status_line[2] if len(status_line) > 2 else ''
+            headers = {}
+            for line in lines[1:]:
+                if ':' in line:
+                    name, value = line.split(':', 1)
+                    headers[name.strip().lower()] = value.strip()
+            if status in REDIRECTS and 'location' in headers:
+                await self._close(writer, read_timeout)
+                url = urljoin(url, headers['location'])
+                continue
+            if not 200 <= status < 300:
+                #errors, and the 1xx/3xx responses without a body to save (304, redirect without Location)
+                await self._close(writer, read_timeout)
+                raise requests.HTTPError("%s %s for url: %s" % (status, reason, url))
+            return reader, writer, headers
+        raise requests.TooManyRedirects("Exceeded %s redirects for %s" % (MAX_REDIRECTS, self.url))
+
+    async def _body(self, reader:asyncio.StreamReader, headers:dict, max_size:int=None):
+        """
+        Read the body of a response
+
+        Args:
+            reader (asyncio.StreamReader): the stream, after the headers
+            headers (dict): the response headers
+            max_size (int): maximum size of the chunks. Defaults to max_chunk_size.
+
+        Yields:
+            bytes: the chunks of the body
+        """
+        read_timeout = self._timeouts()[1]
+        max_size = max_size or self.max_chunk_size
+        async def read(size):
+            chunk = await asyncio.wait_for(reader.read(size), read_timeout)
+            if not chunk:
+                raise requests.exceptions.ChunkedEncodingError("Connection closed before the end of the body of %s" % self.url)
+            return chunk
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            while True:
+                line = await asyncio.wait_for(reader.readuntil(b'\r\n'), read_timeout)
+                size = int(line.split(b';')[0].strip(), 16)
+                if size == 0:
+                    break
+                while size:
+                    chunk = await read(min(size, max_size))
+                    size -= len(chunk)
+                    yield chunk
+                await asyncio.wait_for(reader.readexactly(2), read_timeout)
+            return
+        length = headers.get('content-length')
+        if length is None:
+            #body delimited by the end of the connection
+            while True:
+                chunk = await asyncio.wait_for(reader.read(max_size), read_timeout)
+                if not chunk:
+                    return
+                yield chunk
+        remaining = int(length)
+        while remaining:
+            chunk = await read(min(remaining, max_size))
+            remaining -= len(chunk)
+            yield chunk
+
+    async def _areport(self, done:int, total:int, elapsed:float) -> None:
+        """
+        Report the progress of a download, awaiting the progress callback if it is a coroutine function
+
+        Args:
+            done (int): bytes downloaded
+            total (int): total size, None if unknown
+            elapsed (float): seconds since the start
+        """
+        rate = done / elapsed / 1048576 if elapsed > 0 else 0.0
+        if total:
+            self._logger.info("%s: %s/%s bytes (%.1f%%) at %.2f MB/s" % (self.url, done, total, 100.0 * done / total, rate))
+        else:
+            self._logger.info("%s: %s bytes at %.2f MB/s" % (self.url, done, rate))
+        if self.progress is not None:
+            res = self.progress(done, total)
+            if asyncio.iscoroutine(res):
+                await res
+
+    async def _afetch(self, file_path:str, hashes:dict=None, checksum:tuple=None) -> int:
+        """
+        Download the url to file_path through file_path.part
+
+        Args:
+            file_path (str): the file path
+            hashes (dict): algorithm -> hash object (hashlib), updated with the chunks as they are written
+            checksum (tuple): expected (algorithm, hexdigest), checked before the rename
+
+        Returns:
+            int: size of the file
+        """
+        part_path = file_path + '.part'
+        reader, writer, headers = await self._request(self.url)
+        length = headers.get('content-length')
+        total = int(length) if length is not None and 'chunked' not in headers.get('transfer-encoding', '').lower() else None
+        updates = [h.update for h in (hashes or {}).values()]
+        bucket = self._bucket()
+        max_size = self._max_chunk(bucket)
+        done = 0
+        start = last = time.monotonic()
+        try:
+            with open(part_path, 'wb') as f:
+                if total:
+                    try:
+                        os.posix_fallocate(f.fileno(), 0, total)
+                    except (OSError, AttributeError):
+                        pass
+                #writes go to the page cache, they do not block the loop for long
+                async for chunk in self._body(reader, headers, max_size):
+                    f.write(chunk)
+                    for update in updates:
+                        update(chunk)
+                    done += len(chunk)
+                    if bucket is not None:
+                        delay = bucket.delay(len(chunk))
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    now = time.monotonic()
+                    if now - last >= self.progress_interval:
+                        last = now
+                        await self._areport(done, total, now - start)
+                f.truncate(done)
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+        finally:
+            await self._close(writer, self._timeouts()[1])
+        await self._areport(done, total, time.monotonic() - start)
+        if checksum is not None:
+            algorithm, expected = checksum
+            digest = hashes[algorithm].hexdigest()
+            if digest != expected:
+                os.remove(part_path)
+                raise ValueError("Checksum mismatch for %s: expected %s:%s, got %s:%s" % (self.url, algorithm, expected, algorithm, digest))
+        os.replace(part_path, file_path)
+        return done
+
+    async def download(self, overwrite=False, checksum=None):
+        """
+        Download a file from the internet.
+
+        Saved by default to the current directory.
+
+        Args:
+            overwrite (bool): whether to overwrite an existing file
+            checksum (str): expected checksum 'algorithm:hexdigest' (sha256, sha512, blake2b...), a bare hexdigest is a SHA-256.
+                The content is hashed while it is written, the partial file is deleted and ValueError raised if it does not match.
+
+        Returns:
+            bool: True if successful, False otherwise
+        """
+        if self.url is None:
+            self._logger.error("You must set the url")
+            return False
+        file_path = self._file_path()
+        if not overwrite and os.path.exists(file_path):
+            self._logger.error("File %s already exists" % file_path)
+            return False
+        hashes = None
+        if checksum is not None:
+            checksum = self._parse_checksum(checksum)
+            hashes = {checksum[0]: hashlib.new(checksum[0])}
+        self._logger.info("Downloading url %s." % self.url)
+        self._logger.info("Url will be saved to %s" % file_path)
+        if self.semaphore is not None:
+            async with self.semaphore:
+                size = await self._afetch(file_path, hashes, checksum)
+        else:
+            size = await self._afetch(file_path, hashes, checksum)
+        self._logger.info("Downloaded %s (%s bytes) and saved to %s" % (self.url, size, file_path))
+        return True
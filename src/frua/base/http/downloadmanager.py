@@ -0,0 +1,312 @@
+"""
+To download many urls in parallel, with per host concurrency limits and retries
+
+Uses:
+- os: https://docs.python.org/3/library/os.html
+- logging: https://docs.python.org/3/library/logging.html
+- time: https://docs.python.org/3/library/time.html
+- random: https://docs.python.org/3/library/random.html
+- collections: https://docs.python.org/3/library/collections.html
+- concurrent.futures: https://docs.python.org/3/library/concurrent.futures.html
+- requests: https://requests.readthedocs.io/en/latest/
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import logging
+import time
+import random
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+#external dependencies
+import requests
+
+from frua.base.http.getdownloader import GetDownloader
+from frua.base.http.ratelimit import TokenBucket
+
+#HTTP status codes worth another attempt
+RETRY_STATUS = (408, 429, 500, 502, 503, 504)
+
+class DownloadResult(object):
+    """
+    Result of a download job
+
+    Attributes:
+        url (str): the url
+        path (str): the path of the file
+        ok (bool): True if the file was downloaded
+        size (int): size of the file, None if not downloaded
+        attempts (int): number of attempts
+        error (BaseException): the error of the last attempt, None if downloaded
+        wall (float): seconds from the first attempt to the end of the last one, backoff delays included
+    """
+    def __init__(self, url:str, path:str=None, ok:bool=False, size:int=None, attempts:int=0, error:BaseException=None, wall:float=0.0) -> None:
+        self.url = url
+        self.path = path
+        self.ok = ok
+        self.size = size
+        self.attempts = attempts
+        self.error = error
+        self.wall = wall
+
+    def __repr__(self) -> str:
+        return 'DownloadResult(url=%r, path=%r, ok=%r, size=%r, attempts=%r, error=%r)'%(
+            self.url, self.path, self.ok, self.size, self.attempts, self.error)
+
+class DownloadManager(object):
+    """
+    Batch of downloads run in parallel
+
+        manager = DownloadManager(max_workers=8, per_host=2)
+        manager.add('https://example.com/a.zip', '/tmp/a.zip')
+        manager.add('https://example.com/b.zip', '/tmp/downloads/')
+        for index, result in manager.run_iter():
+            print(result.url, result.ok)
+
+    Up to max_workers downloads run at the same time, up to per_host of them on the same host.
+    The jobs failing with a network error or a 408, 429 or 5xx status are retried after an exponential
+    backoff (with jitter), resuming their partial download. The slot of a job waiting for its retry is
+    used by the other jobs. All the jobs share a pooled session.
+    """
+    def __init__(self, jobs:list=None, max_workers:int=8, per_host:int=4, retries:int=3, backoff:float=0.5, backoff_max:float=30.0,
+            overwrite:bool=False, session:requests.Session=None, rate_limit:object=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            jobs (list, optional): the jobs to add, (url, dest) tuples
+            max_workers (int, optional): maximum number of downloads running at the same time
+            per_host (int, optional): maximum number of downloads running at the same time on a host, None for no limit
+            retries (int, optional): maximum number of retries of a job
+            backoff (float, optional): delay before the first retry in seconds, doubled at each retry
+            backoff_max (float, optional): maximum delay before a retry in seconds
+            overwrite (bool, optional): overwrite the existing files, else the jobs of existing files fail
+            session (requests.Session, optional): session of the downloads. Defaults to a session with a connection pool of max_workers.
+            rate_limit (object, optional): bandwidth cap shared by all the downloads, bytes per second or a TokenBucket
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        #handle logger
+        if not hasattr(self, 'logger'):
+            self._logger = logging.getLogger(__name__)
+        self.max_workers = max_workers
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.overwrite = overwrite
+        self.rate_limit = TokenBucket(rate_limit) if isinstance(rate_limit, (int, float)) else rate_limit
+        #retries are handled by the manager: the connection pool only
+        self.session = session if session is not None else GetDownloader.make_session(pool_maxsize=max_workers, retries=0)
+        #jobs: (url, dest, download options)
+        self._jobs = []
+        self.stats = {}
+        for job in jobs or []:
+            self.add(*job)
+
+    def add(self, url:str, dest:str=None, **options) -> int:
+        """
+        Add a download job
+
+        Args:
+            url (str): the url
+            dest (str, optional): the file path, or a directory (existing or ending with a separator) to save the file
+                with the name of the url. Defaults to the default directory of GetDownloader.
+            options: keyword arguments of GetDownloader.download (segments, checksum...)
+
+        Returns:
+            int: the index of the job
+        """
+        self._jobs.append((url, dest, options))
+        return len(self._jobs) - 1
+
+    def __len__(self) -> int:
+        """
+        Number of jobs
+
+        Returns:
+            int: number of jobs
+        """
+        return len(self._jobs)
+
+    @staticmethod
+    def _host(url:str) -> str:
+        """
+        Returns the host of a url, the key of the per host limits
+
+        Args:
+            url (str): the url
+
+        Returns:
+            str: the host (with the port)
+        """
+        return urlparse(url).netloc.lower()
+
+    def _downloader(self, url:str, dest:str) -> GetDownloader:
+        """
+        Returns the downloader of a job
+
+        Args:
+            url (str): the url
+            dest (str): the file path or directory
+
+        Returns:
+            GetDownloader: the downloader
+        """
+        if dest is None:
+            return GetDownloader(url=url, session=self.session, rate_limit=self.rate_limit)
+        dest = str(dest)
+        if dest.endswith(os.sep) or os.path.isdir(dest):
+            return GetDownloader(url=url, file_dir=dest, session=self.session, rate_limit=self.rate_limit)
+        file_dir, file_name = os.path.split(os.path.abspath(dest))
+        return GetDownloader(url=url, file_name=file_name, file_dir=file_dir, session=self.session, rate_limit=self.rate_limit)
+
+    def _attempt(self, url:str, dest:str, options:dict) -> tuple:
+        """
+        Run one attempt of a job
+
+        Args:
+            url (str): the url
+            dest (str): the file path or directory
+            options (dict): keyword arguments of GetDownloader.download
+
+        Returns:
+            tuple: (path, size, error), error is None if downloaded
+        """
+        obj = self._downloader(url, dest)
+        if obj.file_dir is not None and not os.path.exists(obj.file_dir):
+            os.makedirs(obj.file_dir, exist_ok=True)
+        try:
+            ok = obj.download(overwrite=self.overwrite, **options)
+        except Exception as e:
+            return None, None, e
+        path = None if obj.file_name is None else os.path.join(obj.file_dir, obj.file_name)
+        if not ok:
+            return path, None, FileExistsError('%s already exists'%path)
+        return path, os.path.getsize(path), None
+
+    def _retriable(self, error:BaseException) -> bool:
+        """
+        Returns whether a failed attempt is worth another one
+
+        Args:
+            error (BaseException): the error of the attempt
+
+        Returns:
+            bool: True for network errors and the RETRY_STATUS status codes
+        """
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and error.response.status_code in RETRY_STATUS
+        return isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+            requests.exceptions.ContentDecodingError))
+
+    def _delay(self, attempt:int) -> float:
+        """
+        Returns the backoff delay before a retry: backoff * 2 ** (attempt - 1), capped to backoff_max, with full jitter on the upper half
+
+        Args:
+            attempt (int): number of the failed attempt (1 for the first one)
+
+        Returns:
+            float: the delay in seconds
+        """
+        delay = min(self.backoff * 2 ** (attempt - 1), self.backoff_max)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def run_iter(self):
+        """
+        Run the jobs, yielding the results as they complete
+
+        The stats are updated once all the jobs are done.
+
+        Yields:
+            tuple: (index of the job, DownloadResult)
+        """
+        jobs = self._jobs
+        self.stats = {}
+        start = time.monotonic()
+        #jobs waiting to run: [index, attempts, not before (time.monotonic()), first start]
+        waiting = [[i, 0, 0.0, None] for i in range(len(jobs))]
+        running = {}
+        hosts = Counter()
+        failed = retried = size = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while waiting or running:
+                #start the jobs with a free slot on their host, in order
+                now = time.monotonic()
+                for job in list(waiting):
+                    if len(running) >= self.max_workers:
+                        break
+                    url, dest, options = jobs[job[0]]
+                    host = self._host(url)
+                    if job[2] > now or (self.per_host is not None and hosts[host] >= self.per_host):
+                        continue
+                    waiting.remove(job)
+                    hosts[host] += 1
+                    job[1] += 1
+                    if job[3] is None:
+                        job[3] = now
+                    running[executor.submit(self._attempt, url, dest, options)] = job
+                #wait for a job to end, or for the next backoff delay to expire
+                delays = [job[2] - now for job in waiting if job[2] > now]
+                timeout = min(delays) if delays and len(running) < self.max_workers else None
+                if not running:
+                    time.sleep(timeout or 0)
+                    continue
+                done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    job = running.pop(future)
+                    url, dest, options = jobs[job[0]]
+                    hosts[self._host(url)] -= 1
+                    path, length, error = future.result()
+                    if error is not None and job[1] <= self.retries and self._retriable(error):
+                        delay = self._delay(job[1])
+                        self._logger.warning('Download of %s failed (%s), retry %s in %.2fs'%(url, error, job[1], delay))
+                        retried += 1
+                        job[2] = time.monotonic() + delay
+                        waiting.append(job)
+                        #keep the order of the jobs
+                        waiting.sort(key=lambda job: job[0])
+                        continue
+                    if error is not None:
+                        failed += 1
+                        self._logger.error('Download of %s failed after %s attempts: %s'%(url, job[1], error))
+                    else:
+                        size += length
+                    yield job[0], DownloadResult(url, path, error is None, length, job[1], error, time.monotonic() - job[3])
+        wall = time.monotonic() - start
+        self.stats = {
+            'count': len(jobs),
+            'failed': failed,
+            'retries': retried,
+            'bytes': size,
+            'wall': wall,
+            'throughput': size / wall if wall > 0 else 0.0,
+        }
+        self._logger.info('Downloaded %s urls (%s bytes) in %.3fs (%.0f bytes/s), %s failed, %s retries'
+            %(len(jobs), size, wall, self.stats['throughput'], failed, retried))
+
+    def run(self, ordered:bool=True) -> list:
+        """
+        Run the jobs
+
+        Args:
+            ordered (bool, optional): return the results in the order the jobs were added, else in completion order
+
+        Returns:
+            list: the results (DownloadResult)
+        """
+        if ordered:
+            results = [None] * len(self._jobs)
+            for i, result in self.run_iter():
+                results[i] = result
+            return results
+        return [result for _, result in self.run_iter()]
@@ -7,6 +7,14 @@ Download web pages or files from the internet with a get download method and sav
 Uses:
 - os: https://docs.python.org/3/library/os.html
 - logging: https://docs.python.org/3/library/logging.html
+- threading: https://docs.python.org/3/library/threading.html
+- time: https://docs.python.org/3/library/time.html
+- json: https://docs.python.org/3/library/json.html
+- hashlib: https://docs.python.org/3/library/hashlib.html
+- shutil: https://docs.python.org/3/library/shutil.html
+- contextlib: https://docs.python.org/3/library/contextlib.html
+- tempfile: https://docs.python.org/3/library/tempfile.html
+- concurrent.futures: https://docs.python.org/3/library/concurrent.futures.html
 - requests: https://requests.readthedocs.io/en/latest/
 
 """
@@ -16,15 +24,45 @@ __license__ = "MIT"
 
 import logging
 import os
+import threading
+import time
+import json
+import hashlib
+import shutil
+import contextlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from urllib.parse import urlparse
 
 #external dependencies
 import requests
+from requests.adapters import HTTPAdapter, Retry
+from urllib3.exceptions import ProtocolError, ReadTimeoutError, DecodeError
 
+from frua.base.http.ratelimit import TokenBucket
 
-class GetDownloader(object):
+#default timeouts: (connect, read) in seconds
+DEFAULT_TIMEOUT = (10, 60)
 
-    def __init__(self, url:str=None, file_name:str=None, file_dir:str=None, *args, **kwargs) -> None:
+
+class _BaseDownloader(object):
+    """
+    Base of the downloaders: url, file_name and file_dir attributes, file path inference, rate limit and checksums
+
+    Tuning attributes, can be set as keyword arguments of the constructor:
+    - min_chunk_size, max_chunk_size: bounds of the read size
+    - progress_interval: seconds between two progress reports
+    - progress: function called with (downloaded bytes, total bytes or None) at each progress report
+    - rate_limit: bandwidth cap, bytes per second for this downloader or a TokenBucket shared with other downloads
+    """
+
+    min_chunk_size = 64 * 1024
+    max_chunk_size = 4 * 1024 * 1024
+    progress_interval = 5.0
+    progress = None
+    rate_limit = None
+
+    def __init__(self, url:str=None, file_name:str=None, file_dir:str=None, timeout:object=DEFAULT_TIMEOUT, *args, **kwargs) -> None:
         """
         Constructor
 
@@ -32,11 +70,13 @@ class GetDownloader(object):
             url (str): the url to download
             file_name (str): the filename to save
             file_dir (str): the directory to save the file to
+            timeout (object): seconds or (connect, read) tuple (optional). Defaults to (10, 60).
             logger (logging.Logger): the logger to use (optional)
             args: positional arguments
             kwargs: keyword arguments
         """
         super().__init__()
+        self.timeout = timeout
         #other attributes
         self._args = args
         self.__dict__.update(kwargs)
@@ -69,6 +109,7 @@ class GetDownloader(object):
         """
         return self._url
     
+
     @url.setter
     def url(self, url:str) -> None:
         """
@@ -89,6 +130,7 @@ class GetDownloader(object):
         """
         return self._file_name
     
+
     @file_name.setter
     def file_name(self, file_name:str) -> None:
         """
@@ -99,6 +141,7 @@ class GetDownloader(object):
         """
         self._file_name = file_name
     
+
     @property
     def file_dir(self) -> str:
         """
@@ -119,23 +162,63 @@ class GetDownloader(object):
         """
         self._file_dir = file_dir
 
-    def download(self, overwrite=False):
+    def _bucket(self) -> TokenBucket:
         """
-        Download a file from the internet.
+        Returns the token bucket of rate_limit
 
-        Saved by default to the current directory.
+        Returns:
+            TokenBucket: the bucket, None if the bandwidth is not capped
+        """
+        limit = self.rate_limit
+        if limit is None or isinstance(limit, TokenBucket):
+            return limit
+        bucket = self.__dict__.get('_rate_bucket')
+        if bucket is None or bucket.rate != limit:
+            bucket = self._rate_bucket = TokenBucket(limit)
+        return bucket
+
+    def _max_chunk(self, bucket:TokenBucket) -> int:
+        """
+        Returns the maximum read size: max_chunk_size, capped to the burst of the bucket to keep the rate smooth
 
         Args:
-            overwrite (bool): whether to overwrite an existing file
+            bucket (TokenBucket): the bucket, None if the bandwidth is not capped
 
         Returns:
-            bool: True if successful, False otherwise
+            int: the size in bytes
+        """
+        if bucket is None:
+            return self.max_chunk_size
+        return max(min(self.max_chunk_size, int(bucket.burst)), 1)
 
+    @staticmethod
+    def _parse_checksum(checksum:str) -> tuple:
+        """
+        Parse a checksum
+
+        Args:
+            checksum (str): 'algorithm:hexdigest' (e.g. 'sha256:2cf24d...') or a SHA-256 hexdigest
+
+        Returns:
+            tuple: (algorithm, hexdigest in lower case)
+        """
+        algorithm, _, digest = checksum.rpartition(':')
+        algorithm = algorithm.lower() or 'sha256'
+        #shake digests have no fixed length
+        if algorithm not in hashlib.algorithms_available or algorithm.startswith('shake_'):
+            raise ValueError("Unsupported checksum algorithm %s" % algorithm)
+        return algorithm, digest.lower()
+
+    def _file_path(self) -> str:
+        """
+        Returns the path of the downloaded file
+
+        The file name defaults to the last part of the url path (or the domain), the directory to the parent
+        of the current directory.
+
+        Returns:
+            str: the file path
         """
-        # Check url is set
-        if self.url == None:
-            self._logger.error("You must set the url")
-            return False
         # Set the filename if not set
         if self.file_name is None:
             file_name = self.url.split('/')[-1]
@@ -155,7 +238,745 @@ class GetDownloader(object):
                 os.makedirs(self.file_dir)
                 self._logger.info("Created directory %s" % self.file_dir)
         # Compute the output file path
-        file_path = os.path.normpath(os.path.join(self.file_dir, self.file_name))
+        return os.path.normpath(os.path.join(self.file_dir, self.file_name))
+
+
+class GetDownloader(_BaseDownloader):
+    """
+    Download a url to a file
+
+    Tuning attributes, can be set as keyword arguments of the constructor:
+    - min_chunk_size, max_chunk_size: bounds of the read size, adapted to the throughput
+    - progress_interval: seconds between two progress reports
+    - progress: function called with (downloaded bytes, total bytes or None) at each progress report
+    - segments: number of byte ranges downloaded in parallel when the server supports ranges (see download)
+    - min_segment_size: minimum size of a byte range
+    - cache_dir: directory of the download cache (see download), None for no cache
+    - cache_link: save the files of the download cache as hardlinks to the cached content instead of copies (see _fetch_cached)
+    - rate_limit: bandwidth cap, bytes per second for this downloader or a TokenBucket shared with other downloads
+    """
+
+    segments = 1
+    min_segment_size = 4 * 1024 * 1024
+    cache_dir = None
+    cache_link = False
+
+    #session shared by the instances without their own session (see shared_session)
+    _shared_session = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, url:str=None, file_name:str=None, file_dir:str=None, session:requests.Session=None, timeout:object=DEFAULT_TIMEOUT, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            url (str): the url to download
+            file_name (str): the filename to save
+            file_dir (str): the directory to save the file to
+            session (requests.Session): the session to use (optional). Defaults to the shared session, see shared_session.
+            timeout (object): requests timeout, seconds or (connect, read) tuple (optional). Defaults to (10, 60).
+            logger (logging.Logger): the logger to use (optional)
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        self._session = session
+        super().__init__(url, file_name, file_dir, timeout, *args, **kwargs)
+
+    @staticmethod
+    def make_session(pool_connections:int=10, pool_maxsize:int=10, retries:int=3, backoff_factor:float=0.5, status_forcelist:tuple=(429, 500, 502, 503, 504)) -> requests.Session:
+        """
+        Create a session with a connection pool and retries
+
+        Args:
+            pool_connections (int): number of hosts to keep connections to
+            pool_maxsize (int): number of connections kept per host (one per thread downloading from the host)
+            retries (int): number of retries on connection errors and retryable status codes
+            backoff_factor (float): retries wait backoff_factor * 2 ** (retry number - 1) seconds
+            status_forcelist (tuple): status codes to retry
+
+        Returns:
+            requests.Session: the session
+        """
+        retry = Retry(total=retries, backoff_factor=backoff_factor, status_forcelist=status_forcelist,
+            allowed_methods=frozenset(['GET', 'HEAD']), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    @classmethod
+    def shared_session(cls, session:requests.Session=None) -> requests.Session:
+        """
+        Returns the session shared by all the instances, created on first use with make_session defaults
+
+        Args:
+            session (requests.Session): replace the shared session (optional), e.g. by make_session(pool_maxsize=32)
+
+        Returns:
+            requests.Session: the shared session
+        """
+        with cls._shared_lock:
+            if session is not None:
+                GetDownloader._shared_session = session
+            elif GetDownloader._shared_session is None:
+                GetDownloader._shared_session = cls.make_session()
+            return GetDownloader._shared_session
+
+    @property
+    def session(self) -> requests.Session:
+        """
+        Returns the session used to download
+
+        Returns:
+            requests.Session: the session of the instance, or the shared session
+        """
+        if self._session is None:
+            return self.shared_session()
+        return self._session
+
+    @session.setter
+    def session(self, session:requests.Session) -> None:
+        """
+        Set the session used to download
+
+        Args:
+            session (requests.Session): the session, None for the shared session
+        """
+        self._session = session
+
+    @staticmethod
+    def _content_length(r:requests.Response) -> int:
+        """
+        Returns the size of the body of a response, as saved
+
+        Args:
+            r (requests.Response): the response
+
+        Returns:
+            int: the size, None if unknown (no Content-Length or compressed content)
+        """
+        length = r.headers.get('Content-Length')
+        if length is None or r.headers.get('Content-Encoding', 'identity') != 'identity':
+            return None
+        try:
+            return int(length)
+        except ValueError:
+            return None
+
+    def _save(self, r:requests.Response, file_path:str, offset:int=0, checkpoint=None, hashes:list=None) -> int:
+        """
+        Write the body of a response to a file, preallocated when the size is known
+
+        Args:
+            r (requests.Response): the response (streamed)
+            file_path (str): the file path
+            offset (int): position to write the body at, the start of the file is kept (resumed download)
+            checkpoint (callable): called with the number of bytes safely written, at each progress report and on error
+            hashes (list): hash objects (hashlib) updated with the content of the file, the kept start included
+
+        Returns:
+            int: size of the file
+        """
+        length = self._content_length(r)
+        total = None if length is None else offset + length
+        with open(file_path, 'r+b' if offset else 'wb') as f:
+            if total:
+                try:
+                    os.posix_fallocate(f.fileno(), 0, total)
+                except (OSError, AttributeError):
+                    #not supported by the file system or the platform
+                    pass
+            if hashes and offset:
+                #only the kept start is read back
+                self._hash_file(f, hashes, offset)
+            f.seek(offset)
+            size = self._copy(r, f, total, offset, checkpoint, hashes)
+            #drop the preallocated tail if the body was shorter than announced
+            f.truncate(size)
+        return size
+
+    def _copy(self, r:requests.Response, f, total:int, done:int=0, checkpoint=None, hashes:list=None) -> int:
+        """
+        Copy the body of a response to a file
+
+        The read size starts at min_chunk_size and doubles while reads are fast, up to max_chunk_size,
+        it halves when reads get slow. Progress is reported every progress_interval seconds.
+
+        Args:
+            r (requests.Response): the response (streamed)
+            f (file): the file, opened in binary mode
+            total (int): expected total size, None if unknown
+            done (int): bytes already downloaded (resumed download)
+            checkpoint (callable): called with the number of bytes safely written, at each progress report and on error
+            hashes (list): hash objects (hashlib) updated with the chunks as they are written
+
+        Returns:
+            int: total bytes downloaded (done included)
+        """
+        bucket = self._bucket()
+        max_size = self._max_chunk(bucket)
+        size = min(self.min_chunk_size, max_size)
+        read = r.raw.read
+        write = f.write
+        updates = [h.update for h in hashes or []]
+        start = last = time.monotonic()
+        try:
+            while True:
+                before = time.monotonic()
+                chunk = read(size, decode_content=True)
+                if not chunk:
+                    break
+                write(chunk)
+                for update in updates:
+                    update(chunk)
+                done += len(chunk)
+                now = time.monotonic()
+                elapsed = now - before
+                if bucket is not None:
+                    bucket.consume(len(chunk))
+                if elapsed < 0.05 and len(chunk) == size and size < max_size:
+                    size = min(size * 2, max_size)
+                elif elapsed > 0.5 and size > self.min_chunk_size:
+                    size //= 2
+                if now - last >= self.progress_interval:
+                    last = now
+                    self._report(done, total, now - start)
+                    if checkpoint is not None:
+                        f.flush()
+                        checkpoint(done)
+        except BaseException as e:
+            if checkpoint is not None:
+                f.flush()
+                checkpoint(done)
+            error = self._read_error(e)
+            if error is e:
+                raise
+            raise error from e
+        self._report(done, total, time.monotonic() - start)
+        return done
+
+    @staticmethod
+    def _read_error(e:BaseException) -> BaseException:
+        """
+        Returns the requests exception for an error reading a response body, same as requests iter_content
+
+        Args:
+            e (BaseException): the error raised by urllib3
+
+        Returns:
+            BaseException: the exception to raise
+        """
+        if isinstance(e, ProtocolError):
+            return requests.exceptions.ChunkedEncodingError(e)
+        if isinstance(e, ReadTimeoutError):
+            return requests.exceptions.ConnectionError(e)
+        if isinstance(e, DecodeError):
+            return requests.exceptions.ContentDecodingError(e)
+        return e
+
+    @staticmethod
+    def _read_meta(meta_path:str) -> dict:
+        """
+        Read the metadata of a partial download
+
+        Args:
+            meta_path (str): path of the metadata file
+
+        Returns:
+            dict: url, etag, last_modified, total and offset, None if missing or invalid
+        """
+        try:
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return meta if isinstance(meta, dict) else None
+
+    @staticmethod
+    def _write_meta(meta_path:str, meta:dict) -> None:
+        """
+        Write the metadata of a partial download (atomically)
+
+        Args:
+            meta_path (str): path of the metadata file
+            meta (dict): the metadata
+        """
+        tmp = meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    @staticmethod
+    def _validator(meta:dict) -> str:
+        """
+        Returns the If-Range validator of a partial download
+
+        Args:
+            meta (dict): the metadata
+
+        Returns:
+            str: the strong ETag or the Last-Modified date, None if the download cannot be resumed safely
+        """
+        etag = meta.get('etag')
+        if etag and not etag.startswith('W/'):
+            return etag
+        return meta.get('last_modified')
+
+    def _fetch(self, file_path:str, resume:bool=True, headers:dict=None, hashes:dict=None, checksum:tuple=None) -> int:
+        """
+        Download the url to file_path through file_path.part, resuming a previous partial download if possible
+
+        The partial download is kept, with its metadata in file_path.part.json, if the download fails:
+        the next attempt requests the missing bytes only (Range) if the file did not change on the server (If-Range).
+        The offsets count the bytes of the body as sent: resumable requests ask for an uncompressed body
+        (Accept-Encoding: identity), a compressed response is not resumed.
+
+        Args:
+            file_path (str): the file path
+            resume (bool): resume a previous partial download
+            headers (dict): extra request headers (conditional request)
+            hashes (dict): algorithm -> hash object (hashlib), updated with the content of the file
+            checksum (tuple): expected (algorithm, hexdigest), checked with hashes before the rename (see _finish)
+
+        Returns:
+            int: size of the file, None if not modified (304 response to a conditional request)
+        """
+        part_path = file_path + '.part'
+        meta_path = part_path + '.json'
+        headers = dict(headers or {})
+        if resume:
+            #a Range is an offset in the encoded body, the saved file is decoded
+            headers.setdefault('Accept-Encoding', 'identity')
+        offset = 0
+        meta = self._read_meta(meta_path) if resume else None
+        if meta is not None and meta.get('url') == self.url and self._validator(meta) and os.path.exists(part_path):
+            offset = min(int(meta.get('offset') or 0), os.path.getsize(part_path))
+            if offset:
+                headers['Range'] = 'bytes=%s-' % offset
+                headers['If-Range'] = self._validator(meta)
+                self._logger.info("Resuming download of %s at %s bytes" % (self.url, offset))
+        #the response is closed after reading, releasing the connection to the pool of the session
+        with self.session.get(self.url, stream=True, timeout=self.timeout, headers=headers) as r:
+            if r.status_code == 304:
+                return None
+            if r.status_code == 416 and offset and meta.get('total') == offset:
+                #nothing left to download
+                length = offset
+                if hashes:
+                    with open(part_path, 'rb') as f:
+                        self._hash_file(f, hashes.values())
+            else:
+                r.raise_for_status()
+                if r.status_code != 206:
+                    #full content: the server ignored the range or the file changed
+                    offset = 0
+                elif not r.headers.get('Content-Range', '').startswith('bytes %s-' % offset):
+                    raise requests.HTTPError("Unexpected Content-Range %s for %s" % (r.headers.get('Content-Range'), self.url), response=r)
+                length = self._content_length(r)
+                meta = {'url': self.url, 'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified'),
+                    'total': None if length is None else offset + length, 'offset': offset}
+                checkpoint = None
+                if r.headers.get('Content-Encoding', 'identity') == 'identity':
+                    self._write_meta(meta_path, meta)
+                    def checkpoint(done:int) -> None:
+                        meta['offset'] = done
+                        self._write_meta(meta_path, meta)
+                elif os.path.exists(meta_path):
+                    #compressed anyway: the decoded size is no offset in the body, not resumable
+                    os.remove(meta_path)
+                length = self._save(r, part_path, offset, checkpoint, list((hashes or {}).values()))
+        self._finish(file_path, hashes, checksum)
+        self._meta = meta
+        return length
+
+    def _finish(self, file_path:str, hashes:dict=None, checksum:tuple=None) -> None:
+        """
+        Rename file_path.part to file_path once its checksum is verified, and remove its metadata
+
+        Args:
+            file_path (str): the file path
+            hashes (dict): algorithm -> hash object (hashlib) of the content
+            checksum (tuple): expected (algorithm, hexdigest), None to skip the verification
+
+        Raises:
+            ValueError: if the checksum does not match, the partial file and its metadata are deleted
+        """
+        part_path = file_path + '.part'
+        meta_path = part_path + '.json'
+        if checksum is not None:
+            algorithm, expected = checksum
+            digest = hashes[algorithm].hexdigest()
+            if digest != expected:
+                for path in (part_path, meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                raise ValueError("Checksum mismatch for %s: expected %s:%s, got %s:%s" % (self.url, algorithm, expected, algorithm, digest))
+        os.replace(part_path, file_path)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+
+
+    def _report(self, done:int, total:int, elapsed:float) -> None:
+        """
+        Report the progress of a download
+
+        Args:
+            done (int): bytes downloaded
+            total (int): total size, None if unknown
+            elapsed (float): seconds since the start
+        """
+        rate = done / elapsed / 1048576 if elapsed > 0 else 0.0
+        if total:
+            self._logger.info("%s: %s/%s bytes (%.1f%%) at %.2f MB/s" % (self.url, done, total, 100.0 * done / total, rate))
+        else:
+            self._logger.info("%s: %s bytes at %.2f MB/s" % (self.url, done, rate))
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def _hash_file(self, f, hashes:list, size:int=None) -> None:
+        """
+        Update hash objects with the content of a file
+
+        Args:
+            f (file): the file, opened in binary mode
+            hashes (list): hash objects (hashlib)
+            size (int): number of bytes to hash from the start of the file, None for the whole file
+        """
+        f.seek(0)
+        remaining = size
+        while remaining is None or remaining > 0:
+            chunk = f.read(self.max_chunk_size if remaining is None else min(remaining, self.max_chunk_size))
+            if not chunk:
+                break
+            for h in hashes:
+                h.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+
+    def _fetch_range(self, fd:int, segment:list, validator:str, stop:threading.Event) -> None:
+        """
+        Download a byte range and write it at its offset
+
+        Args:
+            fd (int): file descriptor of the partial file
+            segment (list): [next position, last position], the next position is updated as the data is written
+            validator (str): If-Range validator (ETag or Last-Modified)
+            stop (threading.Event): set when another range failed
+        """
+        headers = {'Range': 'bytes=%s-%s' % (segment[0], segment[1])}
+        if validator:
+            headers['If-Range'] = validator
+        with self.session.get(self.url, stream=True, timeout=self.timeout, headers=headers) as r:
+            r.raise_for_status()
+            if r.status_code != 206 or not r.headers.get('Content-Range', '').startswith('bytes %s-' % segment[0]):
+                raise requests.HTTPError("Range %s not served for %s (file changed?)" % (headers['Range'], self.url), response=r)
+            read = r.raw.read
+            bucket = self._bucket()
+            max_size = self._max_chunk(bucket)
+            size = min(self.min_chunk_size, max_size)
+            try:
+                while segment[0] <= segment[1] and not stop.is_set():
+                    before = time.monotonic()
+                    chunk = read(min(size, segment[1] - segment[0] + 1))
+                    if not chunk:
+                        raise requests.exceptions.ChunkedEncodingError("Connection closed at %s for %s" % (segment[0], self.url))
+                    view = memoryview(chunk)
+                    while view:
+                        written = os.pwrite(fd, view, segment[0])
+                        view = view[written:]
+                        #written before being recorded: the checkpoints never claim missing data
+                        segment[0] += written
+                    elapsed = time.monotonic() - before
+                    if bucket is not None:
+                        #the segments of a download share its bucket
+                        bucket.consume(len(chunk))
+                    if elapsed < 0.05 and len(chunk) == size and size < max_size:
+                        size = min(size * 2, max_size)
+            except BaseException as e:
+                error = self._read_error(e)
+                if error is e:
+                    raise
+                raise error from e
+
+    def _fetch_segmented(self, file_path:str, segments:int, resume:bool=True, hashes:dict=None, checksum:tuple=None) -> int:
+        """
+        Download the url to file_path through file_path.part, as byte ranges fetched in parallel
+
+        The ranges still to download are kept in file_path.part.json: an interrupted download is resumed
+        if the file did not change on the server.
+
+        Args:
+            file_path (str): the file path
+            segments (int): number of ranges
+            resume (bool): resume a previous partial download
+            hashes (dict): algorithm -> hash object (hashlib), updated with the content of the file.
+                The ranges arrive out of order: the file is read back once complete.
+            checksum (tuple): expected (algorithm, hexdigest), checked with hashes before the rename (see _finish)
+
+        Returns:
+            int: size of the file, None if the server does not support ranges (or the file is too small to split)
+        """
+        r = self.session.head(self.url, timeout=self.timeout, allow_redirects=True)
+        if not r.ok or r.headers.get('Accept-Ranges') != 'bytes':
+            return None
+        total = self._content_length(r)
+        meta = {'url': self.url, 'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified'), 'total': total}
+        validator = self._validator(meta)
+        if total is None or not validator:
+            return None
+        segments = min(segments, total // self.min_segment_size)
+        if segments < 2:
+            return None
+        part_path = file_path + '.part'
+        meta_path = part_path + '.json'
+        previous = self._read_meta(meta_path) if resume else None
+        if (previous is not None and previous.get('segments') and os.path.exists(part_path) and os.path.getsize(part_path) == total
+                and all(previous.get(key) == meta[key] for key in ('url', 'etag', 'last_modified', 'total'))):
+            meta['segments'] = previous['segments']
+            self._logger.info("Resuming segmented download of %s" % self.url)
+        else:
+            step = -(-total // segments)
+            meta['segments'] = [[start, min(start + step, total) - 1] for start in range(0, total, step)]
+        fd = os.open(part_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if os.fstat(fd).st_size != total:
+                os.ftruncate(fd, 0)
+                try:
+                    os.posix_fallocate(fd, 0, total)
+                except (OSError, AttributeError):
+                    os.ftruncate(fd, total)
+            self._write_meta(meta_path, meta)
+            stop = threading.Event()
+            start = time.monotonic()
+            todo = [segment for segment in meta['segments'] if segment[0] <= segment[1]]
+            with ThreadPoolExecutor(max_workers=len(todo) or 1) as executor:
+                futures = [executor.submit(self._fetch_range, fd, segment, validator, stop) for segment in todo]
+                pending = futures
+                while pending:
+                    done, pending = wait(pending, timeout=self.progress_interval, return_when=FIRST_EXCEPTION)
+                    failed = [future for future in done if future.exception() is not None]
+                    if failed:
+                        stop.set()
+                        wait(pending)
+                        self._write_meta(meta_path, meta)
+                        raise failed[0].exception()
+                    remaining = sum(segment[1] - segment[0] + 1 for segment in meta['segments'])
+                    self._report(total - remaining, total, time.monotonic() - start)
+                    if pending:
+                        self._write_meta(meta_path, meta)
+        finally:
+            os.close(fd)
+        if hashes:
+            with open(part_path, 'rb') as f:
+                self._hash_file(f, hashes.values())
+        self._finish(file_path, hashes, checksum)
+        self._meta = meta
+        return total
+
+    def _cache_paths(self) -> tuple:
+        """
+        Returns the paths of the cache entry of the url
+
+        Returns:
+            tuple: (path of the metadata of the url, directory of the blobs)
+        """
+        key = hashlib.sha256(self.url.encode()).hexdigest()
+        return os.path.join(self.cache_dir, 'urls', key + '.json'), os.path.join(self.cache_dir, 'blobs')
+
+    @staticmethod
+    def _link(src:str, dst:str, link:bool=True) -> None:
+        """
+        Replace dst by a hardlink to src (a copy if src is on another file system), or by a copy of src
+
+        Args:
+            src (str): the source path
+            dst (str): the destination path
+            link (bool): hardlink if possible, else copy
+        """
+        #unique per thread: the downloads of a DownloadManager run in the threads of one process
+        tmp = '%s.%s.%s.tmp' % (dst, os.getpid(), threading.get_ident())
+        try:
+            if link:
+                try:
+                    os.link(src, tmp)
+                except OSError:
+                    shutil.copyfile(src, tmp)
+            else:
+                shutil.copyfile(src, tmp)
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _fetch_cached(self, file_path:str, segments:int, resume:bool=True, hashes:dict=None, checksum:tuple=None) -> int:
+        """
+        Download the url to file_path through the download cache
+
+        A url already in the cache is requested with If-None-Match/If-Modified-Since:
+        if not modified (304), the cached content is copied to file_path and nothing is transferred.
+        The downloaded files are stored by SHA-256 (blobs/<2 first hex digits>/<sha256>): identical contents
+        are stored once. The cached blobs are read-only.
+
+        With cache_link, file_path is a hardlink to the blob instead of a copy: no copy and no extra disk space,
+        but the file is read-only and shared with the cache and every other file of the same content,
+        it must never be changed in place.
+
+        Args:
+            file_path (str): the file path
+            segments (int): number of byte ranges (see download), for the urls not in the cache
+            resume (bool): resume a previous partial download
+            hashes (dict): algorithm -> hash object (hashlib), updated with the content of the file
+            checksum (tuple): expected (algorithm, hexdigest)
+
+        Returns:
+            int: size of the file
+        """
+        #the SHA-256 of the content is computed while it is written
+        hashes = dict(hashes or {})
+        hashes.setdefault('sha256', hashlib.sha256())
+        meta_path, blobs_dir = self._cache_paths()
+        entry = self._read_meta(meta_path)
+        blob = None
+        if entry is not None and entry.get('url') == self.url and entry.get('sha256'):
+            blob = os.path.join(blobs_dir, entry['sha256'][:2], entry['sha256'])
+            if not os.path.isfile(blob) or os.path.getsize(blob) != entry.get('size'):
+                blob = None
+        self._meta = None
+        size = None
+        if blob is not None:
+            headers = {}
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+            size = self._fetch(file_path, resume=resume, headers=headers, hashes=hashes, checksum=checksum)
+            if size is None:
+                self._logger.info("Cache hit for %s (not modified)" % self.url)
+                if checksum is not None:
+                    algorithm, expected = checksum
+                    digest = entry['sha256']
+                    if algorithm != 'sha256':
+                        with open(blob, 'rb') as f:
+                            self._hash_file(f, [hashes[algorithm]])
+                        digest = hashes[algorithm].hexdigest()
+                    if digest != expected:
+                        raise ValueError("Checksum mismatch for %s: expected %s:%s, got %s:%s" % (self.url, algorithm, expected, algorithm, digest))
+                for path in (file_path + '.part', file_path + '.part.json'):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self._link(blob, file_path, self.cache_link)
+                return entry['size']
+        else:
+            if segments > 1:
+                size = self._fetch_segmented(file_path, segments, resume=resume, hashes=hashes, checksum=checksum)
+            if size is None:
+                size = self._fetch(file_path, resume=resume, hashes=hashes, checksum=checksum)
+        #store the content by hash, a copy of the file unless linked
+        digest = hashes['sha256'].hexdigest()
+        blob = os.path.join(blobs_dir, digest[:2], digest)
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        if os.path.exists(blob):
+            if self.cache_link:
+                self._link(blob, file_path)
+        else:
+            self._link(file_path, blob, self.cache_link)
+            os.chmod(blob, 0o444)
+        meta = self._meta or {}
+        if meta.get('etag') or meta.get('last_modified'):
+            os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+            self._write_meta(meta_path, {'url': self.url, 'etag': meta.get('etag'), 'last_modified': meta.get('last_modified'),
+                'sha256': digest, 'size': size})
+        return size
+
+    def download_to(self, f, checksum:str=None, spool_size:int=None) -> int:
+        """
+        Download the url into a file object, e.g. a tempfile.SpooledTemporaryFile, instead of a file of file_dir
+
+        A spooled file is rolled over to disk before the download if the announced size is larger than spool_size.
+        The space of a file on disk is reserved before the download when the size is announced.
+
+        Args:
+            f (file): the file object, opened in binary mode, written from its current position
+            checksum (str): expected checksum 'algorithm:hexdigest' (see download), hashed while written
+            spool_size (int, optional): the max_size of f if it is a tempfile.SpooledTemporaryFile, None to never roll it over
+
+        Returns:
+            int: number of bytes written
+
+        Raises:
+            ValueError: if the checksum does not match
+        """
+        hashes = None
+        if checksum is not None:
+            checksum = self._parse_checksum(checksum)
+            hashes = [hashlib.new(checksum[0])]
+        self._logger.info("Downloading url %s." % self.url)
+        with self.session.get(self.url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            total = self._content_length(r)
+            #fileno() of a spooled file would roll it over: only called on files known to be on disk
+            on_disk = not isinstance(f, tempfile.SpooledTemporaryFile)
+            if total and not on_disk and spool_size is not None and total > spool_size:
+                #would spill anyway: spill now rather than after copying spool_size bytes from memory
+                f.rollover()
+                on_disk = True
+            if total and on_disk:
+                try:
+                    os.posix_fallocate(f.fileno(), f.tell(), total)
+                except (OSError, AttributeError, ValueError):
+                    #not a file (io.UnsupportedOperation is an OSError) or not supported
+                    pass
+            size = self._copy(r, f, total, 0, None, hashes)
+        if checksum is not None and hashes[0].hexdigest() != checksum[1]:
+            raise ValueError("Checksum mismatch for %s: expected %s:%s, got %s:%s" % (self.url, checksum[0], checksum[1], checksum[0], hashes[0].hexdigest()))
+        return size
+
+    @contextlib.contextmanager
+    def open(self):
+        """
+        Open the body of the url as a file object, read as it arrives from the network
+
+            with GetDownloader(url=url).open() as stream:
+                tarfile.open(fileobj=stream, mode='r|*').extractall(path, filter='data')
+
+        The content is decoded (Content-Encoding), the stream is not seekable. The response is closed on exit.
+
+        Yields:
+            file: the body stream (urllib3 response)
+        """
+        with self.session.get(self.url, stream=True, timeout=self.timeout) as r:
+            r.raise_for_status()
+            r.raw.decode_content = True
+            yield r.raw
+
+    def download(self, overwrite=False, resume=True, segments=None, checksum=None):
+        """
+        Download a file from the internet.
+
+        Saved by default to the current directory.
+        The file is written as file.part and renamed once complete, an interrupted download is resumed by the next call.
+        With cache_dir, a url downloaded before is only transferred again if modified on the server (conditional request),
+        the saved file is then a copy of the cached content, or a read-only hardlink to it with cache_link (see _fetch_cached).
+
+        Args:
+            overwrite (bool): whether to overwrite an existing file
+            resume (bool): whether to resume a previous partial download
+            segments (int): download that many byte ranges in parallel if the server supports ranges (Accept-Ranges).
+                Defaults to the segments attribute (1: a single stream).
+            checksum (str): expected checksum 'algorithm:hexdigest' (sha256, sha512, blake2b...), a bare hexdigest is a SHA-256.
+                The content is hashed while it is written, the partial file is deleted and ValueError raised if it does not match.
+
+        Returns:
+            bool: True if successful, False otherwise
+
+        """
+        # Check url is set
+        if self.url == None:
+            self._logger.error("You must set the url")
+            return False
+        file_path = self._file_path()
         #Check if file already exists if not allowed to overwrite
         if not overwrite and os.path.exists(file_path):
             self._logger.error("File %s already exists" % file_path)
@@ -165,17 +986,21 @@ class GetDownloader(object):
             self._logger.info("Downloading url %s."% self.url)
             self._logger.info("Url will be saved to %s" % file_path)
             #download the file
-            r = requests.get(self.url, stream=True)
-            r.raise_for_status()
-            #write the output
-            with open(file_path, 'wb') as f:
-                for chunk in r.iter_content(chunk_size=1024):
-                    if chunk: # filter out keep-alive new chunks
-                        f.write(chunk)
-                    else:
-                        break
-                    self._logger.info("Downloaded %s and saved to %s" % (self.url, file_path))
-                return True
+            segments = self.segments if segments is None else segments
+            hashes = None
+            if checksum is not None:
+                checksum = self._parse_checksum(checksum)
+                hashes = {checksum[0]: hashlib.new(checksum[0])}
+            size = None
+            if self.cache_dir is not None:
+                size = self._fetch_cached(file_path, segments, resume=resume, hashes=hashes, checksum=checksum)
+            else:
+                if segments > 1:
+                    size = self._fetch_segmented(file_path, segments, resume=resume, hashes=hashes, checksum=checksum)
+                if size is None:
+                    size = self._fetch(file_path, resume=resume, hashes=hashes, checksum=checksum)
+            self._logger.info("Downloaded %s (%s bytes) and saved to %s" % (self.url, size, file_path))
+            return True
         else:
             self._logger.info("File %s already exists in %s" % (self.file_name, self.file_dir))
             return False
\ No newline at end of file
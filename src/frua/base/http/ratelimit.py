@@ -0,0 +1,82 @@
+"""
+Token bucket rate limiter, to cap the bandwidth of one or many downloads
+
+Uses:
+- time: https://docs.python.org/3/library/time.html
+- threading: https://docs.python.org/3/library/threading.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import time
+import threading
+
+class TokenBucket(object):
+    """
+    Token bucket: tokens (bytes) are added at rate per second, up to burst
+
+        bucket = TokenBucket(rate=10 * 1024 * 1024, burst=1024 * 1024)
+        GetDownloader(url=url1, rate_limit=bucket).download()
+        GetDownloader(url=url2, rate_limit=bucket).download()  #the two downloads share 10 MB/s
+
+    A consumer takes the tokens of a chunk at once, the bucket may go into debt: the consumer then sleeps
+    until the debt is paid. The later consumers wait for the earlier debts too, the bandwidth is shared in
+    arrival order between the threads (and coroutines, see delay). Each chunk costs one lock and a few float
+    operations, and at most one sleep.
+    """
+    def __init__(self, rate:float, burst:float=None, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            rate (float): tokens (bytes) per second
+            burst (float, optional): maximum number of tokens saved while idle, sent at full speed. Defaults to rate (one second).
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        if rate <= 0:
+            raise ValueError('rate must be positive')
+        self.rate = float(rate)
+        self.burst = float(rate if burst is None else burst)
+        if self.burst <= 0:
+            raise ValueError('burst must be positive')
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def delay(self, n:int) -> float:
+        """
+        Take n tokens, without waiting
+
+        Args:
+            n (int): number of tokens (bytes)
+
+        Returns:
+            float: seconds to wait before using the tokens (0.0 if available), for asyncio.sleep
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens = min(self.burst, self._tokens + (now - self._last) * self.rate) - n
+            self._tokens = tokens
+            self._last = now
+        return -tokens / self.rate if tokens < 0 else 0.0
+
+    def consume(self, n:int) -> float:
+        """
+        Take n tokens, sleeping until they are available
+
+        Args:
+            n (int): number of tokens (bytes)
+
+        Returns:
+            float: seconds slept
+        """
+        delay = self.delay(n)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
@@ -3,66 +3,245 @@ Object with CRUD operations
 
 Extends DTObj
 
+The ObjIndex holding the object are updated by the CRUD operations.
+
+The attributes changed since the last save are tracked, diff() returns only those.
+
+Uses:
+- json: https://docs.python.org/3/library/json.html
+
 """
 __author__ = 'David HEURTEVENT'
 __copyright__ = 'David HEURTEVENT'
 __license__ = 'MIT'
 
+import json
+
 from frua.base.obj.dtobj import DTObj
+from frua.base.obj.objindex import ObjIndex
 
 from frua.base.time.help import TimeHelp
 
+#attributes never reported as changed
+#_ts is the internal timestamp of the lazy mode, the lazy fields derived from it are reported instead
+_UNTRACKED = frozenset(['__dict__', '_dirty', '_logger', '_ts'])
+
+def _is_data_descriptor(cls:type, name:str) -> bool:
+    """
+    Check if a class attribute is a data descriptor (property, slot...)
+
+    Args:
+        cls (type) : class
+        name (str) : attribute name
+
+    Returns:
+        bool : True if setting the attribute goes through the descriptor
+    """
+    return hasattr(type(getattr(cls, name, None)), '__set__')
+
+def _json_default(o:object) -> object:
+    """
+    Serialize datetimes (and dates, times) to ISO format in JSON
+
+    Args:
+        o (object) : object not serializable by json
+
+    Returns:
+        str : ISO format
+    """
+    if hasattr(o, 'isoformat'):
+        return o.isoformat()
+    raise TypeError('Object of type %s is not JSON serializable'%type(o).__name__)
 
 class CRUDObj(DTObj):
     """
     Object with CRUD operations
 
+    Attributes set since the last call to mark_clean() are tracked.
+    A new object is fully dirty, objects bulk loaded with from_dicts() are clean.
+    In-place changes (e.g. appending to a list attribute) must be marked with touch().
+
     Extends DTObj
     """
+
+    #changed attributes, kept out of __dict__ so equality and serialization are not affected
+    __slots__ = ('_dirty',)
     
+    #created_at and enabled_at are local times, like TimeHelp.now()
+    _lazy_fields = dict(DTObj._lazy_fields, created_at=TimeHelp.from_ns, enabled_at=TimeHelp.from_ns)
+
     def __init__(self, *args, **kwargs) -> None:
         """
         Constructor
 
+        created_at and enabled_at are kept when passed as keyword arguments.
+        In lazy mode (lazy=True), they are derived on demand from the construction timestamp.
+
         Args:
             args : positional arguments
             kwargs : optional arguments
         """
+        #everything is marked dirty at the end, no need to track the parents' attributes
+        object.__setattr__(self, '_dirty', set())
         super().__init__(*args, **kwargs)
-        if not hasattr(self, 'deleted'):
-            self.deleted = False
-        if not hasattr(self, 'created'):
-            self.created_at = TimeHelp.now()
-        if not hasattr(self, 'read_at'):
-            self.read_at = None
-        if not hasattr(self, 'updated_at'):
-            self.updated_at = None
-        if not hasattr(self, 'deleted_at'):
-            self.deleted_at = None
-        if not hasattr(self, 'enabled'):
-            self.enabled = True
-        if not hasattr(self, 'enabled_at'):
-            self.enabled_at = TimeHelp.now()
-        if not hasattr(self, 'disabled_at'):
-            self.disabled_at = None
+        #defaults are written to __dict__ directly to keep construction cheap
+        d = self.__dict__
+        d.setdefault('deleted', False)
+        d.setdefault('read_at', None)
+        d.setdefault('updated_at', None)
+        d.setdefault('deleted_at', None)
+        d.setdefault('enabled', True)
+        d.setdefault('disabled_at', None)
+        #lazy mode: created_at and enabled_at are built from _ts when read
+        if '_ts' not in d:
+            now = None
+            if 'created_at' not in d:
+                now = TimeHelp.now()
+                d['created_at'] = now
+            if 'enabled_at' not in d:
+                d['enabled_at'] = now or TimeHelp.now()
+        #never saved: everything is dirty, the lazy fields too (built when the diff is read)
+        dirty = set(d)
+        if '_ts' in d:
+            dirty.update(type(self)._lazy_fields)
+        self._dirty = dirty - _UNTRACKED
+
+    def __setattr__(self, name:str, value:object) -> None:
+        """
+        Set an attribute and mark it as changed
+
+        Properties are not marked: the attributes their setters change are.
+
+        Args:
+            name (str) : attribute name
+            value (object) : value
+        """
+        object.__setattr__(self, name, value)
+        if name not in _UNTRACKED and not _is_data_descriptor(type(self), name):
+            try:
+                self._dirty.add(name)
+            except AttributeError:
+                #bulk loaded objects start clean
+                object.__setattr__(self, '_dirty', {name})
+
+    def __delattr__(self, name:str) -> None:
+        """
+        Delete an attribute and mark it as changed
+
+        Args:
+            name (str) : attribute name
+        """
+        object.__delattr__(self, name)
+        if not _is_data_descriptor(type(self), name):
+            self.touch(name)
+
+    @property
+    def dirty(self) -> set:
+        """
+        Returns the names of the attributes changed since the last save
+
+        Returns:
+            set : attribute names
+        """
+        try:
+            return set(self._dirty)
+        except AttributeError:
+            return set()
+
+    def is_dirty(self) -> bool:
+        """
+        Check if the object changed since the last save
+
+        Returns:
+            bool: True if some attributes changed
+        """
+        try:
+            return bool(self._dirty)
+        except AttributeError:
+            return False
+
+    def touch(self, *names:str) -> None:
+        """
+        Mark attributes as changed (e.g. after an in-place change of a list or dict attribute)
+
+        Args:
+            names (str) : attribute names
+        """
+        try:
+            self._dirty.update(names)
+        except AttributeError:
+            object.__setattr__(self, '_dirty', set(names))
+
+    def mark_clean(self) -> None:
+        """
+        Mark the object as saved: no attribute is changed anymore
+        """
+        object.__setattr__(self, '_dirty', set())
+
+    def diff(self) -> dict:
+        """
+        Returns the attributes changed since the last save
+
+        Removed attributes are reported as None, like in a JSON merge patch (RFC 7396).
+        In lazy mode, the lazy fields not read yet are built.
+
+        Returns:
+            dict : changed attribute names and their values
+        """
+        d = self.__dict__
+        lazy = type(self)._lazy_fields if '_ts' in d else ()
+        return {k: getattr(self, k) if k in lazy and k not in d else d.get(k) for k in self.dirty}
+
+    def diff_json(self, sort_keys:bool=True) -> str:
+        """
+        Returns the attributes changed since the last save as a compact JSON patch
+
+        Datetimes are serialized to ISO format.
+
+        Args:
+            sort_keys (bool, optional): sort keys
+
+        Returns:
+            str : JSON string of the changed attributes
+        """
+        return json.dumps(self.diff(), sort_keys=sort_keys, separators=(',', ':'), default=_json_default)
+
+    def apply_diff(self, diff:dict) -> object:
+        """
+        Apply changes returned by diff() to the object
+
+        The applied attributes are marked as changed.
+
+        Args:
+            diff (dict) : attribute names and their values
+
+        Returns:
+            self
+        """
+        for k, v in diff.items():
+            setattr(self, k, v)
+        return self
     
     def create(self) -> None:
         """
         Mark the object as created
         """
         self.created_at = TimeHelp().utcnow()
+        ObjIndex.notify(self)
 
     def read(self) -> None:
         """
         Mark the object as read
         """
         self.read_at = TimeHelp().utcnow()
+        ObjIndex.notify(self)
     
     def update(self) -> None:
         """
         Mark the object as updated
         """
         self.updated_at = TimeHelp().utcnow()
+        ObjIndex.notify(self)
     
     def delete(self) -> None:
         """
@@ -70,6 +249,7 @@ class CRUDObj(DTObj):
         """
         self.deleted_at = TimeHelp().utcnow()
         self.deleted = True
+        ObjIndex.notify(self)
     
     def undelete(self) -> None:
         """
@@ -77,6 +257,7 @@ class CRUDObj(DTObj):
         """
         self.deleted_at = None
         self.deleted = False
+        ObjIndex.notify(self)
        
     def enable(self) -> None:
         """
@@ -84,6 +265,7 @@ class CRUDObj(DTObj):
         """
         self.enabled = True
         self.enabled_at = TimeHelp().utcnow()
+        ObjIndex.notify(self)
 
     def disable(self) -> None:
         """
@@ -91,6 +273,7 @@ class CRUDObj(DTObj):
         """
         self.enabled = False
         self.disabled_at = TimeHelp().utcnow()
+        ObjIndex.notify(self)
 
     def is_deleted(self) -> bool:
         """
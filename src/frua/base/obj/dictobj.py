@@ -1,15 +1,25 @@
 """
 Object loaded from dict
 
+Uses:
+- sys: https://docs.python.org/3/library/sys.html
+
 """
 __author__ = 'David HEURTEVENT'
 __copyright__ = 'David HEURTEVENT'
 __license__ = 'MIT'
 
+import sys
+
 class DictObj(object):
     """
     Object loaded from dict
+
+    Not hashable by default, subclasses declare the attributes used for hashing in _hash_keys.
     """
+
+    #tuple of attribute names used to hash the object, None for an unhashable object
+    _hash_keys = None
     
     def __init__(self, *args, **kwargs) -> None:
         """
@@ -37,6 +47,51 @@ class DictObj(object):
             setattr(self, k, v)               
         return self
 
+    @classmethod
+    def from_dicts(cls, rows, keys:list=None, intern_keys:bool=False, copy:bool=True) -> list:
+        """
+        Bulk load objects from an iterable of dicts or tuples
+
+        Validation-free path for loading persisted objects (e.g. SQLite rows or JSON records):
+        the constructor is not called (no new id, datetime or logger) and setters are bypassed,
+        the __dict__ of each object is assigned in one shot.
+
+        Args:
+            rows (iterable) : dicts (or mappings), or tuples when keys is set
+            keys (list, optional) : attribute names for tuple rows (e.g. cursor.description names)
+            intern_keys (bool, optional) : intern the key strings so that all objects share them
+            copy (bool, optional) : copy dict rows, set to False to take ownership of the dicts
+
+        Returns:
+            list: the loaded objects
+        """
+        new = cls.__new__
+        objs = []
+        append = objs.append
+        if keys is not None:
+            keys = tuple(sys.intern(k) for k in keys) if intern_keys else tuple(keys)
+            for row in rows:
+                obj = new(cls)
+                obj.__dict__ = dict(zip(keys, row))
+                append(obj)
+        elif intern_keys:
+            intern = sys.intern
+            for row in rows:
+                obj = new(cls)
+                obj.__dict__ = {intern(k): v for k, v in row.items()}
+                append(obj)
+        elif copy:
+            for row in rows:
+                obj = new(cls)
+                obj.__dict__ = dict(row)
+                append(obj)
+        else:
+            for row in rows:
+                obj = new(cls)
+                obj.__dict__ = row
+                append(obj)
+        return objs
+
     def __eq__(self, other) -> bool:
         """
         Check equality
@@ -47,6 +102,8 @@ class DictObj(object):
         Returns:
             bool
         """
+        if not isinstance(other, DictObj):
+            return NotImplemented
         return self.__dict__ == other.__dict__
 
     def __ne__(self, other) -> bool:
@@ -59,5 +116,26 @@ class DictObj(object):
         Returns:
             bool
         """
+        if not isinstance(other, DictObj):
+            return NotImplemented
         return self.__dict__!= other.__dict__
 
+    def __hash__(self) -> int:
+        """
+        Hash of the attributes listed in _hash_keys
+
+        Equal objects have equal attributes, so they share the same hash.
+
+        Returns:
+            int
+
+        Raises:
+            TypeError: if _hash_keys is not set
+        """
+        keys = self._hash_keys
+        if keys is None:
+            raise TypeError("unhashable type: '%s'"%type(self).__name__)
+        if len(keys) == 1:
+            return hash(getattr(self, keys[0]))
+        return hash(tuple(getattr(self, k) for k in keys))
+
@@ -2,6 +2,7 @@
 Object with a datetime
 Datetime is a string that contains the date and time when the object was created.
 By default, it is set to the current time in utc time.
+In lazy mode, it is derived on demand from a timestamp captured at construction.
 
 Extends UUIDObj
 
@@ -27,16 +28,60 @@ class DTObj(UUIDObj):
     Extends UUIDObj
     """
     
-    def __init__(self, *args, **kwargs) -> None:
+    #attributes derived on demand from the construction timestamp in lazy mode
+    #maps the attribute name to the TimeHelp converter from nanoseconds
+    _lazy_fields = {'_dt': TimeHelp.utcfrom_ns}
+
+    #derived attributes, (timestamp, name -> value), kept out of __dict__:
+    #equality and serialization do not depend on the attributes read so far
+    __slots__ = ('_lazy',)
+
+    def __init__(self, *args, lazy:bool=False, **kwargs) -> None:
         """
         Constructor
 
+        In lazy mode, only an integer timestamp (nanoseconds since the epoch) is captured.
+        The datetime attributes are built from it the first time they are read.
+
         Args:
             args : positional arguments
+            lazy (bool, optional) : capture a timestamp and derive the datetimes on demand
             kwargs : optional arguments
         """
         super().__init__(*args, **kwargs)
-        self._dt = TimeHelp().utcnow()
+        if lazy:
+            self._ts = TimeHelp.now_ns()
+        else:
+            self._dt = TimeHelp().utcnow()
+
+    def __getattr__(self, name:str) -> object:
+        """
+        Build a lazy datetime attribute from the construction timestamp
+
+        Only called when the attribute is not found the usual way.
+        The value is cached outside __dict__, until the timestamp changes.
+
+        Args:
+            name (str) : attribute name
+
+        Returns:
+            datetime.datetime : datetime
+        """
+        convert = type(self)._lazy_fields.get(name)
+        ts = self.__dict__.get('_ts')
+        if convert is None or ts is None:
+            raise AttributeError("'%s' object has no attribute '%s'"%(type(self).__name__, name))
+        try:
+            cached_ts, cache = object.__getattribute__(self, '_lazy')
+        except AttributeError:
+            cached_ts = None
+        if cached_ts != ts:
+            cache = {}
+            object.__setattr__(self, '_lazy', (ts, cache))
+        value = cache.get(name)
+        if value is None:
+            value = cache[name] = convert(ts)
+        return value
 
     @property
     def dt(self) -> datetime.datetime:
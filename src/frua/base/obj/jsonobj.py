@@ -1,6 +1,9 @@
 """
 Object serialized/deserialized to/from JSON
 
+Can also be serialized/deserialized to/from a compact binary format (see frua.base.data.binary),
+which supports datetimes, UUIDs and bytes.
+
 Extends UUIDObj
 
 Uses:
@@ -22,6 +25,7 @@ import errno
 
 
 from frua.base.obj.uidobj import UUIDObj
+from frua.base.data.binary import codec as bincodec
 
 class JSONObj(UUIDObj):
     """
@@ -170,7 +174,7 @@ class JSONObj(UUIDObj):
             filepath (str): filepath to read from
 
         Returns:
-            object: JSON Object representation
+            object: the deserialized object, None if the file does not exist
         """
         #check if file exists
         if not os.path.exists(filepath):
@@ -180,11 +184,13 @@ class JSONObj(UUIDObj):
         #load from the file
         try:
             with open(filepath, 'r') as file:
-                self = json.load(file)    
-                file.close()
+                obj = json.load(file)
+            if not isinstance(obj, dict):
+                raise TypeError('JSON file %s does not contain an object'%filepath)
+            self.__dict__.update(obj)
             if hasattr(self, '_logger'):
                 self._logger.debug('JSON Object %s read from %s'%(self._id, filepath))
-            return str(self)
+            return self
         except Exception as e:
             if hasattr(self, '_logger'):
                 self._logger.error('Could not read JSON Object %s from %s'%(self._id, filepath))
@@ -192,6 +198,134 @@ class JSONObj(UUIDObj):
             raise e
         return None
        
+    @classmethod
+    def iter_json(cls, file, jsonlines:bool=None, init:bool=True, chunk_size:int=65536, max_record_size:int=16 * 1024 * 1024):
+        """
+        Stream objects from a JSON text file object
+
+        Reads either the elements of a top-level array, or JSON Lines (one record per line).
+        The file is read by chunks, memory is bounded by the largest record (and max_record_size).
+
+        Args:
+            file (file): file object opened in text mode
+            jsonlines (bool, optional): True for JSON Lines, False for an array, None to detect it
+            init (bool, optional): call the constructor, else load like DictObj.from_dicts
+            chunk_size (int, optional): number of characters read at once
+            max_record_size (int, optional): maximum number of characters of a record, None for no limit.
+                An invalid record of an array is only detected once read entirely: the limit bounds the memory used.
+
+        Yields:
+            JSONObj: one object per record
+
+        Raises:
+            json.JSONDecodeError: if the JSON is not valid
+            TypeError: if a record is not a JSON object
+        """
+        decoder = json.JSONDecoder()
+        buf = ''
+        pos = 0
+        eof = False
+        size = chunk_size
+        in_array = None if jsonlines is None else not jsonlines
+        started = False
+        #in an array, what comes next: 'first' element or ']', ',' or ']' after an element ('sep'), 'value' after a ',',
+        #nothing but whitespace after the ']' ('end')
+        expect = 'first'
+        while True:
+            #skip whitespace
+            n = len(buf)
+            while pos < n and buf[pos] in ' \t\r\n':
+                pos += 1
+            if pos == n or size > chunk_size:
+                if eof:
+                    if pos < n:
+                        #invalid trailing data
+                        decoder.raw_decode(buf, pos)
+                    if in_array and expect != 'end':
+                        raise json.JSONDecodeError("Expecting ',' delimiter or ']'" if expect == 'sep' else 'Expecting value', buf, pos)
+                    break
+                #keep only the unread part and read more
+                data = file.read(size)
+                eof = not data
+                buf = buf[pos:] + data
+                pos = 0
+                size = chunk_size
+                continue
+            c = buf[pos]
+            if not started:
+                started = True
+                if in_array is None:
+                    in_array = c == '['
+                if in_array:
+                    if c != '[':
+                        raise json.JSONDecodeError('Expecting a JSON array', buf, pos)
+                    pos += 1
+                    continue
+            if in_array:
+                if expect == 'end':
+                    raise json.JSONDecodeError('Extra data', buf, pos)
+                if c == ']' and expect != 'value':
+                    #end of the array
+                    expect = 'end'
+                    pos += 1
+                    continue
+                if expect == 'sep':
+                    if c != ',':
+                        raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+                    expect = 'value'
+                    pos += 1
+                    continue
+                if c in ',]':
+                    raise json.JSONDecodeError('Expecting value', buf, pos)
+            try:
+                record, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                if not in_array and buf.find('\n', pos) != -1:
+                    #the whole line is read: invalid, not incomplete
+                    raise
+                if max_record_size is not None and len(buf) - pos > max_record_size:
+                    raise json.JSONDecodeError('Record larger than %s characters' % max_record_size, buf, pos)
+                #incomplete record: read more, twice as much each time
+                size = max(chunk_size, len(buf) - pos) * 2
+                continue
+            if end == len(buf) and not eof:
+                #a number may continue in the next chunk
+                size = chunk_size * 2
+                continue
+            pos = end
+            if in_array:
+                expect = 'sep'
+            if not isinstance(record, dict):
+                raise TypeError('JSON records must be objects')
+            if init:
+                obj = cls()
+                obj.__dict__.update(record)
+            else:
+                obj = cls.from_dicts((record,), copy=False)[0]
+            yield obj
+
+    @classmethod
+    def iter_json_file(cls, filepath:str, jsonlines:bool=None, init:bool=True, chunk_size:int=65536, max_record_size:int=16 * 1024 * 1024):
+        """
+        Stream objects from a JSON file (top-level array or JSON Lines)
+
+        See iter_json.
+
+        Args:
+            filepath (str): filepath to read from
+            jsonlines (bool, optional): True for JSON Lines, False for an array, None to detect it
+            init (bool, optional): call the constructor, else load like DictObj.from_dicts
+            chunk_size (int, optional): number of characters read at once
+            max_record_size (int, optional): maximum number of characters of a record, None for no limit
+
+        Yields:
+            JSONObj: one object per record
+        """
+        with open(filepath, 'r') as file:
+            yield from cls.iter_json(file, jsonlines=jsonlines, init=init, chunk_size=chunk_size, max_record_size=max_record_size)
+
     def tojson_file(self, filepath:str, create_dir:bool=True, sort_keys:bool=True, indent:int=4) -> str:
         """
         Serialize object to JSON and write it to a file
@@ -219,6 +353,160 @@ class JSONObj(UUIDObj):
         """
         return self.json_deserialize_from_file(filepath)
 
+    def _state(self) -> dict:
+        """
+        Returns the attributes to serialize (the logger is left out)
+
+        Returns:
+            dict: the attributes
+        """
+        if '_logger' in self.__dict__:
+            return {k: v for k, v in self.__dict__.items() if k != '_logger'}
+        return self.__dict__
+
+    def bin_serialize(self) -> bytes:
+        """
+        Serialize object to the binary format
+
+        Returns:
+            bytes: binary representation of the object
+        """
+        return bincodec.dumps(self._state())
+
+    def bin_deserialize(self, data:bytes, copy:bool=True) -> object:
+        """
+        Deserialize binary data into the object
+
+        Args:
+            data (bytes) : binary representation of the object
+            copy (bool, optional)  : if True, copy to the __dict__ of the deserialized object
+
+        Returns:
+            obj: deserialized object
+        """
+        obj = bincodec.loads(data)
+        if copy:
+            self.__dict__.update(obj)
+            return self
+        else:
+            return obj
+
+    def tobin(self, obj:object=None) -> bytes:
+        """
+        Serialize object to the binary format
+
+        If an object is provided, serialize it without copying to the container object (self)
+
+        Args:
+            obj (object, optional): object to serialize
+
+        Returns:
+            bytes: binary representation of the object
+        """
+        if obj is None:
+            return self.bin_serialize()
+        else:
+            return bincodec.dumps(obj)
+
+    def frombin(self, data:bytes, copy:bool=True) -> object:
+        """
+        Deserialize binary data into the object
+
+        Args:
+            data (bytes): binary representation of the object
+            copy (bool, optional): if True, copy to the __dict__ of the deserialized object
+
+        Returns:
+            object: the deserialized object, the deserialized value if copy is False
+        """
+        return self.bin_deserialize(data, copy=copy)
+
+    def bin_serialize_to_file(self, filepath:str, create_dir:bool=True) -> str:
+        """
+        Serialize object to the binary format and write it to a file
+
+        Args:
+            filepath (str): filepath to write to
+            create_dir (bool, optional): create directory if it does not exist
+
+        Returns:
+            str: filepath
+        """
+        #check if directory exists, else create it
+        if create_dir and not os.path.exists(os.path.dirname(filepath)):
+            try:
+                os.makedirs(os.path.dirname(filepath))
+                if hasattr(self, '_logger'):
+                    self._logger.debug('Created dir for %s'%filepath)
+            except OSError as exc: # Guard against race condition
+                if exc.errno != errno.EEXIST:
+                    raise
+        #dump to the file
+        try:
+            with open(filepath, 'wb') as file:
+                file.write(self.bin_serialize())
+            if hasattr(self, '_logger'):
+                self._logger.debug('Object %s dumped to %s'%(self._id, filepath))
+            return filepath
+        except Exception as e:
+            if hasattr(self, '_logger'):
+                self._logger.error('Could not dump Object %s to %s'%(self._id, filepath))
+                self._logger.error(e)
+            raise e
+
+    def bin_deserialize_from_file(self, filepath:str) -> object:
+        """
+        Deserialize a binary file into the object
+
+        Args:
+            filepath (str): filepath to read from
+
+        Returns:
+            object: the deserialized object, None if the file does not exist
+        """
+        #check if file exists
+        if not os.path.exists(filepath):
+            if hasattr(self, '_logger'):
+                self._logger.error('Binary file not found in %s'%(filepath))
+            return None
+        #load from the file
+        try:
+            with open(filepath, 'rb') as file:
+                self.bin_deserialize(file.read())
+            if hasattr(self, '_logger'):
+                self._logger.debug('Object %s read from %s'%(self._id, filepath))
+            return self
+        except Exception as e:
+            if hasattr(self, '_logger'):
+                self._logger.error('Could not read Object from %s'%(filepath))
+                self._logger.error(e)
+            raise e
+
+    def tobin_file(self, filepath:str, create_dir:bool=True) -> str:
+        """
+        Serialize object to the binary format and write it to a file
+
+        Args:
+            filepath (str): filepath to write to
+            create_dir (bool, optional) : create directory if it does not exist
+
+        Returns:
+            str: filepath
+        """
+        return self.bin_serialize_to_file(filepath, create_dir)
+
+    def frombin_file(self, filepath:str) -> object:
+        """
+        Deserialize a binary file into the object
+
+        Args:
+            filepath(str): filepath to read from
+
+        Returns:
+           object: the deserialized object
+        """
+        return self.bin_deserialize_from_file(filepath)
+
     def __str__(self) -> str:
         return self.json_serialize()
 
@@ -0,0 +1,329 @@
+"""
+In-memory index of objects
+
+Secondary indexes giving O(1) lookups of objects by attribute value.
+CRUDObj objects are reindexed when they are updated, deleted, enabled...
+
+Uses:
+- weakref: https://docs.python.org/3/library/weakref.html
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import weakref
+
+#indexes holding an object, by id() of the object
+#indexes are weakly referenced: dropping an index releases its objects
+#the entries are alive as long as an index holds the object, so its id() cannot be reused
+_registry = {}
+
+#marker for a missing attribute
+_MISSING = object()
+
+def _forget(objs:dict) -> None:
+    """
+    Drop the registry entries of the objects of a collected index, unless another index holds them
+
+    Args:
+        objs (dict): the objects of the index, by id()
+    """
+    for key in objs:
+        indexes = _registry.get(key)
+        #iterate rather than len(): the WeakSet may not have discarded the collected index yet
+        if indexes is not None and next(iter(indexes), None) is None:
+            del _registry[key]
+
+class ObjIndex(object):
+    """
+    In-memory index of objects
+
+    Objects are held by identity, they do not need to be hashable.
+    Attribute values must be hashable to be indexed, objects with a missing or unhashable value
+    are not found by lookups on that attribute.
+    """
+
+    def __init__(self, attrs:list=None, objs:list=None, keep_deleted:bool=False, *args, **kwargs) -> None:
+        """
+        Constructor
+
+        Args:
+            attrs (list, optional): the attributes to index
+            objs (list, optional): the objects to add
+            keep_deleted (bool, optional): keep deleted objects in the index (default: removed on delete)
+            args: positional arguments
+            kwargs: keyword arguments
+        """
+        super().__init__()
+        #other attributes
+        self._args = args
+        self.__dict__.update(kwargs)
+        self.keep_deleted = keep_deleted
+        #objects by id()
+        self._objs = {}
+        #the objects die with the index, their registry entries must go before their id() is reused
+        weakref.finalize(self, _forget, self._objs)
+        #attr -> value -> id() -> object
+        self._indexes = {}
+        #id() -> attr -> value the object is indexed under
+        self._values = {}
+        if attrs is not None:
+            for attr in attrs:
+                self.add_index(attr)
+        if objs is not None:
+            for obj in objs:
+                self.add(obj)
+
+    def _index(self, key:int, obj:object, attr:str, index:dict) -> None:
+        """
+        Index an object on an attribute
+
+        Args:
+            key (int): id() of the object
+            obj (object): the object
+            attr (str): the attribute
+            index (dict): the index of the attribute
+        """
+        value = getattr(obj, attr, _MISSING)
+        if value is _MISSING:
+            return
+        try:
+            index.setdefault(value, {})[key] = obj
+        except TypeError:
+            #unhashable value
+            return
+        self._values[key][attr] = value
+
+    def _unindex(self, key:int) -> None:
+        """
+        Remove an object from the attribute indexes
+
+        Args:
+            key (int): id() of the object
+        """
+        values = self._values[key]
+        for attr, value in values.items():
+            bucket = self._indexes[attr][value]
+            del bucket[key]
+            if not bucket:
+                del self._indexes[attr][value]
+        values.clear()
+
+    def add_index(self, attr:str) -> None:
+        """
+        Index the objects on an attribute
+
+        Args:
+            attr (str): the attribute
+        """
+        if attr in self._indexes:
+            return
+        index = self._indexes[attr] = {}
+        for key, obj in self._objs.items():
+            self._index(key, obj, attr, index)
+
+    def drop_index(self, attr:str) -> None:
+        """
+        Stop indexing an attribute
+
+        Args:
+            attr (str): the attribute
+        """
+        if self._indexes.pop(attr, None) is not None:
+            for values in self._values.values():
+                values.pop(attr, None)
+
+    @property
+    def attrs(self) -> list:
+        """
+        Returns the indexed attributes
+
+        Returns:
+            list: the indexed attributes
+        """
+        return list(self._indexes)
+
+    def add(self, obj:object) -> None:
+        """
+        Add an object to the index (or reindex it if already there)
+
+        Args:
+            obj (object): the object
+        """
+        key = id(obj)
+        if key in self._objs:
+            self.reindex(obj)
+            return
+        self._objs[key] = obj
+        self._values[key] = {}
+        for attr, index in self._indexes.items():
+            self._index(key, obj, attr, index)
+        _registry.setdefault(key, weakref.WeakSet()).add(self)
+
+    def remove(self, obj:object) -> bool:
+        """
+        Remove an object from the index
+
+        Args:
+            obj (object): the object
+
+        Returns:
+            bool: True if the object was in the index
+        """
+        key = id(obj)
+        if key not in self._objs:
+            return False
+        self._unindex(key)
+        del self._values[key]
+        del self._objs[key]
+        indexes = _registry.get(key)
+        if indexes is not None:
+            indexes.discard(self)
+            if not indexes:
+                del _registry[key]
+        return True
+
+    def reindex(self, obj:object) -> None:
+        """
+        Update the index after a change of the attributes of an object
+
+        Args:
+            obj (object): the object
+        """
+        key = id(obj)
+        if key not in self._objs:
+            return
+        self._unindex(key)
+        for attr, index in self._indexes.items():
+            self._index(key, obj, attr, index)
+
+    def get(self, attr:str, value:object) -> list:
+        """
+        Returns the objects having an attribute value
+
+        The attribute is indexed on first lookup if needed.
+
+        Args:
+            attr (str): the attribute
+            value (object): the value
+
+        Returns:
+            list: the objects
+        """
+        index = self._indexes.get(attr)
+        if index is None:
+            self.add_index(attr)
+            index = self._indexes[attr]
+        bucket = index.get(value)
+        if bucket is None:
+            return []
+        return list(bucket.values())
+
+    def first(self, attr:str, value:object) -> object:
+        """
+        Returns one object having an attribute value
+
+        Args:
+            attr (str): the attribute
+            value (object): the value
+
+        Returns:
+            object: the object, None if not found
+        """
+        index = self._indexes.get(attr)
+        if index is None:
+            self.add_index(attr)
+            index = self._indexes[attr]
+        bucket = index.get(value)
+        if not bucket:
+            return None
+        return next(iter(bucket.values()))
+
+    def dirty(self) -> list:
+        """
+        Returns the objects changed since their last save (see CRUDObj.is_dirty)
+
+        Returns:
+            list: the changed objects
+        """
+        return [obj for obj in self._objs.values() if getattr(obj, 'is_dirty', None) and obj.is_dirty()]
+
+    def flush(self, write) -> int:
+        """
+        Save the changes of all the changed objects in one batch
+
+        write is called once with a dict of the diffs (see CRUDObj.diff) by object id,
+        the objects are then marked clean. Nothing is called if no object changed.
+
+        Args:
+            write (callable): function saving the diffs, e.g. dumping them as JSON
+
+        Returns:
+            int: number of objects saved
+        """
+        objs = self.dirty()
+        if not objs:
+            return 0
+        write({getattr(obj, 'id', id(obj)): obj.diff() for obj in objs})
+        for obj in objs:
+            obj.mark_clean()
+        return len(objs)
+
+    def clear(self) -> None:
+        """
+        Remove all the objects (the indexed attributes are kept)
+        """
+        for obj in list(self._objs.values()):
+            self.remove(obj)
+
+    def __len__(self) -> int:
+        """
+        Number of objects
+
+        Returns:
+            int: number of objects
+        """
+        return len(self._objs)
+
+    def __iter__(self):
+        """
+        Iterate over the objects
+
+        Returns:
+            iterator: the objects, in insertion order
+        """
+        return iter(list(self._objs.values()))
+
+    def __contains__(self, obj:object) -> bool:
+        """
+        Check if an object is in the index
+
+        Args:
+            obj (object): the object
+
+        Returns:
+            bool: True if the object is in the index
+        """
+        return id(obj) in self._objs
+
+    @staticmethod
+    def notify(obj:object) -> None:
+        """
+        Update the indexes holding an object after a change
+
+        Deleted objects are removed from the indexes not keeping them.
+
+        Args:
+            obj (object): the object
+        """
+        indexes = _registry.get(id(obj))
+        if indexes is None:
+            return
+        deleted = getattr(obj, 'deleted', False)
+        for index in list(indexes):
+            if deleted and not index.keep_deleted:
+                index.remove(obj)
+            else:
+                index.reindex(obj)
+        if not indexes:
+            _registry.pop(id(obj), None)
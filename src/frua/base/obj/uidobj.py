@@ -18,8 +18,12 @@ class UUIDObj(DictObj):
     """
     Object identified with a unique identifier.
 
+    Hashed by id, it can be used in sets and as a dict key.
+
     Extends DictObj
     """
+
+    _hash_keys = ('_id',)
     
     def __init__(self, *args, **kwargs) -> None:
         """
@@ -3,6 +3,7 @@ Time helpers Shortcuts
 
 Uses:
 - datetime: https://docs.python.org/3/library/datetime.html
+- time: https://docs.python.org/3/library/time.html
 
 """
 __author__ = 'David HEURTEVENT'
@@ -10,6 +11,10 @@ __copyright__ = 'David HEURTEVENT'
 __license__ = 'MIT'
 
 import datetime
+import time
+
+#naive UTC epoch, used to convert nanosecond timestamps without going through the local timezone
+_EPOCH = datetime.datetime(1970, 1, 1)
 
 class TimeHelp(object):
     """
@@ -136,6 +141,44 @@ class TimeHelp(object):
         """
         return str(datetime.datetime.utcnow().isoformat())
 
+    @staticmethod
+    def now_ns() -> int:
+        """
+        Returns the current time as an integer number of nanoseconds since the epoch
+
+        Cheaper to capture than a datetime, convert it later with from_ns or utcfrom_ns
+
+        Returns:
+            int: the current time in nanoseconds since the epoch
+        """
+        return time.time_ns()
+
+    @staticmethod
+    def from_ns(ns:int) -> datetime.datetime:
+        """
+        Returns the local datetime for a number of nanoseconds since the epoch
+
+        Args:
+            ns (int): nanoseconds since the epoch (see now_ns)
+
+        Returns:
+            datetime.datetime: the local time (same as now() at capture time)
+        """
+        return datetime.datetime.fromtimestamp(ns // 1000000000).replace(microsecond=ns // 1000 % 1000000)
+
+    @staticmethod
+    def utcfrom_ns(ns:int) -> datetime.datetime:
+        """
+        Returns the UTC datetime for a number of nanoseconds since the epoch
+
+        Args:
+            ns (int): nanoseconds since the epoch (see now_ns)
+
+        Returns:
+            datetime.datetime: the time in UTC (same as utcnow() at capture time)
+        """
+        return _EPOCH + datetime.timedelta(microseconds=ns // 1000)
+
     @staticmethod
     def epoch() -> datetime.datetime:
         """
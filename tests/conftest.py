@@ -1,10 +1,151 @@
 """
-    Dummy conftest.py for base.
+    conftest.py for base.
 
-    If you don't know what this is for, just leave it empty.
     Read more about conftest.py under:
     - https://docs.pytest.org/en/stable/fixture.html
     - https://docs.pytest.org/en/stable/writing_plugins.html
 """
 
-# import pytest
+import pytest
+import time
+import threading
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+class _Handler(BaseHTTPRequestHandler):
+    """
+    Serves the files of the server (HTTP/1.1, keep-alive)
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_HEAD(self):
+        self.do_GET(head=True)
+
+    def do_GET(self, head=False):
+        with self.server.lock:
+            self.server.requests.append((('HEAD ' if head else '') + self.path, dict(self.headers)))
+        path = urlparse(self.path).path
+        #files: path -> body or (body, extra headers)
+        data = self.server.files.get(path)
+        if data is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        headers = {}
+        if isinstance(data, tuple):
+            data, headers = data
+        headers = dict(headers)
+        if self.server.validators:
+            headers.setdefault('ETag', '"%s"'%hashlib.sha1(data).hexdigest())
+            headers.setdefault('Last-Modified', 'Mon, 01 Jan 2024 00:00:00 GMT')
+        if self.server.ranges:
+            headers.setdefault('Accept-Ranges', 'bytes')
+        #conditional requests: If-None-Match first, else If-Modified-Since (exact dates only)
+        if_none_match = self.headers.get('If-None-Match')
+        if (headers.get('ETag') and if_none_match == headers['ETag']) or \
+                (if_none_match is None and headers.get('Last-Modified') and self.headers.get('If-Modified-Since') == headers['Last-Modified']):
+            self.send_response(304)
+            for name in ('ETag', 'Last-Modified'):
+                if name in headers:
+                    self.send_header(name, headers[name])
+            self.end_headers()
+            return
+        status = 200
+        start, end = 0, len(data) - 1
+        byte_range = self.headers.get('Range')
+        if_range = self.headers.get('If-Range')
+        if self.server.ranges and byte_range and (if_range is None or if_range in (headers.get('ETag'), headers.get('Last-Modified'))):
+            first, last = byte_range.split('=')[1].split('-')
+            start = int(first)
+            end = min(int(last), len(data) - 1) if last else len(data) - 1
+            if start >= len(data):
+                self.send_response(416)
+                self.send_header('Content-Range', 'bytes */%s'%len(data))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            status = 206
+            headers['Content-Range'] = 'bytes %s-%s/%s'%(start, end, len(data))
+        body = data[start:end + 1]
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        if head:
+            return
+        #simulated network failure: the connection is closed after some bytes, once
+        cut = self.server.cut.pop(path, None)
+        if cut is not None:
+            self.wfile.write(body[:cut])
+            self.close_connection = True
+            return
+        if self.server.rate:
+            #simulated slow link: rate bytes per second per connection
+            step = 16384
+            for pos in range(0, len(body), step):
+                self.wfile.write(body[pos:pos + step])
+                time.sleep(step / self.server.rate)
+            return
+        self.wfile.write(body)
+
+class LocalHTTPServer(object):
+    """
+    Local HTTP server for the download tests
+    """
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.lock = threading.Lock()
+        self.httpd.connections = 0
+        self.httpd.requests = []
+        self.httpd.files = {}
+        #send ETag and Last-Modified headers, honour Range requests
+        self.httpd.validators = True
+        self.httpd.ranges = True
+        #path -> number of bytes sent before closing the connection (once)
+        self.httpd.cut = {}
+        #bytes per second per connection, None for no limit
+        self.httpd.rate = None
+        self.thread = threading.Thread(target=self.httpd.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+        self.thread.start()
+
+    @property
+    def files(self):
+        return self.httpd.files
+
+    @property
+    def cut(self):
+        return self.httpd.cut
+
+    @property
+    def connections(self):
+        return self.httpd.connections
+
+    @property
+    def requests(self):
+        return self.httpd.requests
+
+    def url(self, path):
+        return 'http://127.0.0.1:%s%s'%(self.httpd.server_port, path)
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+@pytest.fixture
+def httpserver():
+    server = LocalHTTPServer()
+    yield server
+    server.close()
@@ -105,3 +105,86 @@ def test_tar_untar_cycle_gz(tarobj):
     if os.path.exists(tarfilepath):
         os.remove(tarfilepath)
 
+
+def test_untar_stream_strip_components(tarobj, tmp_path):
+    import io
+    import tarfile
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as tf:
+        for name, data in (('repo-main/a.txt', b'a'), ('repo-main/sub/b.txt', b'b')):
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+        link = tarfile.TarInfo('repo-main/c.txt')
+        link.type = tarfile.LNKTYPE
+        link.linkname = 'repo-main/a.txt'
+        tf.addfile(link)
+    #a stream: read only, no seek
+    class Stream(object):
+        def __init__(self, data):
+            self.raw = io.BytesIO(data)
+        def read(self, size=-1):
+            return self.raw.read(size)
+    assert tarobj.untar(Stream(buffer.getvalue()), str(tmp_path / 'out'), strip_components=1)
+    assert (tmp_path / 'out' / 'a.txt').read_bytes() == b'a'
+    assert (tmp_path / 'out' / 'sub' / 'b.txt').read_bytes() == b'b'
+    assert (tmp_path / 'out' / 'c.txt').read_bytes() == b'a'
+
+def _evil_tar(path, members):
+    import io
+    import tarfile
+    with tarfile.open(path, mode='w:gz') as tf:
+        for name, kind, target in members:
+            info = tarfile.TarInfo(name)
+            if kind == 'file':
+                info.size = 1
+                tf.addfile(info, io.BytesIO(b'x'))
+            else:
+                info.type = tarfile.SYMTYPE if kind == 'sym' else tarfile.LNKTYPE
+                info.linkname = target
+                tf.addfile(info)
+
+@pytest.mark.parametrize('filters', [True, False])
+@pytest.mark.parametrize('members,strip', [
+    ([('../evil.txt', 'file', None)], 0),
+    ([('repo-main/../../evil.txt', 'file', None)], 1),
+    ([('repo-main/link', 'sym', '../..'), ('repo-main/link/evil.txt', 'file', None)], 1),
+    ([('repo-main/hard', 'lnk', '/etc/passwd')], 1),
+])
+def test_untar_outside(tarobj, tmp_path, monkeypatch, filters, members, strip):
+    import tarfile
+    if not filters:
+        #Pythons without the extraction filters
+        monkeypatch.delattr(tarfile, 'data_filter', raising=False)
+    archive = str(tmp_path / 'evil.tar.gz')
+    _evil_tar(archive, members)
+    out = tmp_path / 'a' / 'out'
+    assert not tarobj.untar(archive, str(out), strip_components=strip)
+    with open(archive, 'rb') as f:
+        assert not tarobj.untar(f, str(out), strip_components=strip)
+    assert not (tmp_path / 'a' / 'evil.txt').exists()
+    assert not (tmp_path / 'evil.txt').exists()
+    assert sorted(os.listdir(tmp_path)) == ['a', 'evil.tar.gz']
+
+def test_untar_inside_links(tarobj, tmp_path, monkeypatch):
+    import tarfile
+    archive = str(tmp_path / 'ok.tar.gz')
+    _evil_tar(archive, [('repo-main/a.txt', 'file', None), ('repo-main/sub/link', 'sym', '../a.txt')])
+    for filters in (True, False):
+        if not filters:
+            monkeypatch.delattr(tarfile, 'data_filter', raising=False)
+        out = tmp_path / ('out%s' % filters)
+        assert tarobj.untar(archive, str(out), strip_components=1)
+        assert (out / 'sub' / 'link').read_bytes() == b'x'
+
+def test_untar_absolute(tarobj, tmp_path, monkeypatch):
+    import tarfile
+    archive = str(tmp_path / 'abs.tar.gz')
+    target = tmp_path / 'evil.txt'
+    _evil_tar(archive, [(str(target), 'file', None)])
+    for filters in (True, False):
+        if not filters:
+            monkeypatch.delattr(tarfile, 'data_filter', raising=False)
+        #refused, or extracted inside the destination with the leading slash removed
+        tarobj.untar(archive, str(tmp_path / ('out%s' % filters)))
+        assert not target.exists()
@@ -62,3 +62,19 @@ def test_zip_unzip_cycle(zipobj):
     if os.path.exists(zipfilepath):
         os.remove(zipfilepath)
 
+
+def test_unzip_strip_components_fileobj(zipobj, tmp_path):
+    import io
+    import zipfile
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zf:
+        zf.writestr('repo-main/', '')
+        zf.writestr('repo-main/a.txt', 'a')
+        zf.writestr('repo-main/sub/b.txt', 'b')
+        zf.writestr('repo-main/../evil.txt', 'x')
+    buffer.seek(0)
+    assert zipobj.unzip(buffer, str(tmp_path / 'out'), strip_components=1)
+    assert (tmp_path / 'out' / 'a.txt').read_text() == 'a'
+    assert (tmp_path / 'out' / 'sub' / 'b.txt').read_text() == 'b'
+    #member names are sanitized
+    assert not (tmp_path / 'evil.txt').exists()
@@ -0,0 +1,133 @@
+"""
+tests frua.base.cmd.acmd.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import os
+import time
+import asyncio
+import subprocess
+
+from frua.base.cmd.acmd import AsyncCmd
+from frua.base.cmd.cmd import CmdResult
+from frua.base.cmd.stats import CmdStats
+
+curdir = os.path.dirname(os.path.abspath(__file__))
+
+@pytest.fixture
+def acmdobj():
+    acmdobj = AsyncCmd()
+    return acmdobj
+
+def test_init(acmdobj):
+    assert isinstance(acmdobj, AsyncCmd)
+    assert acmdobj.semaphore is None
+
+def test_init_max_concurrency():
+    acmdobj = AsyncCmd(max_concurrency=2)
+    assert isinstance(acmdobj.semaphore, asyncio.Semaphore)
+
+def test_cmd(acmdobj):
+    result = asyncio.run(acmdobj.cmd('echo 1'))
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert result.returncode == 0
+    assert result.stdout == b'1\n'
+    assert result.stderr == b''
+
+def test_cmd_stats():
+    statsobj = CmdStats()
+    result = asyncio.run(AsyncCmd(stats=statsobj).cmd(['sleep', '0.1']))
+    assert isinstance(result, CmdResult)
+    assert result.wall >= 0.1
+    assert result.utime is None
+    entry = statsobj.get(['sleep', '0.1'])
+    assert entry['count'] == 1
+    assert entry['wall'] == pytest.approx(result.wall)
+
+def test_cmd_error(acmdobj):
+    result = asyncio.run(acmdobj.cmd('ls /path/that/does/not/exist'))
+    assert result.returncode != 0
+    assert result.stderr
+
+def test_cmd_check(acmdobj):
+    with pytest.raises(subprocess.CalledProcessError):
+        asyncio.run(acmdobj.cmd('false', check=True))
+
+def test_cmd_not_found(acmdobj):
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(acmdobj.cmd('command_that_does_not_exist'))
+
+def test_shell(acmdobj):
+    result = asyncio.run(acmdobj.raw(['echo 1 && echo 2'], shell=True))
+    assert result.stdout == b'1\n2\n'
+
+def test_bash(acmdobj):
+    result = asyncio.run(acmdobj.bash('echo $((1+2)) >&2'))
+    assert result.stderr == b'3\n'
+
+def test_python(acmdobj):
+    result = asyncio.run(acmdobj.python('print(1+2)'))
+    assert result.stdout == b'3\n'
+
+def test_python_script(acmdobj, tmp_path):
+    script = tmp_path / 'script.py'
+    script.write_text('import sys\nprint(sys.argv[1])\n')
+    result = asyncio.run(acmdobj.python_script(str(script), ['arg']))
+    assert result.stdout == b'arg\n'
+
+def test_callbacks():
+    lines = []
+    async def on_stderr(line):
+        lines.append(('err', line))
+    acmdobj = AsyncCmd(on_stdout=lambda line: lines.append(('out', line)), on_stderr=on_stderr)
+    result = asyncio.run(acmdobj.bash('echo a; echo b >&2; printf c'))
+    assert ('out', b'a\n') in lines
+    assert ('out', b'c') in lines
+    assert ('err', b'b\n') in lines
+    assert result.stdout == b'a\nc'
+
+def test_long_line(acmdobj):
+    lines = []
+    result = asyncio.run(acmdobj.python('print("x" * 200000)', on_stdout=lines.append))
+    assert lines == [b'x' * 200000 + b'\n']
+    assert len(result.stdout) == 200001
+
+def test_timeout(acmdobj):
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        asyncio.run(acmdobj.cmd('sleep 5', timeout=0.2))
+    assert time.monotonic() - start < 2
+
+def test_cancel_kills_process_group(acmdobj, tmp_path):
+    pidfile = tmp_path / 'pid'
+    async def main():
+        task = asyncio.create_task(acmdobj.bash('sleep 30 & echo $! > %s; wait'%pidfile))
+        while not pidfile.exists() or not pidfile.read_text():
+            await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    pid = int(pidfile.read_text())
+    #the background child was killed with its group
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        pytest.fail('child process still running')
+
+def test_concurrency():
+    acmdobj = AsyncCmd(max_concurrency=2)
+    async def main():
+        return await asyncio.gather(*[acmdobj.cmd('sleep 0.3') for _ in range(4)])
+    start = time.monotonic()
+    results = asyncio.run(main())
+    elapsed = time.monotonic() - start
+    assert all(result.returncode == 0 for result in results)
+    assert 0.55 < elapsed < 2
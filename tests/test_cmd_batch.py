@@ -0,0 +1,90 @@
+"""
+tests frua.base.cmd.batch.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import sys
+import time
+
+from frua.base.cmd.batch import CmdBatch
+
+@pytest.fixture
+def batchobj():
+    batchobj = CmdBatch()
+    return batchobj
+
+def test_init(batchobj):
+    assert isinstance(batchobj, CmdBatch)
+    assert batchobj.max_workers >= 1
+    assert len(batchobj) == 0
+
+def test_init_with_cmdlines():
+    batchobj = CmdBatch(['echo 1', ['echo', '2']], max_workers=2)
+    assert len(batchobj) == 2
+    assert batchobj.max_workers == 2
+
+def test_run_ordered(batchobj):
+    for i in range(8):
+        batchobj.add([sys.executable, '-c', 'print(%s)'%i])
+    results = batchobj.run()
+    assert [res.stdout for res in results] == [b'%d\n'%i for i in range(8)]
+    assert all(res.returncode == 0 for res in results)
+    assert all(res.wall > 0 for res in results)
+    assert batchobj.stats['count'] == 8
+    assert batchobj.stats['failed'] == 0
+    assert batchobj.stats['wall'] > 0
+    assert batchobj.stats['utime'] >= 0
+
+def test_run_parallel():
+    batchobj = CmdBatch(max_workers=4)
+    for i in range(4):
+        batchobj.add('sleep 0.5')
+    start = time.monotonic()
+    batchobj.run()
+    assert time.monotonic() - start < 1.5
+
+def test_run_iter_completion_order():
+    batchobj = CmdBatch(max_workers=2)
+    batchobj.add('sleep 0.5')
+    batchobj.add('echo fast')
+    indexes = [i for i, _ in batchobj.run_iter()]
+    assert indexes == [1, 0]
+    results = batchobj.run(ordered=False)
+    assert results[0].stdout == b'fast\n'
+
+def test_run_shell(batchobj):
+    batchobj.add('echo 1 && echo 2', shell=True)
+    results = batchobj.run()
+    assert results[0].stdout == b'1\n2\n'
+
+def test_timeout(batchobj):
+    batchobj.add('sleep 5', timeout=0.2)
+    batchobj.add('echo 1')
+    results = batchobj.run()
+    assert results[0].timed_out
+    assert results[0].returncode != 0
+    assert not results[1].timed_out
+    assert batchobj.stats['timed_out'] == 1
+    assert batchobj.stats['failed'] == 1
+
+def test_failures(batchobj):
+    batchobj.add('false')
+    batchobj.add('command_that_does_not_exist')
+    results = batchobj.run()
+    assert results[0].returncode == 1
+    assert results[1].returncode == 127
+    assert batchobj.stats['failed'] == 2
+
+def test_run_iter_break():
+    batchobj = CmdBatch(max_workers=2)
+    batchobj.add('echo fast')
+    for i in range(4):
+        batchobj.add('sleep 7', shell=True)
+    start = time.monotonic()
+    for i, result in batchobj.run_iter():
+        break
+    assert time.monotonic() - start < 3
+    assert batchobj.stats == {}
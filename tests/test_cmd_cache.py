@@ -0,0 +1,173 @@
+"""
+tests frua.base.cmd.cache.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import os
+import time
+import asyncio
+import threading
+import subprocess
+
+from frua.base.cmd.cmd import Cmd, CmdResult
+from frua.base.cmd.cache import CmdCache
+from frua.base.cmd.stats import CmdStats
+
+@pytest.fixture
+def cacheobj():
+    cacheobj = CmdCache()
+    return cacheobj
+
+def test_init(cacheobj):
+    assert isinstance(cacheobj, CmdCache)
+    assert len(cacheobj) == 0
+    assert cacheobj.hits == 0
+
+def test_key(cacheobj, tmp_path):
+    assert cacheobj.key(['ls']) == cacheobj.key(['ls'])
+    assert cacheobj.key(['ls']) != cacheobj.key(['ls', '-a'])
+    assert cacheobj.key(['ls'], cwd='/') != cacheobj.key(['ls'], cwd='/tmp')
+    path = tmp_path / 'input'
+    path.write_text('a')
+    key = cacheobj.key(['cat', str(path)], inputs=[path])
+    os.utime(path, ns=(0, 0))
+    assert cacheobj.key(['cat', str(path)], inputs=[path]) != key
+
+def test_key_env(monkeypatch):
+    cacheobj = CmdCache(env=['FRUA_TEST'])
+    monkeypatch.setenv('FRUA_TEST', '1')
+    key = cacheobj.key(['ls'])
+    monkeypatch.setenv('FRUA_TEST', '2')
+    assert cacheobj.key(['ls']) != key
+
+def test_get_set(cacheobj):
+    key = cacheobj.key(['ls'])
+    assert cacheobj.get(key) is None
+    result = CmdResult(['ls'], 0, b'a\n', b'')
+    assert cacheobj.set(key, result)
+    cached = cacheobj.get(key)
+    assert cached is not result
+    assert (cached.args, cached.returncode, cached.stdout) == (['ls'], 0, b'a\n')
+    #the hits are copies: modifying one does not change the cache
+    cached.args.append('-a')
+    cached.returncode = 1
+    result.args.append('-l')
+    assert cacheobj.get(key).args == ['ls']
+    assert cacheobj.get(key).returncode == 0
+    assert cacheobj.hits == 3
+    assert cacheobj.misses == 1
+    cacheobj.invalidate(key)
+    assert cacheobj.get(key) is None
+
+def test_errors_not_cached(cacheobj):
+    key = cacheobj.key(['false'])
+    assert not cacheobj.set(key, CmdResult(['false'], 1, b'', b''))
+    assert cacheobj.get(key) is None
+    cacheobj.cache_errors = True
+    assert cacheobj.set(key, CmdResult(['false'], 1, b'', b''))
+    assert cacheobj.get(key).returncode == 1
+
+def test_ttl():
+    cacheobj = CmdCache(ttl=0.1)
+    key = cacheobj.key(['ls'])
+    cacheobj.set(key, CmdResult(['ls'], 0, b'', b''))
+    assert cacheobj.get(key) is not None
+    time.sleep(0.15)
+    assert cacheobj.get(key) is None
+    assert len(cacheobj) == 0
+
+def test_lru():
+    cacheobj = CmdCache(maxsize=2)
+    keys = [cacheobj.key(['echo', str(i)]) for i in range(3)]
+    cacheobj.set(keys[0], CmdResult(['echo'], 0))
+    cacheobj.set(keys[1], CmdResult(['echo'], 0))
+    cacheobj.get(keys[0])
+    cacheobj.set(keys[2], CmdResult(['echo'], 0))
+    assert len(cacheobj) == 2
+    assert cacheobj.get(keys[0]) is not None
+    assert cacheobj.get(keys[1]) is None
+
+def test_disk(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    cacheobj = CmdCache(cache_dir=cache_dir, ttl=60)
+    key = cacheobj.key(['ls'])
+    cacheobj.set(key, CmdResult(['ls'], 0, b'out', b'err', 0.1, 0.01, 0.02, 1000))
+    assert len(os.listdir(cache_dir)) == 1
+    #new process: empty memory
+    cacheobj2 = CmdCache(cache_dir=cache_dir, ttl=60)
+    result = cacheobj2.get(key)
+    assert isinstance(result, CmdResult)
+    assert result.args == ['ls']
+    assert result.stdout == b'out'
+    assert result.stderr == b'err'
+    assert result.maxrss == 1000
+    assert len(cacheobj2) == 1
+    cacheobj2.clear()
+    assert os.listdir(cache_dir) == []
+
+def test_disk_expired(tmp_path):
+    cacheobj = CmdCache(cache_dir=str(tmp_path), ttl=0.1)
+    key = cacheobj.key(['ls'])
+    cacheobj.set(key, CmdResult(['ls'], 0, b'', b''))
+    time.sleep(0.15)
+    assert CmdCache(cache_dir=str(tmp_path)).get(key) is None
+    assert os.listdir(tmp_path) == []
+
+def test_disk_corrupted(tmp_path):
+    cacheobj = CmdCache(cache_dir=str(tmp_path))
+    key = cacheobj.key(['ls'])
+    with open(cacheobj._path(key), 'wb') as f:
+        f.write(b'\xff\xff')
+    assert cacheobj.get(key) is None
+    #removed: a miss, the command runs again
+    assert not os.path.exists(cacheobj._path(key))
+    cmdobj = Cmd(['ls'], cache=cacheobj)
+    with open(cacheobj._path(key), 'wb') as f:
+        f.write(b'')
+    assert cmdobj.cmd().returncode == 0
+    assert cacheobj.get(key).returncode == 0
+
+def test_cmd_cache(tmp_path):
+    statsobj = CmdStats()
+    cmdobj = Cmd(cache=CmdCache(), stats=statsobj)
+    result = cmdobj.cmd('uname -a')
+    assert cmdobj.cmd('uname -a').stdout == result.stdout
+    #the second call did not fork
+    assert statsobj.get('uname -a')['count'] == 1
+    assert cmdobj.cache.hits == 1
+
+def test_cmd_cache_inputs(tmp_path):
+    path = tmp_path / 'input'
+    path.write_text('a')
+    cmdobj = Cmd(cache=CmdCache())
+    assert cmdobj.cmd(['cat', str(path)], inputs=[path]).stdout == b'a'
+    path.write_text('bb')
+    assert cmdobj.cmd(['cat', str(path)], inputs=[path]).stdout == b'bb'
+
+def test_cmd_cache_check():
+    cmdobj = Cmd(cache=CmdCache(cache_errors=True))
+    cmdobj.cmd('false')
+    with pytest.raises(subprocess.CalledProcessError):
+        cmdobj.cmd('false', check=True)
+
+def test_acmd_cache():
+    from frua.base.cmd.acmd import AsyncCmd
+    cmdobj = AsyncCmd(cache=CmdCache())
+    result = asyncio.run(cmdobj.cmd('uname -a'))
+    assert asyncio.run(cmdobj.cmd('uname -a')).stdout == result.stdout
+    assert cmdobj.cache.hits == 1
+
+def test_set_threads(tmp_path):
+    cacheobj = CmdCache(cache_dir=str(tmp_path))
+    key = cacheobj.key(['ls'])
+    result = CmdResult(['ls'], 0, b'x' * 100000, b'')
+    threads = [threading.Thread(target=cacheobj.set, args=(key, result)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert os.listdir(tmp_path) == [os.path.basename(cacheobj._path(key))]
+    assert CmdCache(cache_dir=str(tmp_path)).get(key).stdout == result.stdout
@@ -8,9 +8,13 @@ __license__ = 'MIT'
 import pytest
 import os
 import sys
+import logging
+import subprocess
+import time
 from pathlib import Path
 
-from frua.base.cmd.cmd import Cmd, CmdLine
+from frua.base.cmd.cmd import Cmd, CmdLine, CmdResult, CmdTemplate
+from frua.base.cmd.stats import CmdStats
 
 curdir = os.path.dirname(os.path.abspath(__file__))
 
@@ -183,3 +187,114 @@ def test_raw_os_fail(cmdobj):
     line = "test"
     res = cmdobj.raw_os(line)
     assert res > 0
+
+def test_raw_resources(cmdobj):
+    res = cmdobj.python('sum(range(3000000)); x = bytearray(50 * 1024 * 1024)')
+    assert isinstance(res, CmdResult)
+    assert res.returncode == 0
+    assert res.wall > 0
+    assert res.utime > 0
+    assert res.stime >= 0
+    assert res.maxrss > 50 * 1024
+
+def test_raw_resources_with_timeout(cmdobj):
+    res = cmdobj.python('x = bytearray(50 * 1024 * 1024)', timeout=30)
+    assert res.returncode == 0
+    assert res.maxrss > 50 * 1024
+
+def test_raw_signal_returncode(cmdobj):
+    res = cmdobj.cmd(['sh', '-c', 'kill -9 $$'])
+    assert res.returncode == -9
+
+def test_import_without_resource():
+    #platforms without the resource module (Windows): importable, no resource usage
+    code = ('import sys; sys.modules["resource"] = None; from frua.base.cmd.cmd import Cmd; '
+        'res = Cmd().cmd("echo 1"); assert res.stdout == b"1\\n" and res.maxrss is None')
+    res = subprocess.run([sys.executable, '-c', code], env=dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path)))
+    assert res.returncode == 0
+
+def test_raw_stats():
+    statsobj = CmdStats()
+    cmdobj = Cmd(stats=statsobj)
+    cmdobj.cmd('echo 1')
+    cmdobj.cmd('echo 1')
+    cmdobj.cmd('false')
+    assert statsobj.get('echo 1')['count'] == 2
+    assert statsobj.get(['false'])['failed'] == 1
+
+def test_raw_check(cmdobj):
+    with pytest.raises(subprocess.CalledProcessError):
+        cmdobj.cmd('false', check=True)
+
+def test_raw_timeout(cmdobj):
+    with pytest.raises(subprocess.TimeoutExpired):
+        cmdobj.cmd('sleep 5', timeout=0.2)
+
+def test_raw_timeout_kills_children(cmdobj, tmp_path):
+    pidfile = tmp_path / 'pid'
+    with pytest.raises(subprocess.TimeoutExpired):
+        cmdobj.raw([f'sleep 30 & echo $! > {pidfile}; wait'], shell=True, timeout=0.5)
+    pid = int(pidfile.read_text())
+    #the orphaned grandchild is reaped by init: wait for it to disappear
+    for i in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.1)
+    else:
+        pytest.fail('grandchild still running')
+
+def test_raw_return_code_log(cmdobj, caplog):
+    with caplog.at_level(logging.INFO):
+        cmdobj.cmd('false')
+    assert 'return code: 1' in caplog.text
+
+def test_cmdline_line_cached():
+    cmdlineobj = CmdLine("ls -a 'my file'")
+    line = cmdlineobj.line
+    assert line == "ls -a 'my file'"
+    assert cmdlineobj.line is line
+    cmdlineobj.args.append('x y')
+    assert cmdlineobj.line == "ls -a 'my file' 'x y'"
+    cmdlineobj.line = 'echo 1'
+    assert cmdlineobj.line == 'echo 1'
+    cmdlineobj.args = ['echo', '2']
+    assert cmdlineobj.line == 'echo 2'
+
+def test_cmdline_split_copy():
+    CmdLine('echo 1').args.append('2')
+    assert CmdLine('echo 1').args == ['echo', '1']
+
+def test_template():
+    template = CmdTemplate('git -C {repo} log -n {count} --format=%H {paths}')
+    assert template.fields == {'repo', 'count', 'paths'}
+    args = template.args(repo='/my repo', count=5, paths=['a', 'b c'])
+    assert args == ['git', '-C', '/my repo', 'log', '-n', '5', '--format=%H', 'a', 'b c']
+    assert template.args(repo='r', count=1, paths=[]) == ['git', '-C', 'r', 'log', '-n', '1', '--format=%H']
+
+def test_template_no_retokenize():
+    template = CmdTemplate(['echo', '{text}'])
+    assert template.args(text='a; rm -rf / "b"') == ['echo', 'a; rm -rf / "b"']
+
+def test_template_format():
+    template = CmdTemplate("tar -czf {name}.tar.gz --exclude='*.{ext}' '{{literal}}'")
+    assert template.args(name='backup', ext='log') == ['tar', '-czf', 'backup.tar.gz', '--exclude=*.log', '{literal}']
+    assert template.fields == {'name', 'ext'}
+
+def test_template_missing_value():
+    template = CmdTemplate('echo {a} {b}')
+    with pytest.raises(KeyError):
+        template.args(a=1)
+
+def test_template_cmdline():
+    template = CmdTemplate('echo {a}')
+    cmdlineobj = template.cmdline(a='x y')
+    assert isinstance(cmdlineobj, CmdLine)
+    assert cmdlineobj.line == "echo 'x y'"
+    assert str(template) == "echo '{a}'"
+
+def test_template_cmd(cmdobj):
+    template = CmdTemplate('echo {a} {b}')
+    res = cmdobj.cmd(template.args(a=1, b='two words'))
+    assert res.stdout == b'1 two words\n'
@@ -0,0 +1,106 @@
+"""
+tests frua.base.cmd.pipeline.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import sys
+import time
+import subprocess
+import threading
+
+from frua.base.cmd.cmd import CmdResult
+from frua.base.cmd import pipeline
+from frua.base.cmd.pipeline import CmdPipeline
+
+def test_init():
+    pipelineobj = CmdPipeline()
+    assert isinstance(pipelineobj, CmdPipeline)
+    assert len(pipelineobj) == 0
+
+def test_pipe():
+    pipelineobj = CmdPipeline(['seq 1 10']).pipe(['grep', '1']) | 'wc -l'
+    assert pipelineobj.stages == [['seq', '1', '10'], ['grep', '1'], ['wc', '-l']]
+    with pytest.raises(TypeError):
+        pipelineobj.pipe(1)
+    with pytest.raises(ValueError):
+        pipelineobj.pipe('')
+
+def test_run():
+    result = CmdPipeline(['seq 1 10', ['grep', '1'], 'wc -l']).run()
+    assert isinstance(result, CmdResult)
+    assert result.returncode == 0
+    assert result.stdout.strip() == b'2'
+    assert result.returncodes == [0, 0, 0]
+    assert len(result.stages) == 3
+    assert all(stage.wall >= 0 for stage in result.stages)
+    assert all(stage.utime is not None for stage in result.stages)
+    assert result.wall >= max(stage.wall for stage in result.stages)
+
+def test_no_shell():
+    result = CmdPipeline([['echo', 'a | b; c'], ['cat']]).run()
+    assert result.stdout == b'a | b; c\n'
+
+def test_input():
+    result = CmdPipeline(['sort', 'uniq -c']).run(input=b'b\na\nb\n')
+    assert result.stdout.split() == [b'1', b'a', b'2', b'b']
+
+def test_stdin_stdout_files(tmp_path):
+    src = tmp_path / 'src'
+    dst = tmp_path / 'dst'
+    src.write_bytes(b'hello\n' * 1000)
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        result = CmdPipeline(['gzip -c', 'gzip -dc']).run(stdin=fin, stdout=fout)
+    assert result.stdout is None
+    assert dst.read_bytes() == b'hello\n' * 1000
+
+def test_large_stream():
+    #100MB through the pipes, only the count is captured
+    result = CmdPipeline([[sys.executable, '-c', 'import sys\nfor _ in range(1600): sys.stdout.write("x" * 65535 + "\\n")'], 'wc -c']).run()
+    assert int(result.stdout) == 1600 * 65536
+
+def test_stderr_and_returncodes():
+    result = CmdPipeline([['bash', '-c', 'echo out; echo err1 >&2; exit 3'], ['bash', '-c', 'cat; echo err2 >&2']]).run()
+    assert result.returncodes == [3, 0]
+    assert result.returncode == 0
+    assert result.stages[0].stderr == b'err1\n'
+    assert result.stages[1].stderr == b'err2\n'
+    assert result.stderr == b'err1\nerr2\n'
+    assert result.stdout == b'out\n'
+
+def test_pipefail():
+    result = CmdPipeline(['false', 'cat'], pipefail=True).run()
+    assert result.returncode == 1
+    with pytest.raises(subprocess.CalledProcessError):
+        CmdPipeline(['false', 'cat'], pipefail=True).run(check=True)
+
+def test_sigpipe():
+    #head exits early, yes gets SIGPIPE instead of running forever
+    result = CmdPipeline(['yes', 'head -n 3']).run(timeout=5)
+    assert result.stdout == b'y\ny\ny\n'
+    assert result.returncodes[0] == -13
+
+def test_timeout():
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        CmdPipeline(['sleep 5', 'cat']).run(timeout=0.2)
+    assert time.monotonic() - start < 2
+
+def test_timeout_reaped_by_waiters(monkeypatch):
+    #the stages are only reaped by their waiter threads, never also from the calling thread
+    callers = []
+    wait = pipeline._RusagePopen.wait
+    def recording_wait(proc, timeout=None):
+        callers.append(threading.current_thread())
+        return wait(proc, timeout)
+    monkeypatch.setattr(pipeline._RusagePopen, 'wait', recording_wait)
+    with pytest.raises(subprocess.TimeoutExpired):
+        CmdPipeline(['sleep 5', 'cat']).run(timeout=0.2)
+    assert len(callers) == 2
+    assert threading.main_thread() not in callers
+
+def test_empty():
+    with pytest.raises(ValueError):
+        CmdPipeline().run()
@@ -0,0 +1,127 @@
+"""
+tests frua.base.cmd.pypool.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import sys
+import time
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from frua.base.cmd.pypool import PyPool
+
+@pytest.fixture
+def poolobj():
+    poolobj = PyPool(size=2)
+    yield poolobj
+    poolobj.close()
+
+def test_init(poolobj):
+    assert isinstance(poolobj, PyPool)
+    assert poolobj.size == 2
+    assert poolobj.started == 2
+
+def test_python(poolobj):
+    result = poolobj.python('print(1+2)')
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert result.args == [sys.executable, '-c', 'print(1+2)']
+    assert result.returncode == 0
+    assert result.stdout == b'3\n'
+    assert result.stderr == b''
+
+def test_python_args(poolobj):
+    result = poolobj.python('import sys; print(sys.argv)', ['a', 'b'])
+    assert result.stdout == b"['-c', 'a', 'b']\n"
+
+def test_python_stderr_and_exit(poolobj):
+    result = poolobj.python('import sys; sys.stderr.write("err"); sys.exit(3)')
+    assert result.returncode == 3
+    assert result.stderr == b'err'
+    result = poolobj.python('raise SystemExit("bye")')
+    assert result.returncode == 1
+    assert result.stderr == b'bye\n'
+
+def test_python_exception(poolobj):
+    result = poolobj.python('1/0')
+    assert result.returncode == 1
+    assert b'ZeroDivisionError' in result.stderr
+
+def test_python_check(poolobj):
+    with pytest.raises(subprocess.CalledProcessError):
+        poolobj.python('import sys; sys.exit(1)', check=True)
+
+def test_child_process_output(poolobj):
+    result = poolobj.python('import os; os.system("echo from child")')
+    assert result.stdout == b'from child\n'
+
+def test_fresh_globals(poolobj):
+    poolobj.python('x = 1')
+    poolobj.python('x = 1')
+    result = poolobj.python('print(x)')
+    assert result.returncode == 1
+    assert b'NameError' in result.stderr
+
+def test_state_restored(poolobj, tmp_path):
+    poolobj.python('import os; os.chdir(%r)'%str(tmp_path))
+    poolobj.python('import os; os.chdir(%r)'%str(tmp_path))
+    result = poolobj.python('import os; print(os.getcwd())')
+    assert result.stdout.strip() != str(tmp_path).encode()
+
+def test_python_script(poolobj, tmp_path):
+    script = tmp_path / 'script.py'
+    script.write_text('import sys\nprint(__name__, sys.argv[1:])\n')
+    result = poolobj.python_script(str(script), ['arg'])
+    assert result.args == [sys.executable, str(script), 'arg']
+    assert result.stdout == b"__main__ ['arg']\n"
+
+def test_preload():
+    with PyPool(size=1, preload=['json']) as poolobj:
+        result = poolobj.python('import sys; print("json" in sys.modules)')
+        assert result.stdout == b'True\n'
+
+def test_preload_error():
+    with PyPool(size=1, preload=['module_that_does_not_exist']) as poolobj:
+        with pytest.raises(ImportError):
+            poolobj.python('pass')
+
+def test_worker_reused(poolobj):
+    pids = {poolobj.python('import os; print(os.getpid())').stdout for _ in range(10)}
+    assert len(pids) <= 2
+    assert poolobj.started == 2
+
+def test_recycle_max_tasks():
+    with PyPool(size=1, max_tasks=3) as poolobj:
+        pids = [poolobj.python('import os; print(os.getpid())').stdout for _ in range(6)]
+        assert len(set(pids)) == 2
+        assert poolobj.started == 3
+
+def test_recycle_max_rss():
+    with PyPool(size=1, max_rss=200 * 1024) as poolobj:
+        first = poolobj.python('import os; print(os.getpid())').stdout
+        poolobj.python('x = bytearray(300 * 1024 * 1024)')
+        assert poolobj.python('import os; print(os.getpid())').stdout != first
+
+def test_worker_death(poolobj):
+    result = poolobj.python('import os; os._exit(7)')
+    assert result.returncode == 7
+    assert poolobj.python('print(1)').stdout == b'1\n'
+
+def test_timeout(poolobj):
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        poolobj.python('import time; time.sleep(5)', timeout=0.3)
+    assert time.monotonic() - start < 2
+    assert poolobj.python('print(1)').stdout == b'1\n'
+
+def test_threads(poolobj):
+    with ThreadPoolExecutor(4) as executor:
+        results = list(executor.map(lambda i: poolobj.python('print(%d)'%i), range(20)))
+    assert [result.stdout for result in results] == [b'%d\n'%i for i in range(20)]
+
+def test_closed(poolobj):
+    poolobj.close()
+    with pytest.raises(RuntimeError):
+        poolobj.python('pass')
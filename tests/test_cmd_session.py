@@ -0,0 +1,104 @@
+"""
+tests frua.base.cmd.session.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import time
+import subprocess
+
+from frua.base.cmd.session import CmdSession
+
+@pytest.fixture
+def sessionobj():
+    sessionobj = CmdSession()
+    yield sessionobj
+    sessionobj.close()
+
+def test_init(sessionobj):
+    assert isinstance(sessionobj, CmdSession)
+    assert not sessionobj.alive
+    assert sessionobj.pid is None
+
+def test_run(sessionobj):
+    result = sessionobj.run('echo 1')
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert result.returncode == 0
+    assert result.stdout == b'1\n'
+    assert result.stderr == b''
+    assert sessionobj.alive
+
+def test_run_returncode_and_stderr(sessionobj):
+    result = sessionobj.run('echo err >&2; false')
+    assert result.returncode == 1
+    assert result.stderr == b'err\n'
+    result = sessionobj.run('(exit 42)')
+    assert result.returncode == 42
+
+def test_run_no_final_newline(sessionobj):
+    assert sessionobj.run('printf abc').stdout == b'abc'
+    assert sessionobj.run('printf "abc\\n\\n"').stdout == b'abc\n\n'
+    assert sessionobj.run('true').stdout == b''
+
+def test_run_quoting(sessionobj):
+    result = sessionobj.run("echo \"it's\" '$HOME' }")
+    assert result.stdout == b"it's $HOME }\n"
+
+def test_state_kept(sessionobj):
+    sessionobj.run('cd /tmp; export FRUA_TEST=1')
+    pid = sessionobj.pid
+    assert sessionobj.run('pwd').stdout == b'/tmp\n'
+    assert sessionobj.run('echo $FRUA_TEST').stdout == b'1\n'
+    assert sessionobj.pid == pid
+    assert sessionobj.starts == 1
+
+def test_stdin_not_consumed(sessionobj):
+    result = sessionobj.run('cat')
+    assert result.returncode == 0
+    assert sessionobj.run('echo ok').stdout == b'ok\n'
+
+def test_many_commands(sessionobj):
+    for i in range(200):
+        assert sessionobj.run('echo %s'%i).stdout == b'%d\n'%i
+    assert sessionobj.starts == 1
+
+def test_large_output(sessionobj):
+    result = sessionobj.run('seq 1 100000')
+    assert result.stdout.count(b'\n') == 100000
+
+def test_check(sessionobj):
+    with pytest.raises(subprocess.CalledProcessError):
+        sessionobj.run('false', check=True)
+
+def test_exit_restarts(sessionobj):
+    result = sessionobj.run('echo bye; exit 3')
+    assert result.returncode == 3
+    assert result.stdout == b'bye\n'
+    assert not sessionobj.alive
+    assert sessionobj.run('echo 1').stdout == b'1\n'
+    assert sessionobj.starts == 2
+
+def test_timeout_restarts(sessionobj):
+    sessionobj.run('FRUA_TEST=1')
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        sessionobj.run('sleep 5', timeout=0.2)
+    assert time.monotonic() - start < 2
+    assert not sessionobj.alive
+    result = sessionobj.run('echo ${FRUA_TEST:-reset}')
+    assert result.stdout == b'reset\n'
+
+def test_killed_shell_restarts(sessionobj):
+    sessionobj.run('true')
+    sessionobj._proc.kill()
+    sessionobj._proc.wait()
+    assert sessionobj.run('echo 1').stdout == b'1\n'
+    assert sessionobj.starts == 2
+
+def test_context_manager():
+    with CmdSession() as sessionobj:
+        sessionobj.run('true')
+        assert sessionobj.alive
+    assert not sessionobj.alive
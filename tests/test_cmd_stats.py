@@ -0,0 +1,83 @@
+"""
+tests frua.base.cmd.stats.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import json
+
+from frua.base.cmd.cmd import Cmd
+from frua.base.cmd.stats import CmdStats, OTHER, stats
+
+@pytest.fixture
+def statsobj():
+    statsobj = CmdStats()
+    statsobj.record(['sleep', '1'], 0, 1.0, 0.0, 0.001, 1000)
+    statsobj.record(['sleep', '1'], 0, 1.2, 0.0, 0.001, 1200)
+    statsobj.record(['make'], 2, 0.5, 3.0, 1.0, 90000)
+    return statsobj
+
+def test_init():
+    statsobj = CmdStats()
+    assert isinstance(statsobj, CmdStats)
+    assert len(statsobj) == 0
+
+def test_record(statsobj):
+    assert len(statsobj) == 2
+    entry = statsobj.get(['sleep', '1'])
+    assert entry['cmdline'] == 'sleep 1'
+    assert entry['count'] == 2
+    assert entry['failed'] == 0
+    assert entry['wall'] == pytest.approx(2.2)
+    assert entry['wall_max'] == pytest.approx(1.2)
+    assert entry['maxrss'] == 1200
+    assert statsobj.get('make')['failed'] == 1
+    assert statsobj.get('unknown') is None
+
+def test_top(statsobj):
+    assert [entry['cmdline'] for entry in statsobj.top()] == ['sleep 1', 'make']
+    assert [entry['cmdline'] for entry in statsobj.top(1, by='cpu')] == ['make']
+    assert [entry['cmdline'] for entry in statsobj.top(by='maxrss')] == ['make', 'sleep 1']
+    assert [entry['cmdline'] for entry in statsobj.top(by='count')] == ['sleep 1', 'make']
+
+def test_totals(statsobj):
+    totals = statsobj.totals()
+    assert totals['count'] == 3
+    assert totals['failed'] == 1
+    assert totals['wall'] == pytest.approx(2.7)
+    assert totals['maxrss'] == 90000
+
+def test_to_json(statsobj):
+    data = json.loads(statsobj.to_json())
+    assert data['totals']['count'] == 3
+    assert [entry['cmdline'] for entry in data['commands']] == ['sleep 1', 'make']
+    assert statsobj.to_dict()['make']['count'] == 1
+
+def test_key():
+    statsobj = CmdStats(key=lambda args: args[0])
+    statsobj.record(['git', 'status'])
+    statsobj.record(['git', 'log'])
+    assert statsobj.get('git')['count'] == 2
+
+def test_reset(statsobj):
+    statsobj.reset()
+    assert len(statsobj) == 0
+
+def test_default_registry():
+    Cmd().cmd(['echo', 'frua stats'])
+    assert stats.get(['echo', 'frua stats'])['count'] >= 1
+
+def test_max_entries():
+    statsobj = CmdStats(max_entries=2)
+    for i in range(5):
+        statsobj.record(['echo', str(i)], 0, 1.0)
+    assert len(statsobj) == 3
+    assert statsobj.get(['echo', '1'])['count'] == 1
+    assert statsobj.get(['echo', '4']) is None
+    assert statsobj.get(OTHER)['count'] == 3
+    assert statsobj.totals()['wall'] == pytest.approx(5.0)
+    #known commands are still recorded under their own key
+    statsobj.record(['echo', '0'])
+    assert statsobj.get(['echo', '0'])['count'] == 2
@@ -0,0 +1,119 @@
+"""
+tests frua.base.cmd.stream.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import io
+import sys
+import time
+import subprocess
+import tracemalloc
+
+from frua.base.cmd.cmd import Cmd
+from frua.base.cmd.stream import CmdStream
+
+def test_init():
+    streamobj = CmdStream(['echo', '1'])
+    assert isinstance(streamobj, CmdStream)
+    assert streamobj.returncode is None
+
+def test_lines():
+    streamobj = CmdStream(['bash', '-c', 'echo a; echo b >&2; echo c; printf d'])
+    items = list(streamobj)
+    assert [data for name, data in items if name == 'stdout'] == [b'a\n', b'c\n', b'd']
+    assert [data for name, data in items if name == 'stderr'] == [b'b\n']
+    assert streamobj.returncode == 0
+    assert streamobj.sizes == {'stdout': 5, 'stderr': 2}
+
+def test_chunks():
+    streamobj = CmdStream([sys.executable, '-c', 'print("x" * 100000)'], lines=False, chunk_size=4096)
+    chunks = [data for name, data in streamobj]
+    assert all(len(chunk) <= 4096 for chunk in chunks)
+    assert b''.join(chunks) == b'x' * 100000 + b'\n'
+
+def test_long_line_split():
+    streamobj = CmdStream([sys.executable, '-c', 'print("x" * 100000)'], chunk_size=4096)
+    lines = [data for name, data in streamobj]
+    assert len(lines) > 1
+    assert b''.join(lines) == b'x' * 100000 + b'\n'
+
+def test_tail_and_result():
+    streamobj = CmdStream([sys.executable, '-c', 'import sys; print("x" * 10000); sys.exit(3)'], tail_size=100)
+    result = streamobj.run()
+    assert isinstance(result, subprocess.CompletedProcess)
+    assert result.returncode == 3
+    assert result.stdout == b'x' * 99 + b'\n'
+    assert streamobj.sizes['stdout'] == 10001
+
+def test_tee(tmp_path):
+    out = tmp_path / 'out.log'
+    err = io.BytesIO()
+    streamobj = CmdStream(['bash', '-c', 'seq 1 1000; echo oops >&2'], tee=str(out), tee_stderr=err, tail_size=10)
+    streamobj.run()
+    assert out.read_bytes() == b''.join(b'%d\n'%i for i in range(1, 1001))
+    assert err.getvalue() == b'oops\n'
+    assert not err.closed
+
+def test_constant_memory():
+    #about 50MB of output
+    streamobj = CmdStream([sys.executable, '-c', 'import sys\nfor _ in range(800): sys.stdout.write("y" * 65535 + "\\n")'])
+    tracemalloc.start()
+    count = 0
+    for name, line in streamobj:
+        count += 1
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert count == 800
+    assert peak < 2 * 1024 * 1024
+
+def test_backpressure():
+    #the command blocks on the full pipe while the consumer waits
+    streamobj = CmdStream([sys.executable, '-c', 'import sys, time\nfor _ in range(100): sys.stdout.write("z" * 65536)\nsys.stdout.flush()\nprint(time.time(), file=sys.stderr)'], lines=False)
+    it = iter(streamobj)
+    next(it)
+    time.sleep(0.5)
+    start = time.time()
+    rest = list(it)
+    end = float([data for name, data in rest if name == 'stderr'][0])
+    assert end >= start
+    assert streamobj.returncode == 0
+
+def test_break_kills_command():
+    streamobj = CmdStream(['bash', '-c', 'while true; do echo y; done'])
+    for name, line in streamobj:
+        break
+    streamobj.close()
+    assert streamobj.returncode == -9
+
+def test_context_manager():
+    with CmdStream(['yes']) as streamobj:
+        for name, line in streamobj:
+            break
+    assert streamobj.returncode == -9
+
+def test_timeout():
+    streamobj = CmdStream(['sleep', '5'], timeout=0.2)
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        list(streamobj)
+    assert time.monotonic() - start < 2
+    assert streamobj.returncode is not None
+
+def test_run_once():
+    streamobj = CmdStream(['true'])
+    streamobj.run()
+    with pytest.raises(RuntimeError):
+        streamobj.run()
+
+def test_cmd_stream():
+    streamobj = Cmd().stream('echo 1 2')
+    assert isinstance(streamobj, CmdStream)
+    assert list(streamobj) == [('stdout', b'1 2\n')]
+
+def test_cmd_stream_shell():
+    assert list(Cmd().stream('echo a b', shell=True)) == [('stdout', b'a b\n')]
+    assert list(Cmd().stream('echo a | tr a b', shell=True)) == [('stdout', b'b\n')]
+    assert list(Cmd().stream(['echo', 'a b', 'c'], shell=True)) == [('stdout', b'a b c\n')]
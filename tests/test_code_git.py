@@ -140,3 +140,56 @@ def test_github_clone_release_from_zip(ghobj):
     #teadown
     if os.path.exists(outputdir):
         Dir().wipe(outputdir)
+
+def _archives(prefix):
+    """
+    zip and tar.gz archives of a repository, with their top-level directory
+    """
+    import io
+    import zipfile
+    import tarfile
+    files = {'README.md': b'readme', 'src/main.py': b'print(1)'}
+    zbuffer = io.BytesIO()
+    with zipfile.ZipFile(zbuffer, 'w') as zf:
+        for name, data in files.items():
+            zf.writestr(prefix + '/' + name, data)
+    tbuffer = io.BytesIO()
+    with tarfile.open(fileobj=tbuffer, mode='w:gz') as tf:
+        for name, data in files.items():
+            info = tarfile.TarInfo(prefix + '/' + name)
+            info.size = len(data)
+            tf.addfile(info, io.BytesIO(data))
+    return zbuffer.getvalue(), tbuffer.getvalue()
+
+@pytest.fixture
+def localgh(httpserver, monkeypatch):
+    import frua.base.code.git as gitmodule
+    monkeypatch.setattr(gitmodule, 'GITHUB_URL', httpserver.url(''))
+    zdata, tdata = _archives('testrepo-test')
+    httpserver.files['/dheurtev/testrepo/archive/test.zip'] = zdata
+    httpserver.files['/dheurtev/testrepo/archive/test.tar.gz'] = tdata
+    zdata, tdata = _archives('testrepo-1.0.0')
+    httpserver.files['/dheurtev/testrepo/archive/refs/tags/v1.0.0.zip'] = zdata
+    httpserver.files['/dheurtev/testrepo/archive/refs/tags/v1.0.0.tar.gz'] = tdata
+    return GitHub(user='dheurtev', repo='testrepo', branch='test', release='1.0.0')
+
+@pytest.mark.parametrize('method', ['clone_from_zip', 'clone_release_from_zip', 'clone_from_tarball', 'clone_release_from_tarball'])
+def test_github_clone_archive_local(localgh, tmp_path, method):
+    outputdir = tmp_path / 'repo'
+    assert getattr(localgh, method)(outputdir=str(outputdir))
+    #extracted directly to the output directory, without the top-level directory
+    assert (outputdir / 'README.md').read_bytes() == b'readme'
+    assert (outputdir / 'src' / 'main.py').read_bytes() == b'print(1)'
+    assert not getattr(localgh, method)(outputdir=str(outputdir), overwrite=False)
+
+def test_github_clone_from_zip_cache(localgh, httpserver, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    assert localgh.clone_from_zip(outputdir=str(tmp_path / 'a'), cache_dir=cache_dir)
+    assert localgh.clone_from_zip(outputdir=str(tmp_path / 'b'), cache_dir=cache_dir)
+    #the second clone is a conditional request
+    assert 'If-None-Match' in httpserver.requests[-1][1]
+    assert (tmp_path / 'b' / 'README.md').read_bytes() == b'readme'
+
+def test_github_clone_from_zip_not_found(localgh, tmp_path):
+    localgh.branch = 'missing'
+    assert not localgh.clone_from_zip(outputdir=str(tmp_path / 'repo'))
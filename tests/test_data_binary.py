@@ -0,0 +1,82 @@
+"""
+tests frua.base.data.binary.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import datetime
+import uuid
+import io
+
+from frua.base.data.binary import BinCodec
+
+@pytest.fixture
+def codec():
+    return BinCodec()
+
+def test_init(codec):
+    assert isinstance(codec, BinCodec)
+
+@pytest.mark.parametrize('value', [
+    None, True, False, 0, 1, -1, 127, -128, 300, -40000, 2**31, -2**63, 2**64, -2**100,
+    0.5, -1e300, '', 'a', 'é' * 300, b'', b'\x00\x01', b'x' * 1000, bytearray(b'ab'),
+    [], [1, 'a', None], (1, 2), {1, 2}, frozenset([3]), {}, {'a': {'b': [1, (2, 3)]}, 1: 'int key'},
+])
+def test_roundtrip(codec, value):
+    assert codec.loads(codec.dumps(value)) == value
+
+def test_roundtrip_types(codec):
+    value = {'tuple': (1,), 'set': {1}, 'bytes': b'a'}
+    result = codec.loads(codec.dumps(value))
+    assert isinstance(result['tuple'], tuple)
+    assert isinstance(result['set'], set)
+    assert isinstance(result['bytes'], bytes)
+
+def test_extensions(codec):
+    value = {
+        'dt': datetime.datetime(2023, 5, 17, 10, 30, 15, 123456),
+        'dt_tz': datetime.datetime(2023, 5, 17, 10, 30, tzinfo=datetime.timezone(datetime.timedelta(hours=2))),
+        'date': datetime.date(2023, 5, 17),
+        'time': datetime.time(10, 30, 15, 5),
+        'delta': datetime.timedelta(days=-1, seconds=5, microseconds=7),
+        'uuid': uuid.uuid4(),
+    }
+    result = codec.loads(codec.dumps(value))
+    assert result == value
+    assert result['dt_tz'].utcoffset() == datetime.timedelta(hours=2)
+    assert type(result['date']) is datetime.date
+
+def test_unsupported_type(codec):
+    with pytest.raises(TypeError):
+        codec.dumps(object())
+
+def test_register(codec):
+    class Point(object):
+        def __init__(self, x, y):
+            self.x, self.y = x, y
+    codec.register(Point, 64, lambda p: bytes([p.x, p.y]), lambda data: Point(data[0], data[1]))
+    p = codec.loads(codec.dumps([Point(1, 2)]))[0]
+    assert (p.x, p.y) == (1, 2)
+    with pytest.raises(ValueError):
+        codec.register(dict, 64, None, None)
+
+def test_invalid_data(codec):
+    data = codec.dumps(['abc', 1])
+    with pytest.raises(ValueError):
+        codec.loads(data[:-3])
+    with pytest.raises(ValueError):
+        codec.loads(data + b'\x00')
+    with pytest.raises(ValueError):
+        codec.loads(b'\xff')
+
+def test_compact(codec):
+    value = {'a': 1, 'b': True}
+    assert len(codec.dumps(value)) < 15
+
+def test_dump_load(codec):
+    f = io.BytesIO()
+    codec.dump({'a': 1}, f)
+    f.seek(0)
+    assert codec.load(f) == {'a': 1}
@@ -0,0 +1,216 @@
+"""
+tests frua.base.http.agetdownloader.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import io
+import os
+import gc
+import socket
+import warnings
+import time
+import asyncio
+import hashlib
+import requests
+
+from frua.base.http.agetdownloader import AsyncGetDownloader
+from frua.base.http.getdownloader import GetDownloader
+from frua.base.http.ratelimit import TokenBucket
+
+class Stub(object):
+    """
+    Local asyncio HTTP server: path -> (status, headers, body), bodies sent chunked if the headers say so
+    """
+    def __init__(self):
+        self.routes = {}
+        self.active = 0
+        self.max_active = 0
+        self.delay = 0.0
+        self.heads = []
+
+    async def handle(self, reader, writer):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            self.heads.append(head)
+            path = head.split(b' ')[1].decode().split('?')[0]
+            status, headers, body = self.routes.get(path, (404, {}, b''))
+            await asyncio.sleep(self.delay)
+            writer.write(b'HTTP/1.1 %d X\r\n' % status)
+            chunked = headers.get('Transfer-Encoding') == 'chunked'
+            if not chunked and 'Content-Length' not in headers:
+                headers = dict(headers, **{'Content-Length': str(len(body))})
+            for name, value in headers.items():
+                writer.write(('%s: %s\r\n' % (name, value)).encode())
+            writer.write(b'\r\n')
+            if chunked:
+                for pos in range(0, len(body), 1000):
+                    writer.write(b'%x\r\n%s\r\n' % (len(body[pos:pos + 1000]), body[pos:pos + 1000]))
+                writer.write(b'0\r\n\r\n')
+            else:
+                writer.write(body)
+            await writer.drain()
+        finally:
+            self.active -= 1
+            writer.close()
+
+def run(coro_fn, *args, host:str='127.0.0.1'):
+    """
+    Run a test coroutine with a started stub: coro_fn(stub, base url, *args)
+    """
+    async def main():
+        stub = Stub()
+        server = await asyncio.start_server(stub.handle, host, 0)
+        url = 'http://%s:%s' % ('[%s]' % host if ':' in host else host, server.sockets[0].getsockname()[1])
+        try:
+            return await coro_fn(stub, url, *args)
+        finally:
+            server.close()
+            await server.wait_closed()
+    return asyncio.run(main())
+
+def test_init():
+    obj = AsyncGetDownloader(url='http://example.com/a.zip', max_concurrency=2)
+    assert isinstance(obj.semaphore, asyncio.Semaphore)
+    assert obj.url == 'http://example.com/a.zip'
+
+def test_download(tmp_path):
+    data = os.urandom(300000)
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, data)
+        obj = AsyncGetDownloader(url=url + '/file.bin?x=1', file_dir=str(tmp_path))
+        assert await obj.download()
+        #file name inferred from the url
+        assert obj.file_name == 'file.bin'
+        #existing file
+        assert not await obj.download()
+        assert await obj.download(overwrite=True)
+    run(main)
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert os.listdir(tmp_path) == ['file.bin']
+
+def test_download_chunked_redirect(tmp_path):
+    data = os.urandom(12345)
+    async def main(stub, url):
+        stub.routes['/old'] = (302, {'Location': '/new.bin'}, b'')
+        stub.routes['/new.bin'] = (200, {'Transfer-Encoding': 'chunked'}, data)
+        obj = AsyncGetDownloader(url=url + '/old', file_name='out.bin', file_dir=str(tmp_path))
+        assert await obj.download()
+    run(main)
+    assert (tmp_path / 'out.bin').read_bytes() == data
+
+def test_download_errors(tmp_path):
+    async def main(stub, url):
+        obj = AsyncGetDownloader(url=url + '/missing.bin', file_dir=str(tmp_path))
+        with pytest.raises(requests.HTTPError):
+            await obj.download()
+        #truncated body
+        stub.routes['/short.bin'] = (200, {'Content-Length': '1000'}, b'a' * 10)
+        obj = AsyncGetDownloader(url=url + '/short.bin', file_dir=str(tmp_path))
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            await obj.download()
+    run(main)
+    assert os.listdir(tmp_path) == []
+
+def test_download_checksum(tmp_path):
+    data = os.urandom(5000)
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, data)
+        obj = AsyncGetDownloader(url=url + '/file.bin', file_dir=str(tmp_path))
+        assert await obj.download(checksum='sha512:' + hashlib.sha512(data).hexdigest())
+        with pytest.raises(ValueError):
+            await obj.download(overwrite=True, checksum=hashlib.sha256(b'other').hexdigest())
+    run(main)
+    assert os.listdir(tmp_path) == ['file.bin']
+
+def test_download_concurrency(tmp_path):
+    async def main(stub, url):
+        stub.delay = 0.05
+        for i in range(8):
+            stub.routes['/f%s' % i] = (200, {}, bytes([i]) * 1000)
+        semaphore = asyncio.Semaphore(3)
+        objs = [AsyncGetDownloader(url=url + '/f%s' % i, file_dir=str(tmp_path), semaphore=semaphore) for i in range(8)]
+        assert all(await asyncio.gather(*(obj.download() for obj in objs)))
+        return stub.max_active
+    assert run(main) == 3
+    assert sorted(os.listdir(tmp_path)) == ['f%s' % i for i in range(8)]
+
+def test_download_progress(tmp_path):
+    reports = []
+    async def progress(done, total):
+        reports.append((done, total))
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, b'a' * 100000)
+        obj = AsyncGetDownloader(url=url + '/file.bin', file_dir=str(tmp_path), progress=progress, progress_interval=0)
+        assert await obj.download()
+    run(main)
+    assert reports[-1] == (100000, 100000)
+
+def test_download_rate_limit(tmp_path):
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, b'a' * 300000)
+        obj = AsyncGetDownloader(url=url + '/file.bin', file_dir=str(tmp_path), rate_limit=TokenBucket(1000000, burst=100000))
+        start = time.monotonic()
+        assert await obj.download()
+        return time.monotonic() - start
+    assert 0.15 <= run(main) < 0.6
+
+def test_host_header(tmp_path):
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, b'x')
+        assert await AsyncGetDownloader(url=url + '/file.bin', file_dir=str(tmp_path)).download()
+        return stub.heads[-1], url
+    head, url = run(main)
+    assert b'\r\nHost: %s\r\n' % url.split('//')[1].encode() in head
+
+def test_host_header_ipv6(tmp_path):
+    if not socket.has_ipv6:
+        pytest.skip('no IPv6')
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, b'x')
+        assert await AsyncGetDownloader(url=url + '/file.bin', file_dir=str(tmp_path)).download()
+        return stub.heads[-1], url
+    try:
+        head, url = run(main, host='::1')
+    except OSError:
+        pytest.skip('no IPv6 loopback')
+    assert b'\r\nHost: [::1]:' in head
+    assert (tmp_path / 'file.bin').read_bytes() == b'x'
+
+def test_connections_closed(tmp_path):
+    async def main(stub, url):
+        stub.routes['/file.bin'] = (200, {}, b'x' * 1000)
+        stub.routes['/redirect'] = (302, {'Location': '/file.bin'}, b'')
+        assert await AsyncGetDownloader(url=url + '/redirect', file_name='a.bin', file_dir=str(tmp_path)).download()
+        with pytest.raises(requests.HTTPError):
+            await AsyncGetDownloader(url=url + '/missing', file_dir=str(tmp_path)).download()
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter('always')
+        run(main)
+        gc.collect()
+    assert [w for w in caught if issubclass(w.category, ResourceWarning)] == []
+
+def test_not_a_getdownloader():
+    obj = AsyncGetDownloader(url='http://example.com/a.zip')
+    assert not isinstance(obj, GetDownloader)
+    assert not hasattr(obj, 'download_to')
+    assert not hasattr(obj, 'open')
+
+def test_unsupported_options():
+    for kwargs in ({'session': requests.Session()}, {'cache_dir': '/tmp'}, {'segments': 4}, {'resume': False}):
+        with pytest.raises(TypeError):
+            AsyncGetDownloader(url='http://example.com/a.zip', **kwargs)
+
+def test_download_not_2xx(tmp_path):
+    async def main(stub, url):
+        stub.routes['/not_modified'] = (304, {}, b'')
+        stub.routes['/nowhere'] = (302, {}, b'moved')
+        for path in ('/not_modified', '/nowhere'):
+            with pytest.raises(requests.HTTPError):
+                await AsyncGetDownloader(url=url + path, file_dir=str(tmp_path)).download()
+    run(main)
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,127 @@
+"""
+    tests frua.base.http.downloadmanager.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import os
+import time
+import threading
+import requests
+
+from frua.base.http.downloadmanager import DownloadManager, DownloadResult
+from frua.base.http.ratelimit import TokenBucket
+
+def test_run(httpserver, tmp_path):
+    for i in range(5):
+        httpserver.files['/f%s.bin' % i] = bytes([i]) * 10000 * (i + 1)
+    manager = DownloadManager(max_workers=3)
+    for i in range(5):
+        manager.add(httpserver.url('/f%s.bin' % i), str(tmp_path / ('out%s.bin' % i)))
+    assert len(manager) == 5
+    results = manager.run()
+    assert all(isinstance(result, DownloadResult) and result.ok and result.attempts == 1 for result in results)
+    for i, result in enumerate(results):
+        assert result.path == str(tmp_path / ('out%s.bin' % i))
+        assert result.size == 10000 * (i + 1)
+        assert (tmp_path / ('out%s.bin' % i)).read_bytes() == bytes([i]) * 10000 * (i + 1)
+    assert manager.stats['count'] == 5
+    assert manager.stats['failed'] == 0
+    assert manager.stats['bytes'] == 150000
+    assert manager.stats['throughput'] > 0
+    #connections are reused between the jobs
+    assert httpserver.connections <= 3
+
+def test_run_iter_dest_dir(httpserver, tmp_path):
+    httpserver.files['/a.bin'] = b'a' * 100
+    httpserver.files['/b.bin'] = b'b' * 100
+    manager = DownloadManager([(httpserver.url('/a.bin'), str(tmp_path)), (httpserver.url('/b.bin'), str(tmp_path / 'sub') + os.sep)])
+    results = dict(manager.run_iter())
+    assert sorted(results) == [0, 1]
+    assert (tmp_path / 'a.bin').read_bytes() == b'a' * 100
+    assert (tmp_path / 'sub' / 'b.bin').read_bytes() == b'b' * 100
+
+class _Counting(DownloadManager):
+    """
+    Counts the downloads running at the same time, by host
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = {}
+
+    def _attempt(self, url, dest, options):
+        host = self._host(url)
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0), self.active[host])
+        try:
+            time.sleep(0.02)
+            return super()._attempt(url, dest, options)
+        finally:
+            with self.lock:
+                self.active[host] -= 1
+
+def test_per_host(httpserver, tmp_path):
+    for i in range(4):
+        httpserver.files['/f%s.bin' % i] = b'x' * 65536
+    other = httpserver.url('/').replace('127.0.0.1', 'localhost')
+    manager = _Counting(max_workers=8, per_host=2)
+    for i in range(4):
+        manager.add(httpserver.url('/f%s.bin' % i), str(tmp_path / ('f%s.bin' % i)))
+        manager.add(other + 'f%s.bin' % i, str(tmp_path / ('g%s.bin' % i)))
+    assert all(result.ok for result in manager.run())
+    assert sorted(manager.max_active.values()) == [2, 2]
+    #the max_workers limit applies to all the hosts
+    manager = _Counting(max_workers=1, per_host=2, overwrite=True)
+    for i in range(4):
+        manager.add(httpserver.url('/f%s.bin' % i), str(tmp_path / ('f%s.bin' % i)))
+        manager.add(other + 'f%s.bin' % i, str(tmp_path / ('g%s.bin' % i)))
+    assert all(result.ok for result in manager.run())
+    assert sorted(manager.max_active.values()) == [1, 1]
+
+def test_retry(httpserver, tmp_path):
+    data = os.urandom(300000)
+    httpserver.files['/file.bin'] = data
+    httpserver.cut['/file.bin'] = 100000
+    manager = DownloadManager(backoff=0.01)
+    manager.add(httpserver.url('/file.bin'), str(tmp_path / 'file.bin'))
+    result = manager.run()[0]
+    assert result.ok
+    assert result.attempts == 2
+    assert manager.stats['retries'] == 1
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    #the retry resumed the partial download
+    assert 'Range' in httpserver.requests[-1][1]
+
+def test_failures(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'a' * 100
+    (tmp_path / 'exists.bin').write_bytes(b'old')
+    manager = DownloadManager(backoff=0.01, retries=2)
+    manager.add(httpserver.url('/missing.bin'), str(tmp_path / 'missing.bin'))
+    manager.add(httpserver.url('/file.bin'), str(tmp_path / 'exists.bin'))
+    manager.add('http://127.0.0.1:1/file.bin', str(tmp_path / 'refused.bin'))
+    missing, exists, refused = manager.run()
+    #not found: no retry
+    assert not missing.ok and missing.attempts == 1
+    assert isinstance(missing.error, requests.HTTPError)
+    assert not exists.ok and isinstance(exists.error, FileExistsError)
+    assert (tmp_path / 'exists.bin').read_bytes() == b'old'
+    #connection refused: retried
+    assert not refused.ok and refused.attempts == 3
+    assert isinstance(refused.error, requests.ConnectionError)
+    assert manager.stats['failed'] == 3
+    assert manager.stats['retries'] == 2
+
+def test_rate_limit(httpserver, tmp_path):
+    for i in range(4):
+        httpserver.files['/f%s.bin' % i] = b'x' * 100000
+    manager = DownloadManager(max_workers=4, rate_limit=TokenBucket(1000000, burst=100000))
+    for i in range(4):
+        manager.add(httpserver.url('/f%s.bin' % i), str(tmp_path / ('f%s.bin' % i)))
+    start = time.monotonic()
+    assert all(result.ok for result in manager.run())
+    #the jobs share the bandwidth: 400 KB at 1 MB/s after a 100 KB burst
+    assert 0.25 <= time.monotonic() - start < 0.8
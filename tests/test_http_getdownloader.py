@@ -7,8 +7,15 @@ __license__ = 'MIT'
 
 import pytest
 import os
+import time
+import threading
+import gzip
+import json
+import hashlib
+import requests
 
 from frua.base.http.getdownloader import GetDownloader
+from frua.base.http.ratelimit import TokenBucket
 
 @pytest.fixture
 def dobj():
@@ -198,7 +205,443 @@ def test_filedir_not_set(dobj):
     if os.path.isfile(path):
         os.remove(path)
 
+def test_session_shared():
+    session = GetDownloader.shared_session()
+    assert isinstance(session, requests.Session)
+    assert GetDownloader().session is session
+    assert GetDownloader().session is GetDownloader.shared_session()
+    own = requests.Session()
+    assert GetDownloader(session=own).session is own
 
+def test_make_session():
+    session = GetDownloader.make_session(pool_maxsize=32, retries=5)
+    adapter = session.get_adapter('https://example.com/')
+    assert adapter._pool_maxsize == 32
+    assert adapter.max_retries.total == 5
 
+def test_download_local(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'x' * 10000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session())
+    assert obj.download()
+    assert (tmp_path / 'file.bin').read_bytes() == b'x' * 10000
 
+def test_download_connections_reused(httpserver, tmp_path):
+    session = GetDownloader.make_session()
+    for i in range(50):
+        httpserver.files['/file%s.txt'%i] = b'%d'%i
+    for i in range(50):
+        obj = GetDownloader(url=httpserver.url('/file%s.txt'%i), file_dir=str(tmp_path), session=session)
+        assert obj.download()
+    assert (tmp_path / 'file42.txt').read_bytes() == b'42'
+    assert len(httpserver.requests) == 50
+    assert httpserver.connections == 1
 
+def test_download_not_found(httpserver, tmp_path):
+    obj = GetDownloader(url=httpserver.url('/missing'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.HTTPError):
+        obj.download()
+
+def test_download_adaptive_chunks(httpserver, tmp_path):
+    data = os.urandom(20 * 1024 * 1024)
+    httpserver.files['/big.bin'] = data
+    progress = []
+    obj = GetDownloader(url=httpserver.url('/big.bin'), file_dir=str(tmp_path), progress=lambda done, total: progress.append((done, total)))
+    sizes = []
+    copy = obj._copy
+    def spy(r, *args):
+        read = r.raw.read
+        def spy_read(size, **kwargs):
+            sizes.append(size)
+            return read(size, **kwargs)
+        r.raw.read = spy_read
+        return copy(r, *args)
+    obj._copy = spy
+    assert obj.download()
+    assert (tmp_path / 'big.bin').read_bytes() == data
+    assert sizes[0] == GetDownloader.min_chunk_size
+    assert max(sizes) > GetDownloader.min_chunk_size
+    assert max(sizes) <= GetDownloader.max_chunk_size
+    #one report at the end (interval not reached)
+    assert progress == [(len(data), len(data))]
+
+def test_download_progress_interval(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'x' * (1024 * 1024)
+    progress = []
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), progress_interval=0, min_chunk_size=1024,
+        progress=lambda done, total: progress.append(done))
+    assert obj.download()
+    assert len(progress) > 2
+    assert progress == sorted(progress)
+    assert progress[-1] == 1024 * 1024
+
+def test_download_progress_error(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'x' * (1024 * 1024)
+    def progress(done, total):
+        raise KeyError('stop')
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), progress_interval=0, min_chunk_size=1024,
+        progress=progress)
+    with pytest.raises(KeyError) as excinfo:
+        obj.download()
+    #not wrapped, no cause pointing to itself
+    assert excinfo.value.__cause__ is None
+
+def test_download_compressed(httpserver, tmp_path):
+    data = b'compressed ' * 10000
+    httpserver.files['/file.txt'] = (gzip.compress(data), {'Content-Encoding': 'gzip'})
+    obj = GetDownloader(url=httpserver.url('/file.txt'), file_dir=str(tmp_path))
+    assert obj.download()
+    assert (tmp_path / 'file.txt').read_bytes() == data
+
+def test_download_part_renamed(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'x' * 1000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path))
+    assert obj.download()
+    assert os.listdir(tmp_path) == ['file.bin']
+
+def test_download_resume(httpserver, tmp_path):
+    data = os.urandom(3 * 1024 * 1024)
+    httpserver.files['/file.bin'] = data
+    httpserver.cut['/file.bin'] = 1024 * 1024
+    session = GetDownloader.make_session(retries=0)
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=session)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download()
+    assert not (tmp_path / 'file.bin').exists()
+    assert (tmp_path / 'file.bin.part').exists()
+    meta = json.loads((tmp_path / 'file.bin.part.json').read_text())
+    #bytes of the failed read are lost
+    assert 0 < meta['offset'] <= 1024 * 1024
+    assert meta['total'] == len(data)
+    #the next attempt only requests the missing bytes
+    assert obj.download()
+    assert httpserver.requests[-1][1]['Range'] == 'bytes=%s-' % meta['offset']
+    assert httpserver.requests[-1][1]['If-Range'] == meta['etag']
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+
+def test_download_resume_compressed(httpserver, tmp_path):
+    data = os.urandom(200000) + b'compressed ' * 100000
+    body = gzip.compress(data)
+    #the server compresses anyway, ignoring Accept-Encoding: identity
+    httpserver.files['/file.bin'] = (body, {'Content-Encoding': 'gzip'})
+    httpserver.cut['/file.bin'] = len(body) // 2
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download()
+    assert httpserver.requests[-1][1]['Accept-Encoding'] == 'identity'
+    #decoded bytes are no offset in the compressed body: no resume metadata, the next attempt starts over
+    assert not (tmp_path / 'file.bin.part.json').exists()
+    assert obj.download()
+    assert 'Range' not in httpserver.requests[-1][1]
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert os.listdir(tmp_path) == ['file.bin']
+
+def test_download_resume_changed(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'a' * 300000
+    httpserver.cut['/file.bin'] = 100000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download()
+    #the file changed on the server: If-Range does not match, the full file is sent
+    httpserver.files['/file.bin'] = b'b' * 200000
+    assert obj.download()
+    assert (tmp_path / 'file.bin').read_bytes() == b'b' * 200000
+
+def test_download_resume_without_validators(httpserver, tmp_path):
+    httpserver.httpd.validators = False
+    httpserver.files['/file.bin'] = b'a' * 300000
+    httpserver.cut['/file.bin'] = 100000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download()
+    assert obj.download()
+    assert 'Range' not in httpserver.requests[-1][1]
+    assert (tmp_path / 'file.bin').read_bytes() == b'a' * 300000
+
+def test_download_resume_complete(httpserver, tmp_path):
+    #interrupted after the last byte, before the rename
+    data = b'c' * 1000
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path))
+    (tmp_path / 'file.bin.part').write_bytes(data)
+    (tmp_path / 'file.bin.part.json').write_text(json.dumps({'url': obj.url, 'etag': '"%s"' % hashlib.sha1(data).hexdigest(),
+        'last_modified': None, 'total': 1000, 'offset': 1000}))
+    assert obj.download()
+    assert (tmp_path / 'file.bin').read_bytes() == data
+
+def test_download_no_resume(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'a' * 300000
+    httpserver.cut['/file.bin'] = 100000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download()
+    assert obj.download(resume=False)
+    assert 'Range' not in httpserver.requests[-1][1]
+    assert (tmp_path / 'file.bin').read_bytes() == b'a' * 300000
+
+
+def test_download_segmented(httpserver, tmp_path):
+    data = os.urandom(4 * 1024 * 1024 + 123)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), min_segment_size=1024 * 1024)
+    assert obj.download(segments=4)
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+    assert httpserver.requests[0][0] == 'HEAD /file.bin'
+    ranges = sorted(headers['Range'] for path, headers in httpserver.requests[1:])
+    assert len(ranges) == 4
+    assert all(headers['If-Range'] for path, headers in httpserver.requests[1:])
+
+def test_download_segmented_fallback(httpserver, tmp_path):
+    httpserver.files['/small.bin'] = b'a' * 1000
+    obj = GetDownloader(url=httpserver.url('/small.bin'), file_dir=str(tmp_path), segments=4)
+    #too small to split: a single stream
+    assert obj.download()
+    assert [path for path, headers in httpserver.requests] == ['HEAD /small.bin', '/small.bin']
+    #no ranges on the server: a single stream
+    httpserver.httpd.ranges = False
+    httpserver.files['/big.bin'] = b'b' * 3 * 1024 * 1024
+    obj = GetDownloader(url=httpserver.url('/big.bin'), file_dir=str(tmp_path), segments=4, min_segment_size=1024 * 1024)
+    assert obj.download()
+    assert 'Range' not in httpserver.requests[-1][1]
+    assert (tmp_path / 'big.bin').read_bytes() == b'b' * 3 * 1024 * 1024
+
+def test_download_segmented_resume(httpserver, tmp_path):
+    data = os.urandom(4 * 1024 * 1024)
+    httpserver.files['/file.bin'] = data
+    httpserver.cut['/file.bin'] = 512 * 1024
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0),
+        min_segment_size=1024 * 1024)
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download(segments=4)
+    meta = json.loads((tmp_path / 'file.bin.part.json').read_text())
+    remaining = sum(end - pos + 1 for pos, end in meta['segments'])
+    assert 0 < remaining < len(data)
+    del httpserver.requests[:]
+    assert obj.download(segments=4)
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ['file.bin']
+    #only the missing ranges are requested again
+    assert ['bytes=%s-%s' % (pos, end) for pos, end in meta['segments'] if pos <= end] == \
+        sorted((headers['Range'] for path, headers in httpserver.requests[1:]), key=lambda r: int(r[6:].split('-')[0]))
+
+def test_download_checksum(httpserver, tmp_path):
+    data = os.urandom(100000)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path))
+    assert obj.download(checksum=hashlib.sha256(data).hexdigest())
+    assert obj.download(overwrite=True, checksum='blake2b:' + hashlib.blake2b(data).hexdigest())
+    with pytest.raises(ValueError):
+        obj.download(overwrite=True, checksum='sha512:' + hashlib.sha512(b'other').hexdigest())
+    #the partial file is deleted, the existing file is kept
+    assert os.listdir(tmp_path) == ['file.bin']
+    os.remove(tmp_path / 'file.bin')
+    with pytest.raises(ValueError):
+        obj.download(checksum='sha256:' + hashlib.sha256(b'other').hexdigest())
+    assert os.listdir(tmp_path) == []
+    with pytest.raises(ValueError):
+        obj.download(checksum='shake_128:00')
+
+def test_download_checksum_streamed(httpserver, tmp_path, monkeypatch):
+    data = os.urandom(300000)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path))
+    #hashed while written: the file is not read back
+    def read_back(*args):
+        raise AssertionError('file read back')
+    monkeypatch.setattr(obj, '_hash_file', read_back)
+    assert obj.download(checksum='sha512:' + hashlib.sha512(data).hexdigest())
+
+def test_download_checksum_resumed(httpserver, tmp_path):
+    data = os.urandom(300000)
+    httpserver.files['/file.bin'] = data
+    httpserver.cut['/file.bin'] = 100000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), session=GetDownloader.make_session(retries=0))
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        obj.download(checksum=hashlib.sha256(data).hexdigest())
+    #the kept start is hashed with the rest
+    assert obj.download(checksum='blake2b:' + hashlib.blake2b(data).hexdigest())
+    assert 'Range' in httpserver.requests[-1][1]
+
+def test_download_checksum_segmented(httpserver, tmp_path):
+    data = os.urandom(2 * 1024 * 1024)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), min_segment_size=512 * 1024)
+    assert obj.download(segments=4, checksum=hashlib.sha256(data).hexdigest())
+    with pytest.raises(ValueError):
+        obj.download(overwrite=True, segments=4, checksum=hashlib.sha256(b'other').hexdigest())
+    assert os.listdir(tmp_path) == ['file.bin']
+
+def test_download_cache_checksum(httpserver, tmp_path):
+    data = os.urandom(1000)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=str(tmp_path / 'cache'))
+    assert obj.download(checksum=hashlib.sha256(data).hexdigest())
+    #cache hits are checked too
+    assert obj.download(overwrite=True, checksum='sha512:' + hashlib.sha512(data).hexdigest())
+    with pytest.raises(ValueError):
+        obj.download(overwrite=True, checksum=hashlib.sha256(b'other').hexdigest())
+
+def test_download_cache(httpserver, tmp_path):
+    data = os.urandom(200000)
+    httpserver.files['/file.bin'] = data
+    cache_dir = tmp_path / 'cache'
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path / 'a'), cache_dir=str(cache_dir))
+    assert obj.download()
+    blob = cache_dir / 'blobs' / hashlib.sha256(data).hexdigest()[:2] / hashlib.sha256(data).hexdigest()
+    assert blob.read_bytes() == data
+    #a copy: the file can be changed without changing the cache
+    assert not os.path.samefile(blob, tmp_path / 'a' / 'file.bin')
+    with open(tmp_path / 'a' / 'file.bin', 'r+b') as f:
+        f.write(b'changed')
+    assert blob.read_bytes() == data
+    #not modified: 304, the file is copied from the cached content
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path / 'b'), cache_dir=str(cache_dir))
+    assert obj.download()
+    assert httpserver.requests[-1][1]['If-None-Match'] == '"%s"' % hashlib.sha1(data).hexdigest()
+    assert httpserver.requests[-1][1]['If-Modified-Since']
+    assert not os.path.samefile(blob, tmp_path / 'b' / 'file.bin')
+    assert os.access(tmp_path / 'b' / 'file.bin', os.W_OK)
+    assert (tmp_path / 'b' / 'file.bin').read_bytes() == data
+    assert sorted(os.listdir(tmp_path / 'b')) == ['file.bin']
+
+def test_download_cache_modified(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'a' * 1000
+    cache_dir = str(tmp_path / 'cache')
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=cache_dir)
+    assert obj.download()
+    httpserver.files['/file.bin'] = b'b' * 1000
+    assert obj.download(overwrite=True)
+    assert (tmp_path / 'file.bin').read_bytes() == b'b' * 1000
+    #the same content from another url is stored once
+    httpserver.files['/other.bin'] = b'b' * 1000
+    other = GetDownloader(url=httpserver.url('/other.bin'), file_dir=str(tmp_path), cache_dir=cache_dir)
+    assert other.download()
+    assert (tmp_path / 'other.bin').read_bytes() == b'b' * 1000
+    assert len(os.listdir(os.path.join(cache_dir, 'blobs', hashlib.sha256(b'b' * 1000).hexdigest()[:2]))) == 1
+    assert len(os.listdir(os.path.join(cache_dir, 'urls'))) == 2
+
+def test_download_cache_link(httpserver, tmp_path):
+    data = os.urandom(1000)
+    httpserver.files['/file.bin'] = data
+    httpserver.files['/other.bin'] = data
+    cache_dir = str(tmp_path / 'cache')
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=cache_dir, cache_link=True)
+    assert obj.download()
+    other = GetDownloader(url=httpserver.url('/other.bin'), file_dir=str(tmp_path), cache_dir=cache_dir, cache_link=True)
+    assert other.download()
+    #the same content is stored once, the files are read-only links to it
+    assert os.path.samefile(tmp_path / 'file.bin', tmp_path / 'other.bin')
+    assert os.stat(tmp_path / 'file.bin').st_mode & 0o777 == 0o444
+    assert obj.download(overwrite=True)
+    assert os.path.samefile(tmp_path / 'file.bin', tmp_path / 'other.bin')
+
+def test_download_cache_threads(httpserver, tmp_path):
+    data = os.urandom(200000)
+    httpserver.files['/file.bin'] = data
+    cache_dir = str(tmp_path / 'cache')
+    GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=cache_dir).download()
+    #cache hits of the same url in threads, written to the same files
+    errors = []
+    def download():
+        try:
+            assert GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=cache_dir).download(overwrite=True)
+        except BaseException as e:
+            errors.append(e)
+    threads = [threading.Thread(target=download) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert (tmp_path / 'file.bin').read_bytes() == data
+    assert sorted(os.listdir(tmp_path)) == ['cache', 'file.bin']
+
+def test_download_cache_last_modified(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = (b'a' * 1000, {'ETag': ''})
+    cache_dir = str(tmp_path / 'cache')
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), cache_dir=cache_dir)
+    assert obj.download()
+    assert obj.download(overwrite=True)
+    assert 'If-None-Match' not in httpserver.requests[-1][1]
+    assert httpserver.requests[-1][1]['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+    assert (tmp_path / 'file.bin').read_bytes() == b'a' * 1000
+
+def test_download_rate_limit(httpserver, tmp_path):
+    httpserver.files['/file.bin'] = b'a' * 300000
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), rate_limit=1000000)
+    start = time.monotonic()
+    assert obj.download()
+    #one second of burst, then 1 MB/s: the first 300 KB are free
+    assert time.monotonic() - start < 0.3
+    bucket = TokenBucket(1000000, burst=100000)
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), rate_limit=bucket)
+    other = GetDownloader(url=httpserver.url('/file.bin'), file_name='other.bin', file_dir=str(tmp_path), rate_limit=bucket)
+    start = time.monotonic()
+    threads = [threading.Thread(target=d.download, kwargs={'overwrite': True}) for d in (obj, other)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    #600 KB shared at 1 MB/s after a 100 KB burst
+    assert 0.45 <= time.monotonic() - start < 1.0
+    assert (tmp_path / 'other.bin').read_bytes() == b'a' * 300000
+
+def test_download_rate_limit_segmented(httpserver, tmp_path):
+    data = os.urandom(1024 * 1024)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'), file_dir=str(tmp_path), min_segment_size=256 * 1024,
+        rate_limit=TokenBucket(4 * 1024 * 1024, burst=64 * 1024))
+    start = time.monotonic()
+    assert obj.download(segments=4)
+    #the segments share the bucket of the download
+    assert time.monotonic() - start >= 0.2
+    assert (tmp_path / 'file.bin').read_bytes() == data
+
+def test_download_to(httpserver, tmp_path):
+    import io
+    data = os.urandom(100000)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'))
+    buffer = io.BytesIO()
+    assert obj.download_to(buffer, checksum=hashlib.sha256(data).hexdigest()) == len(data)
+    assert buffer.getvalue() == data
+    with pytest.raises(ValueError):
+        obj.download_to(io.BytesIO(), checksum=hashlib.sha256(b'other').hexdigest())
+    with obj.open() as stream:
+        assert stream.read() == data
+
+def test_download_to_spooled(httpserver, tmp_path):
+    import tempfile
+    data = os.urandom(100000)
+    httpserver.files['/file.bin'] = data
+    obj = GetDownloader(url=httpserver.url('/file.bin'))
+    class Spooled(tempfile.SpooledTemporaryFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.events = []
+        def rollover(self):
+            self.events.append('rollover')
+            super().rollover()
+        def write(self, data):
+            self.events.append('write')
+            return super().write(data)
+    #larger than the spool: rolled over before the download
+    with Spooled(max_size=1000) as buffer:
+        assert obj.download_to(buffer, spool_size=1000) == len(data)
+        assert buffer.events[0] == 'rollover'
+        buffer.seek(0)
+        assert buffer.read() == data
+    #fits in memory, or unknown spool size: left in memory
+    for spool_size in (1000000, None):
+        with Spooled(max_size=1000000) as buffer:
+            assert obj.download_to(buffer, spool_size=spool_size) == len(data)
+            assert 'rollover' not in buffer.events
+    #a real file
+    with tempfile.TemporaryFile() as f:
+        f.write(b'head')
+        assert obj.download_to(f) == len(data)
+        f.seek(0)
+        assert f.read() == b'head' + data
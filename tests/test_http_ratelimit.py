@@ -0,0 +1,51 @@
+"""
+tests frua.base.http.ratelimit.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+import time
+import threading
+
+from frua.base.http.ratelimit import TokenBucket
+
+def test_init():
+    bucket = TokenBucket(1000)
+    assert bucket.rate == 1000.0
+    assert bucket.burst == 1000.0
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    with pytest.raises(ValueError):
+        TokenBucket(1000, burst=0)
+
+def test_delay():
+    bucket = TokenBucket(1000, burst=500)
+    #the burst is available at once
+    assert bucket.delay(500) == 0.0
+    #then the tokens come at rate per second, debts add up
+    assert bucket.delay(500) == pytest.approx(0.5, abs=0.01)
+    assert bucket.delay(500) == pytest.approx(1.0, abs=0.01)
+
+def test_consume():
+    bucket = TokenBucket(100000, burst=10000)
+    start = time.monotonic()
+    for _ in range(6):
+        bucket.consume(10000)
+    #burst, then 50000 bytes at 100000 bytes/s
+    assert 0.45 <= time.monotonic() - start < 0.7
+
+def test_shared():
+    bucket = TokenBucket(100000, burst=10000)
+    def consumer():
+        for _ in range(3):
+            bucket.consume(10000)
+    threads = [threading.Thread(target=consumer) for _ in range(2)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    #60000 bytes shared at 100000 bytes/s, the burst included
+    assert 0.45 <= time.monotonic() - start < 0.7
@@ -26,6 +26,30 @@ def test_crudobj_init(crudobj):
     assert crudobj.updated_at == None
     assert crudobj.deleted_at == None
 
+def test_crudobj_init_keeps_created_at():
+    created_at = datetime.datetime(2020, 1, 1)
+    enabled_at = datetime.datetime(2020, 1, 2)
+    crudobj = CRUDObj(created_at=created_at, enabled_at=enabled_at)
+    assert crudobj.created_at == created_at
+    assert crudobj.enabled_at == enabled_at
+
+def test_crudobj_init_lazy():
+    crudobj = CRUDObj(lazy=True)
+    assert 'created_at' not in crudobj.__dict__
+    assert 'enabled_at' not in crudobj.__dict__
+    assert crudobj.created_at == crudobj.enabled_at
+    assert crudobj.created_at > TimeHelp.epoch()
+    assert crudobj.created_at <= TimeHelp.now()
+    assert crudobj.updated_at == None
+    assert crudobj.enabled == True
+    crudobj.update()
+    assert crudobj.updated_at > TimeHelp.epoch()
+
+def test_crudobj_init_lazy_keeps_created_at():
+    created_at = datetime.datetime(2020, 1, 1)
+    crudobj = CRUDObj(lazy=True, created_at=created_at)
+    assert crudobj.created_at == created_at
+
 def test_crudobj_create(crudobj):
     crudobj.create()
     assert crudobj.created_at > TimeHelp.epoch()
@@ -95,3 +119,90 @@ def test_crudobj_is_deleted(crudobj):
     crudobj.delete()
     crudobj.is_deleted()
     assert crudobj.deleted == True
+
+def test_crudobj_dirty_new(crudobj):
+    assert crudobj.is_dirty()
+    assert 'created_at' in crudobj.dirty
+    assert '_id' in crudobj.dirty
+
+def test_crudobj_dirty(crudobj):
+    crudobj.mark_clean()
+    assert not crudobj.is_dirty()
+    assert crudobj.diff() == {}
+    crudobj.name = 'test'
+    crudobj.update()
+    assert crudobj.dirty == {'name', 'updated_at'}
+    assert crudobj.diff() == {'name': 'test', 'updated_at': crudobj.updated_at}
+    crudobj.mark_clean()
+    assert crudobj.diff() == {}
+
+def test_crudobj_dirty_not_in_dict(crudobj):
+    assert '_dirty' not in crudobj.__dict__
+    other = CRUDObj()
+    other.__dict__.update(crudobj.__dict__)
+    other.mark_clean()
+    assert other == crudobj
+
+def test_crudobj_touch_and_delattr(crudobj):
+    crudobj.tags = []
+    crudobj.mark_clean()
+    crudobj.tags.append('a')
+    assert not crudobj.is_dirty()
+    crudobj.touch('tags')
+    assert crudobj.diff() == {'tags': ['a']}
+    del crudobj.tags
+    assert crudobj.diff() == {'tags': None}
+
+def test_crudobj_diff_json(crudobj):
+    crudobj.mark_clean()
+    crudobj.name = 'test'
+    crudobj.updated_at = datetime.datetime(2020, 1, 1)
+    assert crudobj.diff_json() == '{"name":"test","updated_at":"2020-01-01T00:00:00"}'
+
+def test_crudobj_apply_diff(crudobj):
+    crudobj.mark_clean()
+    crudobj.name = 'test'
+    other = CRUDObj()
+    other.apply_diff(crudobj.diff())
+    assert other.name == 'test'
+
+def test_crudobj_from_dicts_clean(crudobj):
+    obj = CRUDObj.from_dicts([crudobj.__dict__])[0]
+    assert not obj.is_dirty()
+    obj.name = 'test'
+    assert obj.diff() == {'name': 'test'}
+
+def test_crudobj_diff_properties(crudobj):
+    crudobj.mark_clean()
+    dt = datetime.datetime(2020, 1, 1)
+    crudobj.dt = dt
+    crudobj.id = 'abc'
+    assert crudobj.dirty == {'_dt', '_id'}
+    assert crudobj.diff() == {'_dt': dt, '_id': 'abc'}
+    other = CRUDObj()
+    other.apply_diff(crudobj.diff())
+    assert other.dt == dt
+    assert other.id == 'abc'
+
+def test_crudobj_diff_lazy():
+    crudobj = CRUDObj(lazy=True)
+    diff = crudobj.diff()
+    assert '_ts' not in diff
+    assert diff['created_at'] == crudobj.created_at
+    assert diff['enabled_at'] == crudobj.enabled_at
+    assert diff['_dt'] == crudobj.dt
+    other = CRUDObj()
+    other.apply_diff(diff)
+    assert other.created_at == crudobj.created_at
+    assert other.dt == crudobj.dt
+    crudobj.mark_clean()
+    assert crudobj.diff() == {}
+
+def test_crudobj_lazy_equality():
+    import copy
+    crudobj = CRUDObj(lazy=True)
+    other = copy.copy(crudobj)
+    assert other == crudobj
+    crudobj.created_at, crudobj.dt
+    assert other == crudobj
+    assert crudobj.diff() == other.diff()
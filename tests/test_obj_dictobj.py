@@ -10,6 +10,7 @@ import logging
 import logging.config
 
 from frua.base.obj.dictobj import DictObj
+from frua.base.obj.uidobj import UUIDObj
 
 @pytest.fixture
 def dictobj():
@@ -44,4 +45,47 @@ def test_from_dict(dictobj):
     obj = obj.from_dict(dictio)
     assert obj.a == 1
     assert obj.b == 2
-    
\ No newline at end of file
+    
+def test_from_dicts():
+    rows = [{'a': 1, 'b': 2}, {'a': 3, 'b': 4}]
+    objs = DictObj.from_dicts(rows)
+    assert len(objs) == 2
+    assert isinstance(objs[0], DictObj)
+    assert objs[0].a == 1
+    assert objs[1].b == 4
+    #rows are copied
+    objs[0].a = 5
+    assert rows[0]['a'] == 1
+
+def test_from_dicts_tuples():
+    rows = [(1, 2), (3, 4)]
+    objs = DictObj.from_dicts(rows, keys=['a', 'b'], intern_keys=True)
+    assert objs[1].a == 3
+    assert objs[1].b == 4
+
+def test_from_dicts_no_copy():
+    rows = [{'a': 1}]
+    objs = DictObj.from_dicts(rows, copy=False)
+    assert objs[0].__dict__ is rows[0]
+
+def test_from_dicts_subclass():
+    objs = UUIDObj.from_dicts([{'_id': 'abc'}])
+    assert isinstance(objs[0], UUIDObj)
+    assert objs[0].id == 'abc'
+
+def test_not_hashable(dictobj):
+    with pytest.raises(TypeError):
+        hash(dictobj)
+
+def test_hash_keys():
+    class KeyObj(DictObj):
+        _hash_keys = ('a', 'b')
+    obj1 = KeyObj(a=1, b=2)
+    obj2 = KeyObj(a=1, b=2)
+    obj3 = KeyObj(a=1, b=3)
+    assert hash(obj1) == hash(obj2)
+    assert len({obj1, obj2, obj3}) == 2
+
+def test_eq_other_type(dictobj):
+    assert dictobj != None
+    assert not dictobj == 1
@@ -26,4 +26,37 @@ def test_dtobj_set_get_dt(dtobj):
 
 def test_dtobj_reset_dt(dtobj):
     dt = dtobj.reset_dt()
-    assert dtobj._dt == dt
\ No newline at end of file
+    assert dtobj._dt == dt
+
+def test_dtobj_lazy():
+    dtobj = DTObj(lazy=True)
+    assert '_ts' in dtobj.__dict__
+    assert '_dt' not in dtobj.__dict__
+    assert 'lazy' not in dtobj.__dict__
+    dt = dtobj.dt
+    assert isinstance(dt, datetime.datetime)
+    #cached out of __dict__
+    assert '_dt' not in dtobj.__dict__
+    assert dtobj.dt is dt
+    assert abs(dt - datetime.datetime.utcnow()) < datetime.timedelta(seconds=5)
+
+def test_dtobj_lazy_set_dt():
+    dtobj = DTObj(lazy=True)
+    dt = datetime.datetime.now()
+    dtobj.dt = dt
+    assert dtobj.dt == dt
+
+def test_dtobj_missing_attribute(dtobj):
+    with pytest.raises(AttributeError):
+        dtobj.missing
+
+def test_dtobj_lazy_equality():
+    import copy
+    dtobj = DTObj(lazy=True)
+    other = copy.copy(dtobj)
+    assert other == dtobj
+    dtobj.dt
+    assert other == dtobj
+    assert other.dt == dtobj.dt
+    assert other == dtobj
+    assert set(dtobj.__dict__) == set(DTObj(lazy=True).__dict__)
@@ -9,6 +9,8 @@ import pytest
 from frua.base.obj.jsonobj import JSONObj
 import json
 import os
+import datetime
+import io
 
 curdir = os.path.dirname(os.path.abspath(__file__))
 
@@ -97,3 +99,129 @@ def test_from_json_dict():
     jstr = '{"test1": "A", "test2": "B"}'
     sobj = JSONObj().fromjson(jstr, copy=False)
     assert sobj == {'test1': 'A', 'test2': 'B'}
+
+def test_bin_serialize(jsonobj):
+    jsonobj.p = 'test'
+    jsonobj.dt = datetime.datetime(2020, 1, 1)
+    jsonobj.b = b'bytes'
+    data = jsonobj.bin_serialize()
+    assert isinstance(data, bytes)
+    jsonobj1 = JSONObj().bin_deserialize(data)
+    assert jsonobj1.p == 'test'
+    assert jsonobj1.dt == jsonobj.dt
+    assert jsonobj1.b == b'bytes'
+    assert jsonobj1.id == jsonobj.id
+    assert '_logger' in jsonobj1.__dict__
+
+def test_tobin_frombin(jsonobj):
+    jsonobj.p = 'test'
+    jsonobj1 = JSONObj()
+    jsonobj1.frombin(jsonobj.tobin())
+    assert jsonobj1.p == 'test'
+    assert JSONObj().frombin(JSONObj().tobin([1, 2]), copy=False) == [1, 2]
+
+def test_tobin_file(jsonobj):
+    filepath = '/tmp/test.bin'
+    #remove the file if it exists
+    if os.path.isfile(filepath):
+        os.remove(filepath)
+    jsonobj.p = 'test'
+    assert jsonobj.tobin_file(filepath) == filepath
+    assert os.path.isfile(filepath)
+    jsonobj1 = JSONObj().frombin_file(filepath)
+    assert jsonobj1.p == 'test'
+    assert jsonobj1.id == jsonobj.id
+    os.remove(filepath)
+
+def test_frombin_file_not_found(jsonobj):
+    assert jsonobj.frombin_file('/tmp/not_found.bin') is None
+
+def test_json_deserialize_from_file_populates(jsonobj):
+    filepath = os.path.join(curdir, 'test.json')
+    compobj1 = jsonobj.json_deserialize_from_file(filepath)
+    assert compobj1 is jsonobj
+    assert jsonobj.id == '983a08df-1c03-4da1-8de1-4882de6e5f5e'
+
+def test_iter_json_array():
+    text = '[{"a": 1}, {"a": 2, "b": [1, 2, {"c": "]"}]} ,\n {"a": 3}]'
+    for chunk_size in (1, 2, 5, 65536):
+        objs = list(JSONObj.iter_json(io.StringIO(text), chunk_size=chunk_size))
+        assert [obj.a for obj in objs] == [1, 2, 3]
+        assert isinstance(objs[0], JSONObj)
+        assert objs[1].b == [1, 2, {'c': ']'}]
+
+def test_iter_json_lines():
+    text = '{"a": 1, "n": 12345}\n{"a": 2, "n": 67890}\n\n{"a": 3, "n": 1}\n'
+    for chunk_size in (1, 3, 65536):
+        objs = list(JSONObj.iter_json(io.StringIO(text), chunk_size=chunk_size))
+        assert [obj.n for obj in objs] == [12345, 67890, 1]
+
+def test_iter_json_no_init():
+    objs = list(JSONObj.iter_json(io.StringIO('[{"_id": "x"}]'), init=False))
+    assert objs[0].id == 'x'
+    assert '_logger' not in objs[0].__dict__
+
+def test_iter_json_empty():
+    assert list(JSONObj.iter_json(io.StringIO('[]'))) == []
+    assert list(JSONObj.iter_json(io.StringIO(''))) == []
+
+def test_iter_json_invalid():
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONObj.iter_json(io.StringIO('[{"a": 1}, {"a": ')))
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONObj.iter_json(io.StringIO('{"a": 1} x')))
+    with pytest.raises(TypeError):
+        list(JSONObj.iter_json(io.StringIO('[1, 2]')))
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONObj.iter_json(io.StringIO('{"a": 1}'), jsonlines=False))
+
+def test_iter_json_invalid_separators():
+    for text in ('[{"a": 1}{"b": 2}]', '[,{"a": 1}]', '[{"a": 1},]', '[{"a": 1},,{"b": 2}]', '[,]',
+            '[{"a": 1}] trailing-garbage', '[{"a": 1}] []', '[{"a": 1}', '[{"a": 1},'):
+        for chunk_size in (1, 3, 65536):
+            with pytest.raises(json.JSONDecodeError):
+                list(JSONObj.iter_json(io.StringIO(text), chunk_size=chunk_size))
+    assert [obj.a for obj in JSONObj.iter_json(io.StringIO(' [ {"a": 1} , {"a": 2} ] \n'))] == [1, 2]
+
+class _CountingReader(object):
+    """
+    Text file object counting the characters read
+    """
+    def __init__(self, text):
+        self.file = io.StringIO(text)
+        self.read_size = 0
+    def read(self, size=-1):
+        data = self.file.read(size)
+        self.read_size += len(data)
+        return data
+
+def test_iter_json_lines_invalid_fails_fast():
+    text = '{"a": 1}\n{"a": x}\n' + '{"a": 2}\n' * 200000
+    reader = _CountingReader(text)
+    objs = JSONObj.iter_json(reader, chunk_size=1000)
+    assert next(objs).a == 1
+    with pytest.raises(json.JSONDecodeError):
+        next(objs)
+    assert reader.read_size <= 4000
+
+def test_iter_json_array_max_record_size():
+    text = '[{"a": 1}, {"a": x' + ', {"a": 2}' * 200000 + ']'
+    reader = _CountingReader(text)
+    objs = JSONObj.iter_json(reader, chunk_size=1000, max_record_size=10000)
+    assert next(objs).a == 1
+    with pytest.raises(json.JSONDecodeError):
+        next(objs)
+    assert reader.read_size <= 40000
+    #large valid records are read up to the limit
+    text = '[{"a": "%s"}]' % ('x' * 50000)
+    assert len(list(JSONObj.iter_json(io.StringIO(text), chunk_size=1000, max_record_size=None))[0].a) == 50000
+    with pytest.raises(json.JSONDecodeError):
+        list(JSONObj.iter_json(io.StringIO(text), chunk_size=1000, max_record_size=10000))
+
+def test_iter_json_file():
+    filepath = '/tmp/test_iter.json'
+    with open(filepath, 'w') as file:
+        json.dump([{'i': i} for i in range(1000)], file)
+    objs = JSONObj.iter_json_file(filepath, chunk_size=100)
+    assert [obj.i for obj in objs] == list(range(1000))
+    os.remove(filepath)
@@ -0,0 +1,112 @@
+"""
+tests frua.base.obj.objindex.py
+"""
+__author__ = 'David HEURTEVENT'
+__copyright__ = 'David HEURTEVENT'
+__license__ = 'MIT'
+
+import pytest
+
+from frua.base.obj.objindex import ObjIndex
+from frua.base.obj.crudobj import CRUDObj
+from frua.base.obj.dictobj import DictObj
+
+@pytest.fixture
+def objs():
+    return [CRUDObj(name='a', group=1), CRUDObj(name='b', group=1), CRUDObj(name='c', group=2)]
+
+@pytest.fixture
+def index(objs):
+    return ObjIndex(attrs=['name'], objs=objs)
+
+def test_init(index, objs):
+    assert isinstance(index, ObjIndex)
+    assert len(index) == 3
+    assert index.attrs == ['name']
+    assert objs[0] in index
+    assert list(index) == objs
+
+def test_get(index, objs):
+    assert index.get('name', 'a') == [objs[0]]
+    assert index.get('name', 'z') == []
+    assert index.first('name', 'c') is objs[2]
+    assert index.first('name', 'z') is None
+
+def test_get_arbitrary_attribute(index, objs):
+    assert index.get('group', 1) == [objs[0], objs[1]]
+    assert 'group' in index.attrs
+    assert index.get('_id', objs[2].id) == [objs[2]]
+
+def test_unhashable_objects_and_values():
+    obj = DictObj(tags=['x'], name='n')
+    index = ObjIndex(attrs=['tags', 'name'], objs=[obj])
+    assert index.get('name', 'n') == [obj]
+    assert index.get('missing', 'n') == []
+
+def test_update(index, objs):
+    objs[0].name = 'z'
+    #not reindexed until updated
+    assert index.get('name', 'z') == []
+    objs[0].update()
+    assert index.get('name', 'z') == [objs[0]]
+    assert index.get('name', 'a') == []
+
+def test_delete(index, objs):
+    objs[1].delete()
+    assert objs[1] not in index
+    assert index.get('name', 'b') == []
+    assert len(index) == 2
+
+def test_delete_keep_deleted(objs):
+    index = ObjIndex(attrs=['deleted'], objs=objs, keep_deleted=True)
+    objs[1].delete()
+    assert objs[1] in index
+    assert index.get('deleted', True) == [objs[1]]
+
+def test_remove(index, objs):
+    assert index.remove(objs[0])
+    assert not index.remove(objs[0])
+    assert index.get('name', 'a') == []
+    #no longer updated
+    objs[0].update()
+    assert objs[0] not in index
+
+def test_several_indexes(index, objs):
+    other = ObjIndex(attrs=['name'], objs=objs[:1])
+    objs[0].name = 'y'
+    objs[0].update()
+    assert index.first('name', 'y') is objs[0]
+    assert other.first('name', 'y') is objs[0]
+
+def test_clear_and_drop_index(index, objs):
+    index.drop_index('name')
+    assert index.attrs == []
+    index.clear()
+    assert len(index) == 0
+    assert index.get('name', 'a') == []
+
+def test_flush(index, objs):
+    batches = []
+    assert len(index.dirty()) == 3
+    assert index.flush(batches.append) == 3
+    assert index.dirty() == []
+    assert index.flush(batches.append) == 0
+    objs[2].name = 'd'
+    objs[2].update()
+    assert index.flush(batches.append) == 1
+    assert len(batches) == 2
+    assert batches[1] == {objs[2].id: {'name': 'd', 'updated_at': objs[2].updated_at}}
+
+def test_registry_dropped_with_index():
+    import gc
+    from frua.base.obj import objindex
+    obj = CRUDObj(name='a')
+    key = id(obj)
+    index = ObjIndex(attrs=['name'], objs=[obj])
+    other = ObjIndex(attrs=['name'], objs=[obj])
+    del index
+    gc.collect()
+    assert key in objindex._registry
+    del other, obj
+    gc.collect()
+    assert key not in objindex._registry
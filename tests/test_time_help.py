@@ -65,3 +65,11 @@ def test_epoch():
     assert TimeHelp().epoch() != None
     assert TimeHelp().epoch() == datetime.datetime(1970, 1, 1, 0, 0)
 
+
+def test_from_ns():
+    ns = TimeHelp.now_ns()
+    assert isinstance(ns, int)
+    assert abs(TimeHelp.from_ns(ns) - TimeHelp.now()) < datetime.timedelta(seconds=5)
+    assert abs(TimeHelp.utcfrom_ns(ns) - TimeHelp.utcnow()) < datetime.timedelta(seconds=5)
+    assert TimeHelp.utcfrom_ns(0) == TimeHelp.epoch()
+    assert TimeHelp.utcfrom_ns(1500) == TimeHelp.epoch() + datetime.timedelta(microseconds=1)
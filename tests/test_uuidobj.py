@@ -19,3 +19,10 @@ def idobj():
 def test_id(idobj):
     assert idobj.id != None
     assert '_id' in idobj.__dict__
+
+def test_hash(idobj):
+    assert hash(idobj) == hash(idobj.id)
+    other = UUIDObj()
+    assert len({idobj, idobj, other}) == 2
+    d = {idobj: 1}
+    assert d[idobj] == 1